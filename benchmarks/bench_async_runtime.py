@@ -0,0 +1,139 @@
+"""
+Потоки и переключения контекста на сеансах распознавания: поток на сеанс и threading.Timer (WOW_STT_RUNTIME=threads)
+против одного цикла asyncio с grpc.aio (WOW_STT_RUNTIME=asyncio, app.async_runtime).
+
+Каждый сеанс - как запись в приложении: заранее открытый поток со своим таймером, аудио блоками по 100 мс
+в реальном времени на локальный сервер (app.yandex_speech_kit_local_server), два таймера перехода режимов.
+Потоки считаются по ОС (psutil, если есть) и по threading.active_count(), переключения контекста - psutil
+или resource.getrusage.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_async_runtime.py [sessions] [session_seconds]
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import app.async_runtime
+import app.yandex_speech_kit as yandex_speech_kit
+from app.yandex_speech_kit_local_server import RecognizerServicer, scripted_events, serve
+
+
+CHUNK_MS = 100
+CHUNK = b"\x00\x00" * (16000 * CHUNK_MS // 1000)
+GRACE_S = 0.2
+
+
+def _context_switches() -> int:
+    if psutil is not None:
+        switches = psutil.Process().num_ctx_switches()
+        return switches.voluntary + switches.involuntary
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def _os_threads() -> int | None:
+    return psutil.Process().num_threads() if psutil is not None else None
+
+
+class _ThreadSampler:
+    def __init__(self):
+        self.peak_python = 0
+        self.peak_os = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.01):
+            self.peak_python = max(self.peak_python, threading.active_count())
+            self.peak_os = max(self.peak_os, _os_threads() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _session_threads(chunks: int):
+    def paced():
+        for _ in range(chunks):
+            yield CHUNK
+            time.sleep(CHUNK_MS / 1000)
+
+    done = threading.Event()
+
+    def run():
+        yandex_speech_kit.recognize(yandex_speech_kit.streaming_requests(paced()), threading.Event(), lambda *_: None)
+        # Два перехода режима с паузой, как ModeContainer.to_mode
+        threading.Timer(GRACE_S, lambda: threading.Timer(GRACE_S, done.set).start()).start()
+
+    threading.Thread(target=run, daemon=True).start()
+    done.wait()
+
+
+def _session_asyncio(chunks: int):
+    runtime = app.async_runtime.runtime
+
+    async def paced():
+        for _ in range(chunks):
+            yield CHUNK
+            await asyncio.sleep(CHUNK_MS / 1000)
+
+    done = threading.Event()
+    runtime.submit(
+        yandex_speech_kit.recognize_async(yandex_speech_kit.streaming_requests_async(paced()), lambda *_: None)
+    ).result()
+    runtime.call_later(GRACE_S, lambda: runtime.call_later(GRACE_S, done.set))
+    done.wait()
+
+
+def bench(session, sessions: int, chunks: int):
+    switches_before = _context_switches()
+    started = time.perf_counter()
+    with _ThreadSampler() as sampler:
+        for _ in range(sessions):
+            session(chunks)
+    elapsed = time.perf_counter() - started
+    return sampler, (_context_switches() - switches_before) / elapsed
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    session_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    chunks = int(session_seconds * 1000 / CHUNK_MS)
+
+    servicer = RecognizerServicer(scripted_events(["зима лето точка"] * 1000, word_ms=CHUNK_MS), seed=1)
+    server, port = serve(servicer)
+    try:
+        yandex_speech_kit.speechkit_endpoint = f"localhost:{port}"
+        yandex_speech_kit.resource_manager_endpoint = f"localhost:{port}"
+        yandex_speech_kit.yandex_speech_kit_init("local-secret")
+
+        for name, session in (("threads", _session_threads), ("asyncio", _session_asyncio)):
+            sampler, switches_per_second = bench(session, sessions, chunks)
+            os_threads = f"{sampler.peak_os:3d}" if psutil is not None else "  -"
+            print(
+                f"{name:8}: peak threads python {sampler.peak_python:3d} os {os_threads},"
+                f" context switches {switches_per_second:8.0f}/s (whole process, server included)"
+            )
+    finally:
+        app.async_runtime.runtime.stop()
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Сравнение PCM и OGG/Opus на потоковом клиенте против локального сервера (app.yandex_speech_kit_local_server):
+сколько байт ушло и задержка первого частичного результата.
+
+Нужны grpc, сгенерированные модули Yandex Cloud API и opuslib.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_audio_encoding.py
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+
+import app.yandex_speech_kit as yandex_speech_kit
+from app.yandex_speech_kit_local_server import RecognizerServicer, scripted_events, serve
+import app.tracing
+
+
+SAMPLE_RATE = 16000
+CHUNK_MS = 100
+SECONDS = 3
+RUNS = 5
+BITRATES = (16000, 24000, 32000)
+
+
+def _speech_like(seconds: int) -> bytes:
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 900)))
+    signal = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * voice * 3000
+    return signal.astype(np.int16).tobytes()
+
+
+def _paced_chunks(pcm: bytes, sent_ns: list[int]):
+    chunk_bytes = SAMPLE_RATE * 2 * CHUNK_MS // 1000
+    for i in range(0, len(pcm), chunk_bytes):
+        sent_ns.append(time.perf_counter_ns())
+        yield pcm[i:i + chunk_bytes]
+        time.sleep(CHUNK_MS / 1000)
+
+
+def bench(servicer: RecognizerServicer, audio_encoding: str, pcm: bytes) -> tuple[float, list[float]]:
+    bytes_before = servicer.audio_bytes
+    first_partial_ms = []
+    for _ in range(RUNS):
+        sent_ns = []
+        received_ns = []
+
+        def callback(alternatives: list[str], is_final: bool):
+            if not received_ns:
+                received_ns.append(time.perf_counter_ns())
+
+        requests = yandex_speech_kit.streaming_requests(_paced_chunks(pcm, sent_ns), "off", audio_encoding)
+        yandex_speech_kit.recognize(requests, threading.Event(), callback)
+        first_partial_ms.append((received_ns[0] - sent_ns[0]) / 1e6)
+
+    first_partial_ms.sort()
+    return (servicer.audio_bytes - bytes_before) / RUNS, first_partial_ms
+
+
+def main():
+    # Первый частичный результат - после первых 100 мс аудио
+    servicer = RecognizerServicer(scripted_events(["зима лето точка"], word_ms=CHUNK_MS))
+    server, port = serve(servicer)
+    pcm = _speech_like(SECONDS)
+    try:
+        yandex_speech_kit.speechkit_endpoint = f"localhost:{port}"
+        yandex_speech_kit.resource_manager_endpoint = f"localhost:{port}"
+        yandex_speech_kit.yandex_speech_kit_init("local-secret")
+
+        runs = [("pcm", None)] + [("ogg_opus", bitrate) for bitrate in BITRATES]
+        for audio_encoding, bitrate in runs:
+            if bitrate:
+                yandex_speech_kit.opus_bitrate = bitrate
+            sent_bytes, first_partial_ms = bench(servicer, audio_encoding, pcm)
+            print(
+                f"{audio_encoding:8} {bitrate or '':>6}: {sent_bytes / SECONDS * 8 / 1000:7.1f} kbit/s, "
+                f"first partial p50={app.tracing.percentile(first_partial_ms, 50):6.1f} ms"
+            )
+    finally:
+        yandex_speech_kit.yandex_speech_kit_shutdown()
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    main()
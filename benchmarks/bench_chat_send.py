@@ -0,0 +1,86 @@
+"""
+Время от стоп-слова ("отправить") до последнего нажатия клавиши при отправке в чат.
+
+Замеряется настоящий app.wow_chat_sender.send_to_wow_chat: переключение раскладки, буфер обмена, ожидание
+отпущенных клавиш и нажатия. Подменены только два места:
+  injector - нажатия пишутся в RecordingBackend, а не уходят в SendInput (в игру ничего не печатается);
+  детектор отпущенных клавиш - на FakeKeyboard, на которой ничего не зажато.
+Сравниваются паузы между шагами WOW_STT_KEY_STEP_MS: 50 мс (как было), по умолчанию и 0, и оба способа ожидания
+клавиш (app.keyboard.keyboard_state): хук знает, что клавиши давно отпущены, опрос по клавишам ждет 150 мс тишины сам.
+
+Только на Windows: буфер обмена и раскладка - настоящие (бенчмарк перезапишет буфер обмена
+и переключит раскладку окна консоли на русскую).
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_chat_send.py
+"""
+from __future__ import annotations
+
+import time
+
+import app.tracing
+import app.keyboard.keyboard_state
+import app.wow_chat_sender
+from app.keyboard.input_injection import InputInjector, RecordingBackend
+from app.keyboard.quiescence import (
+    FakeKeyboard, HookQuiescence, KeyboardQuiescence, KeyPollQuiescence, pressed_keys
+)
+
+
+RUNS = 20
+LEGACY_KEY_STEP_MS = 50
+# Сколько назад отпустили клавиши, когда прозвучало "отправить"
+RELEASED_AGO_S = 0.5
+
+
+def hook_detector(keyboard: FakeKeyboard) -> KeyboardQuiescence:
+    detector = HookQuiescence(lambda: pressed_keys(keyboard.read_state()))
+    keyboard.listeners.append(detector.on_key)
+    return detector
+
+
+def poll_detector(keyboard: FakeKeyboard) -> KeyboardQuiescence:
+    return KeyPollQuiescence(keyboard.key_down)
+
+
+def stop_word_to_last_key_ms(make_detector, key_step_ms: int) -> list[float]:
+    app.wow_chat_sender.KEY_STEP_MS = key_step_ms
+    results = []
+    for _ in range(RUNS):
+        keyboard = FakeKeyboard()
+        app.keyboard.keyboard_state._detector = make_detector(keyboard)
+        time.sleep(RELEASED_AGO_S)
+
+        backend = RecordingBackend()
+        app.wow_chat_sender.injector = InputInjector(backend)
+        stop_word_ns = time.perf_counter_ns()
+        app.wow_chat_sender.send_to_wow_chat("s", "зима лето")
+        results.append((backend.events[-1][0] - stop_word_ns) / 1e6)
+    results.sort()
+    return results
+
+
+def main():
+    default_step_ms = app.wow_chat_sender.KEY_STEP_MS
+    try:
+        for detector_name, make_detector in (("hook", hook_detector), ("poll", poll_detector)):
+            for step_name, key_step_ms in (
+                ("legacy steps", LEGACY_KEY_STEP_MS),
+                ("default steps", default_step_ms),
+                ("no steps", 0),
+            ):
+                values = stop_word_to_last_key_ms(make_detector, key_step_ms)
+                print(
+                    f"{detector_name:8} {step_name:13} ({key_step_ms:2} ms): stop word -> last key"
+                    f" p50={app.tracing.percentile(values, 50):7.2f} ms"
+                    f" p95={app.tracing.percentile(values, 95):7.2f} ms"
+                )
+    finally:
+        app.wow_chat_sender.KEY_STEP_MS = default_step_ms
+        app.keyboard.keyboard_state.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Задержка от частичного результата SpeechKit до текста для оверлея, пока распознаватель команд (Vosk) работает
+в том же процессе и в отдельном (app.idle_worker).
+
+Нагрузка синтетическая: в кольцо захвата в реальном времени пишется непрерывная "речь", Kaldi разбирает ее
+без отсева тишины. Частичные результаты приходят 10 раз в секунду, каждый проходит сборку текста
+(app.tokens_to_text_builder) и формирование строк оверлея, как в RecordingTextsProcessor. Задержка - от момента,
+когда результат должен был прийти, до готового текста: сюда попадает и ожидание GIL.
+
+Нужна модель Vosk в src/resources/vosk-model-small-ru-0.22.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_idle_isolation.py [seconds]
+"""
+from __future__ import annotations
+
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+from vosk import Model, SetLogLevel
+
+import app.tokens_to_text_builder as tokens_to_text_builder
+from app.command_recognizer import (
+    IDLE_MODEL_PATH, COMMAND_GRAMMAR, CommandDecoder, build_command_recognizer,
+)
+from app.idle_worker import IdleWorker
+from app.ring_buffer import RingBuffer, SharedRingBuffer
+from app.vad import SAMPLE_RATE
+
+
+BLOCK_BYTES = SAMPLE_RATE * 2 // 10
+RING_BYTES = 10 * SAMPLE_RATE * 2
+PARTIAL_INTERVAL = 0.1
+WORDS = "зима лето осень весна сказать привет всем сегодня идем в подземелье двадцать пять".split()
+
+
+def _speech(seconds: int, seed: int = 1) -> bytes:
+    # Без пауз, чтобы Kaldi работал все время
+    rnd = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 900)))
+    signal = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * voice * 3000 + rnd.normal(0, 30, len(t))
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+
+def _feed(ring: RingBuffer, pcm: bytes, stop: threading.Event):
+    # Как колбэк захвата: блок каждые 100 мс
+    started = time.perf_counter()
+    for n, i in enumerate(range(0, len(pcm), BLOCK_BYTES)):
+        if stop.is_set():
+            return
+        time.sleep(max(0.0, started + n * 0.1 - time.perf_counter()))
+        ring.write(pcm[i:i + BLOCK_BYTES])
+
+
+def _decode_in_process(model: Model, ring: RingBuffer, stop: threading.Event):
+    decoder = CommandDecoder(build_command_recognizer(model, COMMAND_GRAMMAR), use_vad=False)
+    reader = ring.reader(0)
+    while not stop.is_set():
+        data = reader.read(BLOCK_BYTES, timeout=0.1)
+        if data is not None:
+            decoder.feed(data, reader.pos)
+
+
+def _partials_to_overlay(seconds: float) -> list[float]:
+    tokens_to_text_builder.reset()
+    latencies = []
+    started = time.perf_counter()
+    n = 0
+    while True:
+        due = started + n * PARTIAL_INTERVAL
+        if due - started >= seconds:
+            return latencies
+        time.sleep(max(0.0, due - time.perf_counter()))
+
+        tokens = WORDS[:n % len(WORDS) + 1]
+        is_final = n % len(WORDS) == len(WORDS) - 1
+        tokens_to_text_builder.build_text(tokens, is_final)
+        # Строки для оверлея, как в RecordingTextsProcessor.recording_refresh_overlay
+        _ = (f"/s {tokens_to_text_builder.final_text}", tokens_to_text_builder.non_final_text)
+        latencies.append((time.perf_counter() - due) * 1000)
+        n += 1
+
+
+def bench(mode: str, model: Model | None, pcm: bytes, seconds: float) -> list[float]:
+    stop = threading.Event()
+    threads = []
+    worker = None
+
+    if mode == "none":
+        ring = RingBuffer(RING_BYTES)
+    elif mode == "thread":
+        ring = RingBuffer(RING_BYTES)
+        threads.append(threading.Thread(target=_decode_in_process, args=(model, ring, stop)))
+    else:
+        ring = SharedRingBuffer(RING_BYTES)
+        worker = IdleWorker(ring.name, ring.capacity, BLOCK_BYTES, str(IDLE_MODEL_PATH), COMMAND_GRAMMAR, use_vad=False)
+        worker.start()
+        while worker.ready_ms is None:
+            worker.get_event(timeout=0.1)
+        worker.listen(0)
+
+    threads.append(threading.Thread(target=_feed, args=(ring, pcm, stop)))
+    for thread in threads:
+        thread.start()
+    try:
+        return _partials_to_overlay(seconds)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if worker is not None:
+            worker.stop()
+            ring.close()
+
+
+def main():
+    SetLogLevel(-1)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 30.0
+    model = Model(str(IDLE_MODEL_PATH))
+    pcm = _speech(int(seconds) + 1)
+
+    for mode in ("none", "thread", "process"):
+        latencies = sorted(bench(mode, model, pcm, seconds))
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(
+            f"idle decoding={mode:7}: partial->overlay p50 {statistics.median(latencies):6.2f} ms,"
+            f" p95 {p95:6.2f} ms, max {latencies[-1]:6.2f} ms ({len(latencies)} partials)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Замер процессорного времени распознавателя команд (Vosk) в режиме ожидания: с отсевом тишины (app.vad) и без.
+Результат - CPU-секунды на час аудио.
+
+Нужна модель Vosk в src/resources/vosk-model-small-ru-0.22.
+Файл - 16 кГц, 16 бит, моно. Без аргумента - синтетическая запись ожидания: шум и изредка короткие реплики.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_idle_vad.py [file.wav]
+"""
+from __future__ import annotations
+
+import json
+import sys
+import time
+import wave
+from importlib import resources
+
+import numpy as np
+from vosk import Model, KaldiRecognizer, SetLogLevel
+
+from app.vad import VadGate, SAMPLE_RATE
+
+
+IDLE_MODEL_PATH = resources.files("resources") / "vosk-model-small-ru-0.22"
+ACTIVATE_WORDS = ["бой", "сказать", "крикнуть", "гильдия"]
+BLOCK_BYTES = SAMPLE_RATE * 2 // 10
+
+
+def _read_wav(path: str) -> bytes:
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz 16-bit mono")
+        return f.readframes(f.getnframes())
+
+
+def _synthetic(seconds: int = 300, seed: int = 1) -> bytes:
+    # Фоновый шум, раз в 30 секунд - полторы секунды чего-то похожего на речь
+    rnd = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    signal = rnd.normal(0, 30, len(t))
+    speech = (t % 30) < 1.5
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 900)))
+    signal += speech * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * voice * 3000
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+
+def bench(model: Model, pcm: bytes, gated: bool) -> float:
+    grammar = json.dumps(ACTIVATE_WORDS + ["[unk]"], ensure_ascii=False)
+    recognizer = KaldiRecognizer(model, SAMPLE_RATE, grammar)
+    recognizer.SetWords(True)
+    recognizer.SetPartialWords(True)
+    gate = VadGate(hangover_ms=500, lookback_ms=300)
+    has_speech = False
+
+    started = time.process_time()
+    for i in range(0, len(pcm), BLOCK_BYTES):
+        block = pcm[i:i + BLOCK_BYTES]
+        chunks = gate.process(block) if gated else [block]
+        if not chunks:
+            if has_speech:
+                has_speech = False
+                json.loads(recognizer.FinalResult())
+            continue
+        has_speech = True
+        for chunk in chunks:
+            if recognizer.AcceptWaveform(chunk):
+                json.loads(recognizer.Result())
+            else:
+                json.loads(recognizer.PartialResult())
+    cpu_seconds = time.process_time() - started
+
+    audio_hours = len(pcm) / (SAMPLE_RATE * 2) / 3600
+    return cpu_seconds / audio_hours
+
+
+def main():
+    SetLogLevel(-1)
+    model = Model(str(IDLE_MODEL_PATH))
+    pcm = _read_wav(sys.argv[1]) if len(sys.argv) > 1 else _synthetic()
+
+    for gated in (False, True):
+        print(f"gated={gated!s:5}: {bench(model, pcm, gated):8.1f} CPU-s per hour of idle audio")
+
+
+if __name__ == "__main__":
+    main()
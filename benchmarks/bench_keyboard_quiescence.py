@@ -0,0 +1,121 @@
+"""
+Ожидание отпущенных клавиш перед отправкой в чат: процессор на ожидание и задержка пробуждения.
+
+Сценарий на FakeKeyboard: Shift и A зажаты, A отпускают через 200 мс, Shift - через 400 мс; ждем 150 мс тишины.
+Задержка пробуждения - от (последнее отпускание + 150 мс) до возврата из ожидания.
+
+Способы:
+  per-key poll - как было: каждые 10 мс по запросу на каждую из 256 клавиш, без остановки на зажатой;
+  key poll - то же, но до первой зажатой клавиши (KeyPollQuiescence, WOW_STT_KEYBOARD_WAIT=poll);
+  hook - события клавиатуры, без опроса (HookQuiescence, по умолчанию).
+
+Эти числа - только на FakeKeyboard: запрос клавиши здесь - вызов Python, а не GetAsyncKeyState через ctypes,
+так что о настоящей клавиатуре они ничего не говорят. На Windows после них печатается замер настоящего
+app.keyboard.keyboard_state: сколько стоит один опрос (is_clean) чистой клавиатуры - худший случай, все клавиши.
+На других системах настоящих чисел нет.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_keyboard_quiescence.py
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+import app.tracing
+from app.keyboard.quiescence import FakeKeyboard, HookQuiescence, KeyboardQuiescence, KeyPollQuiescence, MOUSE_VKS
+
+
+RUNS = 10
+STABLE_MS = 150
+VK_SHIFT = 0x10
+VK_A = 0x41
+SCRIPT = [(200, VK_A, False), (400, VK_SHIFT, False)]
+REAL_POLLS = 1000
+
+
+class PerKeyPollQuiescence(KeyPollQuiescence):
+    """Прежний keyboard_is_clean: все клавиши на каждом опросе, даже если первая же зажата."""
+
+    def is_clean(self) -> bool:
+        self.reads += 1
+        clean = True
+        for vk in range(256):
+            if vk in MOUSE_VKS:
+                continue
+            self.key_reads += 1
+            if self._key_down(vk):
+                clean = False
+        return clean
+
+
+def per_key_poll(keyboard: FakeKeyboard) -> KeyboardQuiescence:
+    return PerKeyPollQuiescence(keyboard.key_down)
+
+
+def key_poll(keyboard: FakeKeyboard) -> KeyboardQuiescence:
+    return KeyPollQuiescence(keyboard.key_down)
+
+
+def hook(keyboard: FakeKeyboard) -> KeyboardQuiescence:
+    detector = HookQuiescence()
+    keyboard.listeners.append(detector.on_key)
+    return detector
+
+
+def run(make_detector) -> tuple[list[float], list[float]]:
+    latencies = []
+    cpu = []
+    for _ in range(RUNS):
+        keyboard = FakeKeyboard()
+        detector = make_detector(keyboard)
+        keyboard.key(VK_SHIFT, True)
+        keyboard.key(VK_A, True)
+        thread = keyboard.play(SCRIPT)
+
+        cpu_started = time.thread_time()
+        assert detector.wait_clean(STABLE_MS, timeout_s=3)
+        cpu.append((time.thread_time() - cpu_started) * 1000)
+        woke_at = time.monotonic()
+        thread.join()
+        latencies.append((woke_at - keyboard.last_event_at) * 1000 - STABLE_MS)
+    return sorted(latencies), sorted(cpu)
+
+
+def real_backend():
+    if sys.platform != "win32":
+        print("real keyboard: no numbers (Windows only)")
+        return
+
+    import app.keyboard.keyboard_state
+    poll = KeyPollQuiescence(app.keyboard.keyboard_state.key_down)
+    started = time.perf_counter()
+    for _ in range(REAL_POLLS):
+        poll.is_clean()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(
+        f"real keyboard: one poll {elapsed_ms / REAL_POLLS:.3f} ms"
+        f" ({poll.key_reads / REAL_POLLS:.0f} GetAsyncKeyState calls), release all keys while it runs"
+    )
+
+
+def main():
+    print("FakeKeyboard (not the real keyboard):")
+    for name, make_detector in (
+        ("per-key poll", per_key_poll),
+        ("key poll", key_poll),
+        ("hook", hook),
+    ):
+        latencies, cpu = run(make_detector)
+        print(
+            f"{name:13}: wake-up latency p50={app.tracing.percentile(latencies, 50):6.2f} ms"
+            f" p95={app.tracing.percentile(latencies, 95):6.2f} ms,"
+            f" CPU per wait p50={app.tracing.percentile(cpu, 50):6.2f} ms"
+        )
+    real_backend()
+
+
+if __name__ == "__main__":
+    main()
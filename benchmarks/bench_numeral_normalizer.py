@@ -0,0 +1,61 @@
+"""
+Замер нормализации числительных на длинной диктовке, где много чисел:
+Rus2Num по всему тексту против StreamingNumeralNormalizer.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_numeral_normalizer.py
+"""
+from __future__ import annotations
+
+import time
+from rus2num import Rus2Num
+
+from app.numeral_normalizer import StreamingNumeralNormalizer
+
+
+TEXT_WORDS = (50, 200, 500, 1000)
+PARTIALS = 30
+
+# Диктовка вида "в рейде двадцать пять человек и сто тысяч золота ..."
+UTTERANCE = "в рейде двадцать пять человек и сто три тысячи золота за два с половиной часа".split()
+
+
+def _dictation(words_count: int) -> list[str]:
+    words = []
+    while len(words) < words_count:
+        words.extend(UTTERANCE)
+    return words[:words_count]
+
+
+def bench(words_count: int) -> tuple[float, float]:
+    words = _dictation(words_count)
+    final_text = " ".join(words)
+    partials = [final_text + " " + " ".join(UTTERANCE[:n]) for n in range(1, PARTIALS + 1)]
+
+    rus_2_num = Rus2Num()
+    started = time.perf_counter()
+    for partial in partials:
+        rus_2_num(partial)
+        rus_2_num(final_text)
+    full_us = (time.perf_counter() - started) / len(partials) * 1_000_000
+
+    normalizer = StreamingNumeralNormalizer()
+    normalizer.normalize(final_text, final_text)
+    started = time.perf_counter()
+    for partial in partials:
+        normalizer.normalize(partial, final_text)
+    streaming_us = (time.perf_counter() - started) / len(partials) * 1_000_000
+
+    return full_us, streaming_us
+
+
+def main():
+    for words_count in TEXT_WORDS:
+        full_us, streaming_us = bench(words_count)
+        print(f"words={words_count:5d}: Rus2Num {full_us:10.1f} us/partial, streaming {streaming_us:10.1f} us/partial")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Замер стоимости одного токена в TextBuilderSession в зависимости от размера таблицы многословных замен.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_smart_tokens.py
+"""
+from __future__ import annotations
+
+import time
+
+from app.tokens_to_text_builder import TextBuilderSession, default_smart_tokens, _SYNTAX_WORD
+
+
+TABLE_SIZES = (0, 100, 1000, 10000)
+TOKENS = 5000
+
+WORDS = "идем в цитадель ледяной короны запятая берем точка с запятой вечный кубок".split()
+
+
+def bench(extra_phrases: int) -> float:
+    smart_tokens = default_smart_tokens.copy()
+    for i in range(extra_phrases):
+        # Фразы заканчиваются теми же словами, что и в диктовке, чтобы дерево было ветвистым
+        smart_tokens.add(_SYNTAX_WORD, f"A{i}", f"сокращение{i} {WORDS[i % len(WORDS)]}")
+
+    session = TextBuilderSession(normalize_numerals=False, smart_tokens=smart_tokens)
+    tokens = [WORDS[i % len(WORDS)] for i in range(TOKENS)]
+
+    started = time.perf_counter()
+    for i in range(0, len(tokens), 10):
+        session.build_text(tokens[i:i + 10], True)
+    elapsed = time.perf_counter() - started
+
+    return elapsed / len(tokens) * 1_000_000
+
+
+def main():
+    for table_size in TABLE_SIZES:
+        print(f"extra phrases={table_size:6d}: {bench(table_size):8.2f} us/token")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Замер стоимости одного частичного результата в TextBuilderSession в зависимости от длины истории.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_tokens_to_text_builder.py
+"""
+from __future__ import annotations
+
+import time
+
+from app.tokens_to_text_builder import TextBuilderSession
+
+
+HISTORY_SIZES = (10, 100, 500, 1000, 2000)
+PARTIALS_PER_SIZE = 300
+
+# Фраза с большим количеством "удалить" и многословными командами
+UTTERANCE = "зима осень удалить лето точка с запятой море удалить песок открывающая скобка волна".split()
+
+
+def _fill_history(session: TextBuilderSession, tokens_count: int):
+    tokens_done = 0
+    while tokens_done < tokens_count:
+        utterance = UTTERANCE[:tokens_count - tokens_done]
+        session.build_text(utterance, True)
+        tokens_done += len(utterance)
+
+
+def _partials():
+    # Гипотезы растут по слову и иногда откатываются назад, как у SpeechKit
+    for n in range(1, len(UTTERANCE) + 1):
+        yield UTTERANCE[:n]
+        if n > 2:
+            yield UTTERANCE[:n - 1]
+            yield UTTERANCE[:n]
+
+
+def bench(history_size: int, normalize_numerals: bool) -> float:
+    session = TextBuilderSession(normalize_numerals=normalize_numerals)
+    _fill_history(session, history_size)
+
+    partials = []
+    while len(partials) < PARTIALS_PER_SIZE:
+        partials.extend(_partials())
+    partials = partials[:PARTIALS_PER_SIZE]
+
+    started = time.perf_counter()
+    for partial in partials:
+        session.build_text(partial, False)
+    elapsed = time.perf_counter() - started
+
+    return elapsed / len(partials) * 1_000_000
+
+
+def main():
+    for normalize_numerals in (False, True):
+        print(f"normalize_numerals={normalize_numerals}")
+        for history_size in HISTORY_SIZES:
+            print(f"  tokens={history_size:5d}: {bench(history_size, normalize_numerals):10.1f} us/partial")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Память TextBuilderSession (tracemalloc) на сеансе диктовки в 1000 слов.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_tokens_to_text_builder_memory.py
+"""
+from __future__ import annotations
+
+import tracemalloc
+
+from app.tokens_to_text_builder import TextBuilderSession
+
+
+WORDS = "зима крестьянин торжествуя на дровнях обновляет путь запятая его лошадка снег почуя плетется рысью как нибудь точка".split()
+WORDS_COUNTS = (250, 500, 1000, 2000)
+UTTERANCE_WORDS = 10
+
+
+def measure(words_count: int, undo_window: int | None) -> tuple[int, int, int]:
+    tokens = [WORDS[i % len(WORDS)] for i in range(words_count)]
+
+    tracemalloc.start()
+    session = TextBuilderSession(normalize_numerals=False, undo_window=undo_window)
+    for i in range(0, len(tokens), UTTERANCE_WORDS):
+        utterance = tokens[i:i + UTTERANCE_WORDS]
+        for n in range(1, len(utterance) + 1):
+            session.build_text(utterance[:n], False)
+        session.build_text(utterance, True)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return current, peak, len(session._text_actions)
+
+
+def main():
+    for undo_window in (None, 100):
+        print(f"undo_window={undo_window}")
+        for words_count in WORDS_COUNTS:
+            current, peak, actions = measure(words_count, undo_window)
+            print(f"  words={words_count:5d}: current={current / 1024:8.1f} KiB, peak={peak / 1024:8.1f} KiB, actions={actions}")
+
+
+if __name__ == "__main__":
+    main()
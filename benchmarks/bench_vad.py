@@ -0,0 +1,67 @@
+"""
+Замер отсева тишины (app.vad) на WAV файлах: сколько секунд аудио ушло бы в SpeechKit из захваченных,
+и во сколько раз быстрее реального времени работает детектор.
+
+Файлы - 16 кГц, 16 бит, моно. Без аргументов - синтетическая запись: фразы через паузы на фоне шума.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_vad.py [file.wav ...]
+"""
+from __future__ import annotations
+
+import sys
+import time
+import wave
+
+import numpy as np
+
+from app.vad import VadGate, SAMPLE_RATE
+
+
+CHUNK_BYTES = SAMPLE_RATE * 2 // 10  # 100 мс, как у app.audio_capture
+
+
+def _read_wav(path: str) -> bytes:
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz 16-bit mono")
+        return f.readframes(f.getnframes())
+
+
+def _synthetic(seconds: int = 120, seed: int = 1) -> bytes:
+    # 3 секунды "речи" (гармоники с огибающей слогов), 5 секунд тишины
+    rnd = np.random.default_rng(seed)
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    signal = rnd.normal(0, 30, len(t))
+    speech = (t % 8) < 3
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 900)))
+    signal += speech * syllables * voice * 3000
+    return np.clip(signal, -32768, 32767).astype(np.int16).tobytes()
+
+
+def bench(name: str, pcm: bytes):
+    gate = VadGate()
+    started = time.perf_counter()
+    for i in range(0, len(pcm), CHUNK_BYTES):
+        gate.process(pcm[i:i + CHUNK_BYTES])
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name}: sent {gate.sent_seconds:7.1f} s of {gate.captured_seconds:7.1f} s "
+        f"({100 * gate.sent_bytes / gate.captured_bytes:5.1f}%), {gate.captured_seconds / elapsed:8.0f}x realtime"
+    )
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            bench(path, _read_wav(path))
+    else:
+        bench("synthetic", _synthetic())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Замер задержки первого частичного результата и пропускной способности по блокам аудио
+на потоковом клиенте app.yandex_speech_kit против локального сервера (app.yandex_speech_kit_local_server).
+
+Запуск:
+
+    set PYTHONPATH=src
+    python benchmarks/bench_yandex_speech_kit_local_server.py
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import app.yandex_speech_kit as yandex_speech_kit
+from app.yandex_speech_kit_local_server import RecognizerServicer, scripted_events, serve
+import app.tracing
+
+
+CHUNK_MS = 100
+CHUNK = b"\x00\x00" * (16000 * CHUNK_MS // 1000)
+SCRIPT = ["зима лето точка", "осень запятая весна"]
+LATENCIES = ((0, 0), (50, 0), (80, 30), (200, 50))
+RUNS = 20
+THROUGHPUT_CHUNKS = 5000
+
+
+def _paced_chunks(count: int, sent_ns: list[int]):
+    for _ in range(count):
+        sent_ns.append(time.perf_counter_ns())
+        yield CHUNK
+        time.sleep(CHUNK_MS / 1000)
+
+
+def first_partial_ms(servicer: RecognizerServicer) -> list[float]:
+    # Первый ответ по сценарию приходит после первого блока аудио
+    servicer.events = scripted_events(SCRIPT, word_ms=CHUNK_MS)
+    results = []
+    for _ in range(RUNS):
+        sent_ns = []
+        received_ns = []
+
+        def callback(alternatives: list[str], is_final: bool):
+            if not received_ns:
+                received_ns.append(time.perf_counter_ns())
+
+        yandex_speech_kit.recognize(
+            yandex_speech_kit.streaming_requests(_paced_chunks(2, sent_ns)), threading.Event(), callback
+        )
+        results.append((received_ns[0] - sent_ns[0]) / 1e6)
+    results.sort()
+    return results
+
+
+def chunks_per_second(servicer: RecognizerServicer) -> float:
+    servicer.events = scripted_events(SCRIPT * (THROUGHPUT_CHUNKS // 6), word_ms=CHUNK_MS)
+    chunks_before = servicer.chunks
+
+    started = time.perf_counter()
+    yandex_speech_kit.recognize(
+        yandex_speech_kit.streaming_requests(CHUNK for _ in range(THROUGHPUT_CHUNKS)),
+        threading.Event(),
+        lambda alternatives, is_final: None
+    )
+    elapsed = time.perf_counter() - started
+
+    return (servicer.chunks - chunks_before) / elapsed
+
+
+def main():
+    servicer = RecognizerServicer([], seed=1)
+    server, port = serve(servicer)
+    try:
+        yandex_speech_kit.speechkit_endpoint = f"localhost:{port}"
+        yandex_speech_kit.resource_manager_endpoint = f"localhost:{port}"
+        yandex_speech_kit.yandex_speech_kit_init("local-secret")
+
+        for latency_ms, jitter_ms in LATENCIES:
+            servicer.latency_ms = latency_ms
+            servicer.jitter_ms = jitter_ms
+            values = first_partial_ms(servicer)
+            print(
+                f"latency={latency_ms:4d} ms jitter={jitter_ms:3d} ms: first partial "
+                f"p50={app.tracing.percentile(values, 50):7.1f} ms p95={app.tracing.percentile(values, 95):7.1f} ms"
+            )
+
+        servicer.latency_ms = 0
+        servicer.jitter_ms = 0
+        print(f"throughput: {chunks_per_second(servicer):10.0f} chunks/s ({CHUNK_MS} ms chunks)")
+    finally:
+        yandex_speech_kit.yandex_speech_kit_shutdown()
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Цикл asyncio для конвейера распознавания (WOW_STT_RUNTIME=asyncio).
+
+Вместо потока на каждый сеанс распознавания и threading.Timer на каждый переход режима - один цикл событий
+в своем потоке: поток в SpeechKit через grpc.aio, чтение захвата через app.ring_buffer.AsyncRingReader,
+таймеры через loop.call_later. Сеанс - задача, остановить его - отменить задачу.
+
+Код обработчиков (RecordingTextsProcessor, переходы режимов, оверлей) синхронный и может блокировать
+(отправка в чат печатает в игру), поэтому он выполняется не в цикле, а в одном потоке "processors" - по очереди.
+Распознаватель команд (Vosk) остается в основном потоке или в отдельном процессе (app.idle_worker).
+
+По умолчанию (WOW_STT_RUNTIME=threads) все как раньше: потоки и threading.Timer.
+"""
+from __future__ import annotations
+import asyncio
+import concurrent.futures
+import os
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any, TypeVar
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_ENV = "WOW_STT_RUNTIME"
+RUNTIMES = ("threads", "asyncio")
+runtime_name = os.environ.get(RUNTIME_ENV, "threads")
+
+T = TypeVar("T")
+
+
+class AsyncRuntime:
+    """Цикл событий в отдельном потоке (запускается при первом обращении) и поток для синхронных обработчиков."""
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._processors: concurrent.futures.ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # После stop() цикл больше не поднимается: выход из программы не должен запускать его заново
+        self._stopped = False
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop | None:
+        # Цикл поднимается при первом обращении; после stop() - None, заново не поднимается
+        with self._lock:
+            if self._stopped:
+                return None
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._processors = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="processors")
+                self._thread = threading.Thread(target=self._loop.run_forever, name="asyncio", daemon=True)
+                self._thread.start()
+                logger.debug("Event loop started")
+            return self._loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        loop = self._get_loop()
+        if loop is None:
+            raise RuntimeError("Async runtime is stopped")
+        return loop
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Запускает корутину в цикле из любого потока. После stop() - сразу отмененный Future, корутина не идет."""
+        loop = self._get_loop()
+        if loop is not None:
+            try:
+                return asyncio.run_coroutine_threadsafe(coroutine, loop)
+            except RuntimeError:
+                # Цикл закрыли между проверкой и постановкой
+                pass
+        logger.debug("Runtime stopped, coroutine %r dropped", coroutine)
+        coroutine.close()
+        future: concurrent.futures.Future[T] = concurrent.futures.Future()
+        future.cancel()
+        return future
+
+    def call_soon(self, callback: Callable[..., Any], *args):
+        """callback(*args) в потоке цикла. Только для быстрого неблокирующего кода. После stop() - ничего не делает."""
+        loop = self._get_loop()
+        if loop is None:
+            logger.debug("Runtime stopped, callback %r dropped", callback)
+            return
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Цикл закрыли между проверкой и постановкой
+            logger.debug("Runtime stopped, callback %r dropped", callback)
+
+    async def run_processor(self, callback: Callable[..., T], *args) -> T:
+        """Синхронный обработчик - в потоке processors, не останавливая цикл."""
+        return await self.loop.run_in_executor(self._processors, callback, *args)
+
+    def call_later(self, delay: float, callback: Callable[..., Any], *args):
+        """callback(*args) через delay секунд, в потоке processors. После stop() - ничего не делает."""
+        loop = self._get_loop()
+        if loop is None:
+            logger.debug("Runtime stopped, timer %r dropped", callback)
+            return
+
+        def on_timer():
+            processors = self._processors
+            if processors is None:
+                logger.debug("Runtime stopped, timer %r dropped", callback)
+                return
+            try:
+                processors.submit(_log_errors, callback, *args)
+            except RuntimeError:
+                # Обработчики уже остановлены
+                logger.debug("Runtime stopped, timer %r dropped", callback)
+
+        try:
+            loop.call_soon_threadsafe(loop.call_later, delay, on_timer)
+        except RuntimeError:
+            # Цикл закрыли между проверкой и постановкой таймера
+            logger.debug("Runtime stopped, timer %r dropped", callback)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            self._stopped = True
+            loop, thread, processors = self._loop, self._thread, self._processors
+            self._loop = self._thread = self._processors = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        processors.shutdown(wait=False, cancel_futures=True)
+        if not loop.is_running():
+            loop.close()
+
+
+def _log_errors(callback: Callable[..., Any], *args):
+    # Как у threading.Timer: исключение в таймере не должно пропасть молча
+    try:
+        callback(*args)
+    except Exception:
+        logger.exception("Timer callback failed")
+
+
+runtime = AsyncRuntime()
+
+
+def is_asyncio() -> bool:
+    if runtime_name not in RUNTIMES:
+        raise ValueError(f"Unknown runtime {runtime_name!r}, expected one of {RUNTIMES}")
+    return runtime_name == "asyncio"
+
+
+def call_later(delay: float, callback: Callable[..., Any], *args):
+    """Таймер для переходов режимов, оверлея и т.п.: threading.Timer или call_later цикла, смотря по WOW_STT_RUNTIME."""
+    if is_asyncio():
+        runtime.call_later(delay, callback, *args)
+        return
+    timer = threading.Timer(delay, callback, args)
+    timer.daemon = True
+    timer.start()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+
+import sounddevice as sd
+
+from app.ring_buffer import RingBuffer, RingReader, SharedRingBuffer
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 1600  # 0.1 секунды
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # 16 бит, моно
+BLOCK_BYTES = BLOCK_SIZE * 2
+
+# Сколько аудио держим в кольце. Кратно блоку, чтобы блоки не переходили через конец буфера.
+BUFFER_SECONDS = 10
+BUFFER_BYTES = BUFFER_SECONDS * SAMPLE_RATE // BLOCK_SIZE * BLOCK_BYTES
+
+# Распознаватель команд в отдельном процессе (app.idle_worker). Тогда захват пишется в общую память.
+IDLE_PROCESS = os.environ.get("WOW_STT_IDLE_PROCESS", "0") == "1"
+
+
+class AudioCapture:
+    """
+    Единственный захват с микрофона на все приложение.
+
+    Поток открывается один раз и пишет в RingBuffer. Распознаватель команд (Vosk) и поток в SpeechKit
+    читают его своими RingReader, каждый со своей позиции.
+    """
+
+    def __init__(self, shared: bool = False):
+        self.ring = SharedRingBuffer(BUFFER_BYTES) if shared else RingBuffer(BUFFER_BYTES)
+        self._stream: sd.RawInputStream | None = None
+        self._lock = threading.Lock()
+
+    def _callback(self, indata, frames, time_info, status):
+        # Сообщаем статус аудио устройства, если нужно
+        if status:
+            logger.debug("status=%s", status)
+        self.ring.write(indata)
+
+    def start(self):
+        with self._lock:
+            if self._stream is not None:
+                return
+            self._stream = sd.RawInputStream(
+                samplerate=SAMPLE_RATE,  # Частота дискретизации - 16 000 сэмплов в секунду
+                blocksize=BLOCK_SIZE,  # В одном блоке - 1600 сэмплов. Это - 0.1 секунды
+                dtype='int16',  # Каждый сэмпл - это 16 бит.
+                channels=1,  # Один канал (моно)
+                callback=self._callback
+            )
+            self._stream.start()
+            logger.info("Audio capture started")
+
+    def stop(self):
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def reader(self, start_pos: int | None = None) -> RingReader:
+        self.start()
+        return self.ring.reader(start_pos)
+
+
+# Процесс app.idle_worker при запуске (spawn) тоже импортирует этот модуль - там общая память не создается,
+# он подключается к сегменту основного процесса по имени
+capture = AudioCapture(shared=IDLE_PROCESS and multiprocessing.parent_process() is None)
@@ -1,13 +1,10 @@
-import threading
-import queue
-import winsound
+import os
+
+import app.cue_engine
 from app.app_logging import logging
 
 logger = logging.getLogger(__name__)
 
-# Очередь звуковых событий
-sound_queue = queue.Queue()
-
 # Набор звуков под разные события
 SOUND_MAP = {
     "editing_cancelled": ("beep", (110, 300)),
@@ -19,45 +16,35 @@ SOUND_MAP = {
     "sending_error":     ("beep", (110, 300)),
 }
 
-
-def sound_worker():
-    while True:
-        event = sound_queue.get()
-        if event is None:
-            # возможность аккуратно завершить поток, если понадобится
-            break
-
-        play_sound_sync(event)
-        sound_queue.task_done()
+# Куда играть сигналы:
+#   sounddevice - в динамики;
+#   null        - никуда;
+#   file:<путь> - в WAV-файл (проверки без звуковой карты).
+CUES_BACKEND_ENV = "WOW_STT_CUES"
 
 
-def play_sound_sync(event):
-    kind, params = SOUND_MAP.get(event, (None, None))
-    if kind == "beep":
-        freq, dur = params
-        try:
-            logger.debug(f">>>>>>>>>>>>>>>>>>>>>>>>>>>>> event={event}, kind={kind}, freq={freq}, freq={dur}")
-            winsound.Beep(freq, dur)
-            logger.debug(f"<<<<<<<<<<<<<<<<<<<<<<<<<<<<< event={event}, kind={kind}, freq={freq}, freq={dur}")
-        except RuntimeError:
-            # например, если нет звукового устройства
-            pass
+def make_backend(spec: str):
+    if spec == "sounddevice":
+        return app.cue_engine.SoundDeviceBackend()
+    if spec == "null":
+        return app.cue_engine.NullBackend()
+    if spec.startswith("file:"):
+        return app.cue_engine.FileBackend(spec[len("file:"):])
+    raise ValueError(f"Unknown {CUES_BACKEND_ENV} {spec!r}, expected sounddevice, null or file:<path>")
 
 
-# Запускаем поток-работник
-sound_thread = threading.Thread(target=sound_worker, daemon=True)
-sound_thread.start()
+# Тоны синтезируются здесь, один раз. Вывод открывается в start().
+engine = app.cue_engine.CueEngine(SOUND_MAP, make_backend(os.environ.get(CUES_BACKEND_ENV, "sounddevice")))
 
 
-def play_sound_async(event_name: str):
-    """Поставить событие в очередь на озвучивание."""
-    # Можно сделать защиту от переполнения очереди:
-    if sound_queue.qsize() < 20:
-        sound_queue.put(event_name)
+def start():
+    engine.start()
 
 
-def play_sound_stub(event_name: str):
-    pass
+def stop():
+    engine.stop()
 
 
-play_sound = play_sound_sync
+def play_sound(event_name: str):
+    """Сигнал на событие. Не ждет звука: только ставит готовый буфер в микшер."""
+    engine.play(event_name)
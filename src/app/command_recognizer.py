@@ -0,0 +1,130 @@
+"""
+Распознавание команд (Vosk) по кускам захвата - общее для режима ожидания в основном процессе
+и для отдельного процесса (app.idle_worker). Поэтому здесь ничего тяжелого из приложения не импортируется.
+"""
+from __future__ import annotations
+import json
+from importlib import resources
+from typing import NamedTuple
+
+from vosk import Model, KaldiRecognizer
+
+import app.ring_buffer
+import app.vad
+from app.vad import SAMPLE_RATE
+
+
+# путь к распакованной русской модели Vosk
+IDLE_MODEL_PATH = resources.files("resources") / "vosk-model-small-ru-0.22"
+
+# Сколько держать распознаватель после речи и сколько тишины перед речью ему отдать, чтобы не срезать начало слова
+IDLE_VAD_HANGOVER_MS = 500
+IDLE_VAD_LOOKBACK_MS = 300
+
+# Слова-триггеры
+ACTIVATE_WORD_TO_CHAT_CHANNEL = {"бой": "bg", "сказать": "s", "крикнуть": "y", "гильдия": "g"}
+# todo Вытащить как-то из списка команд
+ACTIVATE_WORDS = ACTIVATE_WORD_TO_CHAT_CHANNEL.keys()
+
+COMMAND_GRAMMAR = json.dumps(list(ACTIVATE_WORDS) + ["[unk]"], ensure_ascii=False)
+
+
+class TextAndIsFinal(NamedTuple):
+    text: str
+    is_final: bool
+    # Позиция в app.audio_capture.capture.ring, где закончилось слово-триггер, если оно есть в тексте
+    hotword_end_pos: int | None = None
+
+
+class CommandRecognizer:
+    """
+    KaldiRecognizer и то, какие куски захвата в него поданы.
+
+    Времена слов у Vosk - от создания распознавателя, и после Reset() тоже,
+    поэтому соответствие позициям захвата живет вместе с ним, в том числе в пуле.
+    """
+
+    __slots__ = ("kaldi", "positions")
+
+    def __init__(self, kaldi: KaldiRecognizer):
+        self.kaldi = kaldi
+        self.positions = app.ring_buffer.PositionMap()
+
+
+def build_command_recognizer(model: Model, grammar: str) -> CommandRecognizer:
+    kaldi = KaldiRecognizer(model, SAMPLE_RATE, grammar)
+    # Времена слов нужны, чтобы найти в захвате конец слова-триггера
+    kaldi.SetWords(True)
+    kaldi.SetPartialWords(True)
+    return CommandRecognizer(kaldi)
+
+
+def reset_command_recognizer(recognizer: CommandRecognizer):
+    recognizer.kaldi.Reset()
+
+
+class CommandDecoder:
+    """
+    Подает куски захвата в распознаватель команд и разбирает его ответы.
+
+    С отсевом тишины (use_vad) Kaldi будится только на речь, а когда речь кончилась - фраза закрывается FinalResult().
+    """
+
+    def __init__(self, recognizer: CommandRecognizer, use_vad: bool):
+        self.recognizer = recognizer
+        self.gate = app.vad.VadGate(hangover_ms=IDLE_VAD_HANGOVER_MS, lookback_ms=IDLE_VAD_LOOKBACK_MS) if use_vad else None
+        # Распознаватель получил речь, и фраза еще не закрыта
+        self.has_speech = False
+
+    def _hotword_end_pos(self, words: list[dict]) -> int | None:
+        # Времена слов у Vosk - в секундах от начала аудио, поданного в этот распознаватель
+        for word in reversed(words):
+            if word.get("word") in ACTIVATE_WORDS:
+                return self.recognizer.positions.ring_pos(int(word["end"] * SAMPLE_RATE) * 2)
+        return None
+
+    def _text_and_is_final(self, result_json: str, is_final: bool) -> TextAndIsFinal | None:
+        if is_final:
+            full_result = json.loads(result_json)
+            text = full_result.get("text", "")
+            words = full_result.get("result", [])
+        else:
+            partial_result = json.loads(result_json)
+            text = partial_result.get("partial", "")
+            words = partial_result.get("partial_result", [])
+        if not text:
+            return None
+        return TextAndIsFinal(text, is_final, self._hotword_end_pos(words))
+
+    def feed(self, data, end_pos: int) -> list[TextAndIsFinal]:
+        """Кусок захвата, кончающийся на позиции end_pos в кольце. Возвращает распознанное."""
+        kaldi = self.recognizer.kaldi
+        results = []
+
+        if self.gate is None:
+            # Vosk (cffi) принимает только bytes - копируем на границе
+            chunks = [bytes(data)]
+        else:
+            chunks = self.gate.process(data)
+            if not chunks:
+                # Тишина. Если до нее была речь - закрываем фразу, дальше Kaldi не работает до новой речи
+                if self.has_speech:
+                    self.has_speech = False
+                    text_and_is_final = self._text_and_is_final(kaldi.FinalResult(), True)
+                    if text_and_is_final:
+                        results.append(text_and_is_final)
+                return results
+
+        self.has_speech = True
+        chunks_pos = end_pos - sum(len(chunk) for chunk in chunks)
+        for chunk in chunks:
+            self.recognizer.positions.feed(chunks_pos, len(chunk))
+            chunks_pos += len(chunk)
+
+            is_final = kaldi.AcceptWaveform(chunk)
+            if is_final:
+                self.has_speech = False
+            text_and_is_final = self._text_and_is_final(kaldi.Result() if is_final else kaldi.PartialResult(), is_final)
+            if text_and_is_final:
+                results.append(text_and_is_final)
+        return results
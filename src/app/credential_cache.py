@@ -0,0 +1,167 @@
+"""
+Токены Яндекса на диске и обновление IAM-токена в фоне.
+
+В файле (WOW_STT_CREDENTIALS_FILE, по умолчанию ~/.wow-speech-to-text/credentials.json) лежат OAuth-токены
+(в том числе refresh token) и IAM-токен со сроком. Если IAM-токен из файла еще жив, программа стартует без
+браузера и без сети; если нет - получает новый по refresh token (см. app.yandex_cloud_oauth.get_credentials).
+
+Файл пишется с правами 0600 (каталог - 0700), через временный файл и os.replace, чтобы не остаться с половиной
+файла. На Windows права доступа так не задать - там файл защищает только то, что он в профиле пользователя.
+
+IamRefresher обновляет IAM-токен заранее, за REFRESH_LEAD_S до конца срока, и отдает новый в on_token.
+"""
+from __future__ import annotations
+import datetime
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_FILE_ENV = "WOW_STT_CREDENTIALS_FILE"
+DEFAULT_CREDENTIALS_FILE = Path.home() / ".wow-speech-to-text" / "credentials.json"
+
+# IAM-токен живет до 12 часов; обновляем за час до конца срока
+REFRESH_LEAD_S = 3600.0
+# Если обновить не вышло - через сколько пробовать снова
+RETRY_S = 30.0
+
+
+class Credentials(NamedTuple):
+    oauth_access_token: str
+    oauth_refresh_token: str | None
+    # Сроки - секунды эпохи (time.time())
+    oauth_expires_at: float | None
+    iam_token: str
+    iam_expires_at: float
+
+    def iam_valid(self, margin_s: float = 0.0, now: float | None = None) -> bool:
+        return self.iam_expires_at - margin_s > (time.time() if now is None else now)
+
+    def oauth_valid(self, margin_s: float = 0.0, now: float | None = None) -> bool:
+        if self.oauth_expires_at is None:
+            return True
+        return self.oauth_expires_at - margin_s > (time.time() if now is None else now)
+
+
+def credentials_path() -> Path:
+    return Path(os.environ.get(CREDENTIALS_FILE_ENV) or DEFAULT_CREDENTIALS_FILE)
+
+
+def parse_expires_at(value: str) -> float:
+    """expiresAt от IAM ("2024-05-01T12:00:00.123456789Z") -> секунды эпохи. Наносекунды fromisoformat не понимает."""
+    value = value.replace("Z", "+00:00")
+    if "." in value:
+        head, tail = value.split(".", 1)
+        digits = len(tail) - len(tail.lstrip("0123456789"))
+        value = f"{head}.{tail[:min(digits, 6)]}{tail[digits:]}"
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def load(path: Path) -> Credentials | None:
+    """None - файла нет или его не прочитать (тогда токены получаем заново)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return Credentials(**{field: data[field] for field in Credentials._fields})
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Credentials file %s is unreadable (%r), ignoring it", path, e)
+        return None
+
+
+def save(path: Path, credentials: Credentials):
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    # Права задаем при создании: между созданием и chmod файл не должен быть читаем другим
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(credentials._asdict(), f, ensure_ascii=False, indent=2)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class IamRefresher:
+    """
+    Поток, который обновляет IAM-токен за lead_s до конца срока.
+
+    refresh(старые токены) -> новые токены; делает сетевые запросы (app.yandex_cloud_oauth.refresh_iam).
+    Новые токены сохраняются в файл (save) и IAM-токен уходит в on_token. Ошибка - повтор через retry_s.
+    """
+
+    def __init__(
+            self,
+            credentials: Credentials,
+            refresh: Callable[[Credentials], Credentials],
+            on_token: Callable[[str], None],
+            save: Callable[[Credentials], None] | None = None,
+            lead_s: float = REFRESH_LEAD_S,
+            retry_s: float = RETRY_S,
+    ):
+        self.credentials = credentials
+        self._refresh = refresh
+        self._on_token = on_token
+        self._save = save
+        self.lead_s = lead_s
+        self.retry_s = retry_s
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Для проверок и логов
+        self.refreshes = 0
+        self.failures = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="iam-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _refresh_in(self, credentials: Credentials) -> float:
+        left_s = credentials.iam_expires_at - time.time()
+        # Токен живет меньше lead_s - обновляем на середине срока, а не сразу и без конца
+        return max(left_s - self.lead_s, left_s / 2)
+
+    def _run(self):
+        wait_s = self._refresh_in(self.credentials)
+        while not self._stop.wait(max(wait_s, 0.0)):
+            try:
+                credentials = self._refresh(self.credentials)
+            except Exception as e:
+                self.failures += 1
+                wait_s = self.retry_s
+                logger.warning(
+                    "IAM token refresh failed (%r), retry in %.0f s, token expires in %.0f s",
+                    e, wait_s, self.credentials.iam_expires_at - time.time(),
+                )
+                continue
+
+            self.credentials = credentials
+            self.refreshes += 1
+            if self._save is not None:
+                try:
+                    self._save(credentials)
+                except OSError as e:
+                    logger.warning("Could not save credentials: %r", e)
+            self._on_token(credentials.iam_token)
+            wait_s = self._refresh_in(credentials)
+            logger.info("IAM token refreshed, next refresh in %.0f s", wait_s)
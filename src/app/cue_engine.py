@@ -0,0 +1,211 @@
+"""
+Звуковые сигналы без блокировки: тоны синтезируются заранее, один раз, а играет их микшер в потоке вывода.
+
+CueEngine.play() только кладет готовый буфер в очередь микшера - это микросекунды, вызывающий поток не ждет звука.
+Куда идет звук, решает backend: SoundDeviceBackend (динамики, через sounddevice), FileBackend (WAV-файл,
+для проверок без звуковой карты) или NullBackend (никуда).
+"""
+from __future__ import annotations
+import collections
+import threading
+import time
+import wave
+from collections.abc import Mapping
+
+import numpy as np
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 44100
+# Сколько сигналов может ждать микшера. Лишние отбрасываются, а не копятся.
+MAX_PENDING = 32
+
+
+def synthesize_tone(freq: float, duration_ms: int, sample_rate: int = SAMPLE_RATE, volume: float = 0.3, fade_ms: int = 5) -> np.ndarray:
+    """Синус float32 с плавными краями (без щелчков в начале и конце)."""
+    samples = sample_rate * duration_ms // 1000
+    t = np.arange(samples, dtype=np.float32) / sample_rate
+    tone = np.sin(2 * np.pi * freq * t).astype(np.float32) * volume
+
+    fade = min(sample_rate * fade_ms // 1000, samples // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        tone[:fade] *= ramp
+        tone[-fade:] *= ramp[::-1]
+    return tone
+
+
+def synthesize_cues(sound_map: Mapping[str, tuple[str, tuple]], sample_rate: int = SAMPLE_RATE) -> dict[str, np.ndarray]:
+    """PCM для каждого события из карты звуков вида {событие: ("beep", (частота, мс))}."""
+    cues = {}
+    for event, (kind, params) in sound_map.items():
+        if kind == "beep":
+            freq, duration_ms = params
+            cues[event] = synthesize_tone(freq, duration_ms, sample_rate)
+        else:
+            logger.warning("Unknown sound kind %r for %r", kind, event)
+    return cues
+
+
+class Mixer:
+    """
+    Складывает звучащие сигналы в один поток. add() - из любого потока, render() - только из потока вывода.
+
+    Очередь - deque: append и popleft в CPython атомарны, поэтому add() не берет блокировок.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self._pending: collections.deque[np.ndarray] = collections.deque(maxlen=max_pending)
+        # (буфер, сколько уже сыграно)
+        self._voices: list[list] = []
+
+    @property
+    def active(self) -> bool:
+        return bool(self._voices or self._pending)
+
+    def add(self, samples: np.ndarray):
+        self._pending.append(samples)
+
+    def render(self, frames: int) -> np.ndarray:
+        out = np.zeros(frames, dtype=np.float32)
+        while self._pending:
+            self._voices.append([self._pending.popleft(), 0])
+
+        for voice in self._voices:
+            samples, offset = voice
+            chunk = samples[offset:offset + frames]
+            out[:len(chunk)] += chunk
+            voice[1] = offset + len(chunk)
+        self._voices = [voice for voice in self._voices if voice[1] < len(voice[0])]
+
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+
+class NullBackend:
+    """Никуда не играет."""
+
+    def start(self, mixer: Mixer, sample_rate: int):
+        ...
+
+    def stop(self):
+        ...
+
+
+class FileBackend:
+    """
+    Пишет сигналы в WAV (16 бит, моно) - для проверок на машинах без звука.
+
+    Поток вывода каждые block_ms забирает из микшера блок и пишет его, если что-то звучит. Тишина между
+    сигналами не пишется, так что файл - это сигналы подряд.
+    """
+
+    def __init__(self, path: str, block_ms: int = 10):
+        self.path = path
+        self.block_ms = block_ms
+        self._mixer: Mixer | None = None
+        self._block = 0
+        self._file: wave.Wave_write | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.frames_written = 0
+
+    def start(self, mixer: Mixer, sample_rate: int):
+        self._mixer = mixer
+        self._block = sample_rate * self.block_ms // 1000
+        self._file = wave.open(self.path, "wb")
+        self._file.setnchannels(1)
+        self._file.setsampwidth(2)
+        self._file.setframerate(sample_rate)
+        self._thread = threading.Thread(target=self._run, name="cues-file", daemon=True)
+        self._thread.start()
+
+    def _write_block(self):
+        block = self._mixer.render(self._block)
+        self._file.writeframes((block * 32767).astype("<i2").tobytes())
+        self.frames_written += len(block)
+
+    def _run(self):
+        while not self._stop.wait(self.block_ms / 1000):
+            while self._mixer.active:
+                self._write_block()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # Доигрываем то, что уже в микшере
+        while self._mixer.active:
+            self._write_block()
+        self._file.close()
+
+
+class SoundDeviceBackend:
+    """В динамики, через sounddevice. Поток вывода открыт все время: открывать его на каждый сигнал - долго."""
+
+    def __init__(self, block_ms: int = 10):
+        self.block_ms = block_ms
+        self._stream = None
+
+    def start(self, mixer: Mixer, sample_rate: int):
+        import sounddevice as sd
+
+        def callback(outdata, frames, time_info, status):
+            if status:
+                logger.debug("status=%s", status)
+            outdata[:, 0] = mixer.render(frames)
+
+        self._stream = sd.OutputStream(
+            samplerate=sample_rate,
+            blocksize=sample_rate * self.block_ms // 1000,
+            channels=1,
+            dtype="float32",
+            latency="low",
+            callback=callback,
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream.close()
+        self._stream = None
+
+
+class CueEngine:
+
+    def __init__(self, sound_map: Mapping[str, tuple[str, tuple]], backend, sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        started = time.perf_counter()
+        self.cues = synthesize_cues(sound_map, sample_rate)
+        logger.debug("%s cues synthesized in %.1f ms", len(self.cues), (time.perf_counter() - started) * 1000)
+        self.mixer = Mixer()
+        self.backend = backend
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        try:
+            self.backend.start(self.mixer, self.sample_rate)
+        except Exception as e:
+            # например, если нет звукового устройства
+            logger.warning("Sound output unavailable (%s), cues are muted", e)
+            self.backend = NullBackend()
+        self._started = True
+
+    def stop(self):
+        if self._started:
+            self.backend.stop()
+            self._started = False
+
+    def play(self, event: str):
+        samples = self.cues.get(event)
+        if samples is not None:
+            self.mixer.add(samples)
@@ -1,20 +1,28 @@
 from __future__ import annotations
-import json
-import queue
-from importlib import resources
-from typing import NamedTuple
+import concurrent.futures
+import os
+import threading
+import time
 from collections.abc import Generator
 
-import sounddevice as sd
-from vosk import Model, KaldiRecognizer
+from vosk import Model
 
 import app.overlay
+import app.audio_capture
+import app.recognizer_pool
+import app.idle_worker
+from app.audio_capture import BLOCK_BYTES, IDLE_PROCESS
+from app.command_recognizer import (
+    IDLE_MODEL_PATH, COMMAND_GRAMMAR,
+    TextAndIsFinal, CommandRecognizer, CommandDecoder, build_command_recognizer, reset_command_recognizer,
+)
 from app.beeps import play_sound
 import app.commands
 import app.keyboard.keyboard_sender
 import app.keyboard.clipboard_copier
 import app.wow_chat_sender
 import app.recognize_thread
+import app.session_recorder
 import app.mode_container
 import app.recording_processor
 
@@ -24,81 +32,117 @@ from app.app_logging import logging, TRACE
 logger = logging.getLogger(__name__)
 
 
-# Папка, где лежит текущий .py файл
-BASE_DIR = resources.files("resources")
-
-# путь к распакованной русской модели Vosk
-
-SAMPLE_RATE = 16000
-BLOCK_SIZE = 1600
-
-IDLE_MODEL_PATH = BASE_DIR / "vosk-model-small-ru-0.22"
-
-# Слова-триггеры
-ACTIVATE_WORD_TO_CHAT_CHANNEL = {"бой": "bg", "сказать": "s", "крикнуть": "y", "гильдия": "g"}
-# todo Вытащить как-то из списка команд
-ACTIVATE_WORDS = ACTIVATE_WORD_TO_CHAT_CHANNEL.keys()
-
-
-class TextAndIsFinal(NamedTuple):
-    text: str
-    is_final: bool
+# Будить распознаватель команд только на речь (app.vad). Без этого Kaldi работает всегда, и в тишине тоже.
+IDLE_VAD = os.environ.get("WOW_STT_IDLE_VAD", "1") != "0"
 
 
 class IdleProcessor(app.mode_container.ModeProcessor):
 
     prev_partial_text: str | None = None
-
-    q = queue.Queue()  # очередь аудио-данных
+    hotword_end_pos: int | None = None
 
     recording_processor: app.recording_processor.RecordingTextsProcessor
 
     def __init__(self, mode_container: app.mode_container.ModeContainer):
-        super().__init__(mode_container, "idle")
+        super().__init__(mode_container, app.mode_container.MODE_IDLE)
+        mode_container.subscribe(self.on_mode_changed)
+        self._model_future: concurrent.futures.Future[Model] | None = None
+        self.recognizer_pool = app.recognizer_pool.RecognizerPool(
+            self._build_command_recognizer, reset_command_recognizer, size=2
+        )
+        # Распознаватель команд в отдельном процессе (WOW_STT_IDLE_PROCESS=1)
+        self.worker: app.idle_worker.IdleWorker | None = None
 
     def set_recording_processor(self, recording_processor: app.recording_processor.RecordingTextsProcessor):
         self.recording_processor = recording_processor
 
-    # Наш обработчик данных от sounddevice
-    def audio_callback(self, indata, frames, time_info, status):
-        # Сообщаем статус аудио устройства, если нужно
-        if status:
-            logger.debug("status=%s", status)
-
-        # Достаем байты из indata. Кладем эти байты в очередь, на которой у нас сидит vosk
-        self.q.put(bytes(indata))
-
-    def init_audio_stream(self):
-        return sd.RawInputStream(
-            samplerate=SAMPLE_RATE,  # Частота дискретизации - 16 000 сэмплов в секунду
-            blocksize=BLOCK_SIZE,  # В одном блоке - 1600 сэмплов. Это - 0.1 секунды, т.к. частота дискретизации - 16 000 сэмплов в секунду
-            dtype='int16',  # Каждый сэмпл - это 16 бит.
-            channels=1,  # Один канал (моно)
-            callback=self.audio_callback
+    def start_loading_model(self):
+        """Загружаем модель Vosk и собираем распознаватели команд в фоне, пока идет OAuth и прочий запуск."""
+        if IDLE_PROCESS:
+            self._start_worker()
+            return
+        if self._model_future is not None:
+            return
+        self._model_future = concurrent.futures.Future()
+        threading.Thread(target=self._load_model, name="vosk-model", daemon=True).start()
+
+    def load_model(self):
+        """Для запуска (app.startup): дождаться модели Vosk. В отдельном процессе - только запустить его."""
+        self.start_loading_model()
+        if not IDLE_PROCESS:
+            self.get_model()
+
+    def _load_model(self):
+        started = time.perf_counter()
+        try:
+            model = Model(str(IDLE_MODEL_PATH))
+        except BaseException as e:
+            self._model_future.set_exception(e)
+            return
+        logger.info("Vosk model loaded in %.0f ms", (time.perf_counter() - started) * 1000)
+        self._model_future.set_result(model)
+
+        self.recognizer_pool.warm(COMMAND_GRAMMAR)
+        logger.info("Command recognizers ready in %.0f ms", (time.perf_counter() - started) * 1000)
+
+    def get_model(self) -> Model:
+        self.start_loading_model()
+        started = time.perf_counter()
+        model = self._model_future.result()
+        waited_ms = (time.perf_counter() - started) * 1000
+        if waited_ms >= 1:
+            logger.info("Waited %.0f ms for Vosk model", waited_ms)
+        return model
+
+    def _build_command_recognizer(self, grammar: str) -> CommandRecognizer:
+        return build_command_recognizer(self.get_model(), grammar)
+
+    def _start_worker(self):
+        if self.worker is not None:
+            return
+        ring = app.audio_capture.capture.ring
+        self.worker = app.idle_worker.IdleWorker(
+            ring.name, ring.capacity, BLOCK_BYTES, str(IDLE_MODEL_PATH), COMMAND_GRAMMAR, IDLE_VAD
         )
+        self.worker.start()
 
     def get_command_recognizer_texts(self) -> Generator[TextAndIsFinal, None, None]:
+        if IDLE_PROCESS:
+            yield from self._get_worker_texts()
+        else:
+            yield from self._get_local_texts()
+
+    def _get_worker_texts(self) -> Generator[TextAndIsFinal, None, None]:
+        # Kaldi работает в отдельном процессе, здесь - только события с командами.
+        # Слушать и не слушать ему говорит on_mode_changed, сразу при переходе.
+        self._start_worker()
+        app.audio_capture.capture.start()
+        logger.info("Начали слушать микрофон. Скажите одну из команд старта, чтобы начать диктовку.")
+        play_sound(self.mode_container.mode)
+        if self.mode_container.mode in app.mode_container.LISTENING_MODES:
+            self.worker.listen(app.audio_capture.capture.ring.write_pos)
 
-        model = Model(str(IDLE_MODEL_PATH))
-        grammar = json.dumps(list(ACTIVATE_WORDS) + ["[unk]"], ensure_ascii=False)
-
-        def get_command_recognizer():
-            # return recording_recognizer
-            return KaldiRecognizer(model, SAMPLE_RATE, grammar)
+        while True:
+            event = self.worker.get_event(timeout=1)
+            if event is not None:
+                yield TextAndIsFinal(event.text, event.is_final, event.hotword_end_pos)
 
-        # Теперь будем работать с микрофоном через модуль sounddevice (локально - sd).
-        # Открываем сырой входящий поток звуковых данных.
-        stream = self.init_audio_stream()
-        stream.start()
+    def _get_local_texts(self) -> Generator[TextAndIsFinal, None, None]:
+        # Читаем общий захват с микрофона (app.audio_capture) своим курсором.
+        reader = app.audio_capture.capture.reader()
 
         # Входящий потом цифрового аудио инициализирован.
         # Сообщаем пользователю, что он уже может начинать говорить.
         logger.info("Начали слушать микрофон. Скажите одну из команд старта, чтобы начать диктовку.")
 
-        recognizer = None
+        # Распознаватель и отсев тишины перед ним
+        decoder: CommandDecoder | None = None
 
         local_mode: str | None = None
 
+        # Сигнал о режиме при старте. Дальше его подает on_mode_changed, сразу при переходе
+        play_sound(self.mode_container.mode)
+
         # И садимся в мертвый цикл
         while True:
             if self.mode_container.mode != local_mode:
@@ -106,43 +150,34 @@ class IdleProcessor(app.mode_container.ModeProcessor):
 
                 logger.debug("local_mode=%s", local_mode)
 
-                if local_mode == "idle" or local_mode == "pause":
-                    recognizer = get_command_recognizer()
-                else:
-                    recognizer = None
-
-                if self.mode_container.mode in ("idle", "pause"):
-                    play_sound(local_mode)
+                if decoder is not None:
+                    self.recognizer_pool.release(COMMAND_GRAMMAR, decoder.recognizer)
+                    decoder = None
+
+                if local_mode in app.mode_container.LISTENING_MODES:
+                    started = time.perf_counter()
+                    decoder = CommandDecoder(self.recognizer_pool.acquire(COMMAND_GRAMMAR), IDLE_VAD)
+                    logger.info(
+                        "Command recognizer for %s ready in %.1f ms (built %s, reused %s)",
+                        local_mode, (time.perf_counter() - started) * 1000,
+                        self.recognizer_pool.built, self.recognizer_pool.reused
+                    )
+                    reader.skip_to_end()
+
+            if not decoder:
+                # Распознавать нечего (запись, пауза между режимами) - спим до следующего перехода,
+                # не трогая захват. Курсор переставим в конец, когда снова начнем слушать.
+                self.mode_container.wait_for_change(local_mode, timeout=1)
+                continue
 
             # Садимся ждать очередной кусок данных из входящего потока цифрового аудио
-            try:
-                data = self.q.get(timeout=1)
-            except queue.Empty:
+            data = reader.read(BLOCK_BYTES, timeout=1)
+            if data is None:
                 continue
 
             logger.log(TRACE, "Got data")
 
-            if not recognizer:
-                continue
-
-            logger.log(TRACE, "recognizer is chosen")
-
-            is_final = recognizer.AcceptWaveform(data)
-
-            if local_mode in ("idle", "pause"):
-                if is_final:
-                    full_result = json.loads(recognizer.Result())
-                    text = full_result.get("text", "")
-                else:
-                    partial_result = json.loads(recognizer.PartialResult())
-                    text = partial_result.get("partial", "")
-                if text:
-                    yield TextAndIsFinal(text, is_final)
-            else:
-                logger.debug("idle recognizer finishes its work. is_final=%s", is_final)
-                if is_final:
-                    recognizer.Reset()
-                    recognizer = None
+            yield from decoder.feed(data, reader.pos)
 
     def get_command_recognizer_token_groups(self) -> Generator[list[str], None, None]:
         for text_and_is_final in self.get_command_recognizer_texts():
@@ -154,6 +189,9 @@ class IdleProcessor(app.mode_container.ModeProcessor):
             if not text:
                 continue
 
+            if text_and_is_final.hotword_end_pos is not None:
+                self.hotword_end_pos = text_and_is_final.hotword_end_pos
+
             if self.prev_partial_text is not None and text == self.prev_partial_text:
                 logger.debug("Same partial")
                 continue
@@ -174,12 +212,38 @@ class IdleProcessor(app.mode_container.ModeProcessor):
                 command.do_things()
 
     def to_recording(self, chat_channel: str):
+        # Команда могла прийти, когда режим уже сменился (события распознавателя в отдельном процессе запаздывают)
+        if self.mode_container.mode != app.mode_container.MODE_IDLE:
+            logger.info("Start command ignored, mode=%r", self.mode_container.mode)
+            return
+
+        # Аудио начинает уходить в SpeechKit сразу, не дожидаясь паузы между режимами,
+        # и не с текущего момента, а с конца слова-триггера: "сказать привет всем" можно говорить на одном дыхании.
+        # Запись сеанса начинаем раньше потока, иначе в нее не попадет этот кусок от слова-триггера
+        app.session_recorder.start_session()
+        app.recognize_thread.commit(self.hotword_end_pos)
+        self.hotword_end_pos = None
+
         def enter_mode():
             self.recording_processor.on_mode_enter(chat_channel)
         self.mode_container.to_mode(self, self.recording_processor.mode, enter_mode)
 
+    def shutdown(self):
+        if self.worker is not None:
+            self.worker.stop()
+
+    def on_mode_changed(self, old_mode: str, new_mode: str):
+        if self.worker is not None:
+            if new_mode in app.mode_container.LISTENING_MODES:
+                self.worker.listen(app.audio_capture.capture.ring.write_pos)
+            elif old_mode in app.mode_container.LISTENING_MODES:
+                self.worker.pause()
+        if new_mode in app.mode_container.LISTENING_MODES:
+            play_sound(new_mode)
+
     def on_mode_enter(self):
         self.prev_partial_text = None
+        self.hotword_end_pos = None
 
     def on_mode_leave(self):
         self.prev_partial_text = None
@@ -0,0 +1,176 @@
+"""
+Распознаватель команд (Vosk) в отдельном процессе.
+
+Kaldi, разбор JSON его ответов и отсев тишины тогда не делят GIL с потоком в SpeechKit, сборкой текста и оверлеем.
+Аудио процесс читает сам, из захвата в общей памяти (app.ring_buffer.SharedRingBuffer), а обратно
+присылает только события с командами: частичные результаты со словом-триггером и финалы.
+
+Включается переменной окружения WOW_STT_IDLE_PROCESS=1 (см. app.audio_capture).
+"""
+from __future__ import annotations
+import multiprocessing
+import queue
+import time
+from typing import NamedTuple
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Управление процессом
+_LISTEN = "listen"
+_PAUSE = "pause"
+_STOP = "stop"
+
+
+class HotwordEvent(NamedTuple):
+    # Номер listen(), на который пришло событие: события от прошлых listen() уже не нужны
+    generation: int
+    text: str
+    is_final: bool
+    hotword_end_pos: int | None
+
+
+class WorkerReady(NamedTuple):
+    load_ms: float
+
+
+class WorkerFailed(NamedTuple):
+    error: str
+
+
+def _worker_main(
+    ring_name: str,
+    ring_capacity: int,
+    block_bytes: int,
+    model_path: str,
+    grammar: str,
+    use_vad: bool,
+    control: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+):
+    # Импорты здесь, чтобы в основном процессе этот модуль не тянул Vosk
+    from vosk import Model, SetLogLevel
+
+    import app.command_recognizer as command_recognizer
+    import app.recognizer_pool
+    from app.ring_buffer import SharedRingBuffer
+
+    SetLogLevel(-1)
+    ring = SharedRingBuffer(ring_capacity, ring_name)
+
+    started = time.perf_counter()
+    try:
+        model = Model(model_path)
+        pool = app.recognizer_pool.RecognizerPool(
+            lambda key: command_recognizer.build_command_recognizer(model, key),
+            command_recognizer.reset_command_recognizer,
+        )
+        pool.warm(grammar)
+    except BaseException as e:
+        events.put(WorkerFailed(repr(e)))
+        raise
+    events.put(WorkerReady((time.perf_counter() - started) * 1000))
+
+    reader = None
+    data = None
+    decoder: command_recognizer.CommandDecoder | None = None
+    generation = 0
+
+    while True:
+        try:
+            # Пока не слушаем - просто ждем команду. Пока слушаем - только проверяем, нет ли ее.
+            message = control.get(timeout=1) if decoder is None else control.get_nowait()
+        except queue.Empty:
+            message = None
+
+        if message is not None:
+            command, *args = message
+            if decoder is not None:
+                pool.release(grammar, decoder.recognizer)
+                decoder = None
+            if command == _STOP:
+                break
+            if command == _LISTEN:
+                generation, start_pos = args
+                reader = ring.reader(start_pos)
+                decoder = command_recognizer.CommandDecoder(pool.acquire(grammar), use_vad)
+            continue
+
+        if decoder is None:
+            continue
+
+        data = reader.read(block_bytes, timeout=0.1)
+        if data is None:
+            continue
+        for text, is_final, hotword_end_pos in decoder.feed(data, reader.pos):
+            if is_final or not command_recognizer.ACTIVATE_WORDS.isdisjoint(text.split()):
+                events.put(HotwordEvent(generation, text, is_final, hotword_end_pos))
+
+    # Куски, прочитанные из кольца, - окна в общую память. Без них сегмент можно закрыть.
+    data = None
+    reader = None
+    ring.close()
+
+
+class IdleWorker:
+    """
+    Процесс с распознавателем команд, со стороны основного процесса.
+
+    listen(pos) - начать слушать захват с позиции pos, pause() - перестать. Каждый listen() начинает
+    новое "поколение": get_event() отбрасывает события, распознанные до последнего listen() или после pause().
+    """
+
+    def __init__(self, ring_name: str, ring_capacity: int, block_bytes: int, model_path: str, grammar: str, use_vad: bool):
+        # spawn - как на Windows, где другого и нет
+        context = multiprocessing.get_context("spawn")
+        self._control = context.Queue()
+        self._events = context.Queue()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(ring_name, ring_capacity, block_bytes, model_path, grammar, use_vad, self._control, self._events),
+            name="idle-worker",
+            daemon=True,
+        )
+        self._generation = 0
+        self._listening = False
+        self.ready_ms: float | None = None
+
+    def start(self):
+        self._process.start()
+
+    def listen(self, start_pos: int):
+        self._generation += 1
+        self._listening = True
+        self._control.put((_LISTEN, self._generation, start_pos))
+
+    def pause(self):
+        self._listening = False
+        self._control.put((_PAUSE,))
+
+    def get_event(self, timeout: float | None = None) -> HotwordEvent | None:
+        """Следующее актуальное событие, или None, если за timeout его не было."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = self._events.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if isinstance(event, WorkerReady):
+                self.ready_ms = event.load_ms
+                logger.info("Idle worker ready in %.0f ms", event.load_ms)
+                continue
+            if isinstance(event, WorkerFailed):
+                raise RuntimeError(f"Idle worker failed: {event.error}")
+            if self._listening and event.generation == self._generation:
+                return event
+
+    def stop(self, timeout: float = 5.0):
+        if not self._process.is_alive():
+            return
+        self._control.put((_STOP,))
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
@@ -0,0 +1,85 @@
+"""
+Нажатия клавиш пачками: вся последовательность (Enter, Ctrl+V, Enter) - одним вызовом SendInput.
+
+Каждое событие знает, сколько ждать перед ним (delay_ms). События без ожидания между собой уходят одной пачкой,
+ожидание делит последовательность на пачки. Куда уходят пачки, решает backend: SendInputBackend (Windows)
+или RecordingBackend (запоминает события и время - для проверок без Windows).
+"""
+from __future__ import annotations
+import time
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+
+# Виртуальные коды клавиш
+VK_RETURN = 0x0D
+VK_CONTROL = 0x11
+VK_V = 0x56
+
+
+class KeyEvent(NamedTuple):
+    vk: int
+    keyup: bool = False
+    # Сколько ждать перед этим событием
+    delay_ms: int = 0
+
+
+def press(vk: int, delay_ms: int = 0) -> list[KeyEvent]:
+    return [KeyEvent(vk, False, delay_ms), KeyEvent(vk, True)]
+
+
+def ctrl_v(delay_ms: int = 0) -> list[KeyEvent]:
+    return [KeyEvent(VK_CONTROL, False, delay_ms), *press(VK_V), KeyEvent(VK_CONTROL, True)]
+
+
+def chat_send_sequence(let_edit: bool = False, step_ms: int = 0) -> list[KeyEvent]:
+    """Enter (открыть чат), Ctrl+V (вставить текст), Enter (отправить; нет, если let_edit). step_ms - пауза между шагами."""
+    events = press(VK_RETURN) + ctrl_v(step_ms)
+    if not let_edit:
+        events += press(VK_RETURN, step_ms)
+    return events
+
+
+def batches(events: Iterable[KeyEvent]) -> list[tuple[int, list[KeyEvent]]]:
+    """(ожидание перед пачкой в мс, пачка) - разрезаем последовательность там, где надо ждать."""
+    result: list[tuple[int, list[KeyEvent]]] = []
+    for event in events:
+        if not result or event.delay_ms:
+            result.append((event.delay_ms, []))
+        result[-1][1].append(event)
+    return result
+
+
+class SendInputBackend:
+    """Пачка - один вызов SendInput."""
+
+    def send(self, batch: list[KeyEvent]):
+        # Импорт здесь: app.keyboard.keyboard_sender есть только на Windows
+        import app.keyboard.keyboard_sender
+        app.keyboard.keyboard_sender.send_vk_events([(event.vk, event.keyup) for event in batch])
+
+
+class RecordingBackend:
+    """Запоминает события с моментом отправки (time.perf_counter_ns) и число пачек."""
+
+    def __init__(self):
+        self.events: list[tuple[int, KeyEvent]] = []
+        self.batches = 0
+
+    def send(self, batch: list[KeyEvent]):
+        sent_ns = time.perf_counter_ns()
+        self.batches += 1
+        self.events.extend((sent_ns, event) for event in batch)
+
+
+class InputInjector:
+
+    def __init__(self, backend, sleep: Callable[[float], None] = time.sleep):
+        self.backend = backend
+        self._sleep = sleep
+
+    def play(self, events: Iterable[KeyEvent]):
+        for delay_ms, batch in batches(events):
+            if delay_ms:
+                self._sleep(delay_ms / 1000)
+            self.backend.send(batch)
@@ -3,6 +3,7 @@ import time
 import ctypes
 from ctypes import wintypes
 
+from app.keyboard.input_injection import VK_RETURN, VK_CONTROL, VK_V
 from app.app_logging import logging
 
 
@@ -70,12 +71,6 @@ class INPUT(ctypes.Structure):
 LPINPUT = ctypes.POINTER(INPUT)
 
 
-# Виртуальные коды клавиш
-VK_RETURN = 0x0D
-VK_CONTROL = 0x11
-VK_V = 0x56
-
-
 def _check_count(result, func, args):
     # Если SendInput вернул 0 — поднимем нормальный WinError, чтобы видеть причину
     if result == 0:
@@ -136,6 +131,27 @@ def send_unicode_text(text: str, per_char_delay: float = 0.0):
         user32.SendInput(len(inputs), arr, ctypes.sizeof(INPUT))
 
 
+def _vk_input(vk: int, keyup: bool) -> INPUT:
+    return INPUT(
+        type=INPUT_KEYBOARD,
+        ki=KEYBDINPUT(
+            wVk=vk,
+            wScan=0,
+            dwFlags=KEYEVENTF_KEYUP if keyup else 0,
+            time=0,
+            dwExtraInfo=0,
+        ),
+    )
+
+
+def send_vk_events(events: list[tuple[int, bool]]):
+    """(код клавиши, отпускание) - все одним вызовом SendInput, без разрывов между событиями."""
+    if not events:
+        return
+    arr = (INPUT * len(events))(*(_vk_input(vk, keyup) for vk, keyup in events))
+    user32.SendInput(len(events), arr, ctypes.sizeof(INPUT))
+
+
 def send_vk(vk: int, keyup: bool = False):
     flags = KEYEVENTF_KEYUP if keyup else 0
     inp = INPUT(
@@ -158,10 +174,5 @@ def press_enter():
 
 
 def press_ctrl_v():
-    # Ctrl down
-    send_vk(VK_CONTROL, keyup=False)
-    # V down/up
-    send_vk(VK_V, keyup=False)
-    send_vk(VK_V, keyup=True)
-    # Ctrl up
-    send_vk(VK_CONTROL, keyup=True)
+    # Ctrl down, V down/up, Ctrl up - одним SendInput
+    send_vk_events([(VK_CONTROL, False), (VK_V, False), (VK_V, True), (VK_CONTROL, True)])
@@ -1,42 +1,170 @@
+"""
+Состояние клавиатуры на Windows для app.keyboard.quiescence.
+
+Способ ожидания задает WOW_STT_KEYBOARD_WAIT:
+  hook (по умолчанию) - низкоуровневый хук клавиатуры (WH_KEYBOARD_LL) в своем потоке, ожидание будят его события,
+    опроса нет. Перед каждым ожиданием хук один раз сверяется с GetAsyncKeyState по всем клавишам;
+  poll - опрос раз в 10 мс через GetAsyncKeyState по клавише, до первой зажатой. Он же - если хук не встал.
+
+Одного вызова на все клавиши здесь нет: GetKeyboardState отдает состояние очереди сообщений потока, а не
+физическое, и что GetKeyState(0) перед ним дает физическое состояние для потока без окон, на Windows не проверено.
+"""
+from __future__ import annotations
 import ctypes
-import time
+import os
+import threading
 from ctypes import wintypes
 
+from app.keyboard.quiescence import HookQuiescence, KeyboardQuiescence, KeyPollQuiescence
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
 user32 = ctypes.WinDLL("user32", use_last_error=True)
+kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+
+KEYBOARD_WAIT_ENV = "WOW_STT_KEYBOARD_WAIT"
+KEYBOARD_WAITS = ("hook", "poll")
+
+WH_KEYBOARD_LL = 13
+WM_QUIT = 0x0012
+WM_KEYDOWN = 0x0100
+WM_KEYUP = 0x0101
+WM_SYSKEYDOWN = 0x0104
+WM_SYSKEYUP = 0x0105
+
+ULONG_PTR = getattr(wintypes, "ULONG_PTR", wintypes.WPARAM)
+LRESULT = ctypes.c_ssize_t
+
+
+class KBDLLHOOKSTRUCT(ctypes.Structure):
+    _fields_ = (
+        ("vkCode", wintypes.DWORD),
+        ("scanCode", wintypes.DWORD),
+        ("flags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ULONG_PTR),
+    )
+
+
+HOOKPROC = ctypes.WINFUNCTYPE(LRESULT, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
 
-# сигнатура GetAsyncKeyState
 user32.GetAsyncKeyState.argtypes = [wintypes.INT]
-user32.GetAsyncKeyState.restype  = wintypes.SHORT
+user32.GetAsyncKeyState.restype = wintypes.SHORT
+user32.SetWindowsHookExW.argtypes = (ctypes.c_int, HOOKPROC, wintypes.HINSTANCE, wintypes.DWORD)
+user32.SetWindowsHookExW.restype = wintypes.HHOOK
+user32.CallNextHookEx.argtypes = (wintypes.HHOOK, ctypes.c_int, wintypes.WPARAM, wintypes.LPARAM)
+user32.CallNextHookEx.restype = LRESULT
+user32.UnhookWindowsHookEx.argtypes = (wintypes.HHOOK,)
+user32.GetMessageW.argtypes = (ctypes.POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT)
+user32.PostThreadMessageW.argtypes = (wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+kernel32.GetModuleHandleW.argtypes = (wintypes.LPCWSTR,)
+kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+
+
+def key_down(vk: int) -> bool:
+    # Старший бит = клавиша сейчас зажата (физически)
+    return bool(user32.GetAsyncKeyState(vk) & 0x8000)
+
+
+class LowLevelKeyboardHook:
+    """WH_KEYBOARD_LL в своем потоке с очередью сообщений: каждое нажатие и отпускание уходит в on_key(vk, down)."""
 
-MOUSE_VKS = {0x01, 0x02, 0x04, 0x05, 0x06}  # LBUTTON, RBUTTON, MBUTTON, XBUTTON1, XBUTTON2
+    def __init__(self, on_key):
+        self._on_key = on_key
+        # Ссылку на обертку держим, пока стоит хук: иначе ее соберет GC
+        self._proc = HOOKPROC(self._hook_proc)
+        self._thread: threading.Thread | None = None
+        self._thread_id = None
+        self._installed = threading.Event()
+        self._error: BaseException | None = None
+
+    def _hook_proc(self, n_code, w_param, l_param):
+        if n_code >= 0:
+            event = ctypes.cast(l_param, ctypes.POINTER(KBDLLHOOKSTRUCT)).contents
+            if w_param in (WM_KEYDOWN, WM_SYSKEYDOWN):
+                self._on_key(event.vkCode, True)
+            elif w_param in (WM_KEYUP, WM_SYSKEYUP):
+                self._on_key(event.vkCode, False)
+        return user32.CallNextHookEx(None, n_code, w_param, l_param)
+
+    def _run(self):
+        self._thread_id = kernel32.GetCurrentThreadId()
+        hook = user32.SetWindowsHookExW(WH_KEYBOARD_LL, self._proc, kernel32.GetModuleHandleW(None), 0)
+        if not hook:
+            self._error = ctypes.WinError(ctypes.get_last_error())
+            self._installed.set()
+            return
+        self._installed.set()
+        try:
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                pass
+        finally:
+            user32.UnhookWindowsHookEx(hook)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="keyboard-hook", daemon=True)
+        self._thread.start()
+        self._installed.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        if self._thread is None:
+            return
+        user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread.join()
+        self._thread = None
+
+
+_detector: KeyboardQuiescence | None = None
+_hook: LowLevelKeyboardHook | None = None
+
+
+def keyboard_wait() -> str:
+    value = os.environ.get(KEYBOARD_WAIT_ENV, "hook")
+    if value not in KEYBOARD_WAITS:
+        raise ValueError(f"{KEYBOARD_WAIT_ENV}={value!r}, expected one of {KEYBOARD_WAITS}")
+    return value
+
+
+def detector() -> KeyboardQuiescence:
+    """Создается при первом обращении; хук после этого стоит до stop()."""
+    global _detector, _hook
+    if _detector is None:
+        poll = KeyPollQuiescence(key_down)
+        _detector = poll
+        if keyboard_wait() == "hook":
+            hook_detector = HookQuiescence(poll.pressed)
+            hook = LowLevelKeyboardHook(hook_detector.on_key)
+            try:
+                hook.start()
+            except OSError as e:
+                logger.warning("Keyboard hook not installed, polling instead: %r", e)
+            else:
+                # Что было зажато до установки хука, хук не увидит
+                hook_detector.resync()
+                _detector, _hook = hook_detector, hook
+        logger.debug("Keyboard quiescence: %s", type(_detector).__name__)
+    return _detector
+
+
+def stop():
+    global _detector, _hook
+    if _hook is not None:
+        _hook.stop()
+        _hook = None
+    _detector = None
 
 
 def keyboard_is_clean() -> bool:
     """
     True -> на клавиатуре ничего не зажато (кнопки мыши игнорируем).
     """
-    for vk in range(256):
-        if vk in MOUSE_VKS:
-            continue
-        state = user32.GetAsyncKeyState(vk)
-        if state & 0x8000:  # старший бит = клавиша сейчас зажата
-            return False
-    return True
+    return detector().is_clean()
 
 
 def wait_for_keyboard_clean(stable_ms: int = 150, timeout_s: float = 3.0) -> bool:
-    deadline = time.time() + timeout_s
-    clean_since = None
-
-    while time.time() < deadline:
-        if keyboard_is_clean():
-            if clean_since is None:
-                clean_since = time.time()
-            elif (time.time() - clean_since) * 1000 >= stable_ms:
-                return True
-        else:
-            clean_since = None
-
-        time.sleep(0.01)  # 10 мс
-
-    return False
+    return detector().wait_clean(stable_ms, timeout_s)
@@ -11,16 +11,36 @@ user32.LoadKeyboardLayoutW.restype = wintypes.HKL
 
 user32.GetForegroundWindow.restype = wintypes.HWND
 user32.PostMessageW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+user32.GetWindowThreadProcessId.argtypes = (wintypes.HWND, wintypes.LPDWORD)
+user32.GetWindowThreadProcessId.restype = wintypes.DWORD
+user32.GetKeyboardLayout.argtypes = (wintypes.DWORD,)
+user32.GetKeyboardLayout.restype = wintypes.HKL
+
+# Раскладка грузится один раз: LoadKeyboardLayoutW на каждое сообщение - лишний системный вызов
+_russian_hkl = None
+
+
+def russian_hkl():
+    global _russian_hkl
+    if _russian_hkl is None:
+        hkl = user32.LoadKeyboardLayoutW("00000419", KLF_ACTIVATE)
+        if not hkl:
+            raise ctypes.WinError(ctypes.get_last_error())
+        _russian_hkl = hkl
+    return _russian_hkl
 
 
 def switch_to_russian():
-    hkl = user32.LoadKeyboardLayoutW("00000419", KLF_ACTIVATE)
-    if not hkl:
-        raise ctypes.WinError(ctypes.get_last_error())
+    hkl = russian_hkl()
 
     hwnd = user32.GetForegroundWindow()
     if not hwnd:
         raise RuntimeError("Не удалось получить foreground window")
 
+    # Окно уже в русской раскладке - ничего не шлем
+    thread_id = user32.GetWindowThreadProcessId(hwnd, None)
+    if user32.GetKeyboardLayout(thread_id) == hkl:
+        return
+
     # wParam обычно 0, lParam — HKL
     user32.PostMessageW(hwnd, WM_INPUTLANGCHANGEREQUEST, 0, hkl)
@@ -0,0 +1,252 @@
+"""
+Ждем, пока на клавиатуре ничего не зажато (кнопки мыши не в счет) и так продержится stable_ms.
+
+Способы узнать, что клавиши отпущены:
+  KeyPollQuiescence - опрос: раз в poll_ms клавиши спрашиваются по одной (key_down), до первой зажатой;
+  SnapshotQuiescence - опрос: раз в poll_ms берется массив состояний всех 256 клавиш (read_state);
+  HookQuiescence - события: кто-то (хук клавиатуры) сообщает о нажатиях и отпусканиях через on_key(),
+    ожидание просыпается само, как только отпущена последняя клавиша и прошло stable_ms.
+    В начале каждого ожидания сверяется с опросом (read_pressed): пропущенное хуком отпускание не залипает.
+Откуда берется состояние, решает вызывающий: на Windows - app.keyboard.keyboard_state,
+в проверках - FakeKeyboard, которой можно задать сценарий нажатий.
+"""
+from __future__ import annotations
+import abc
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+
+
+MOUSE_VKS = frozenset({0x01, 0x02, 0x04, 0x05, 0x06})  # LBUTTON, RBUTTON, MBUTTON, XBUTTON1, XBUTTON2
+
+# Старший бит в состоянии клавиши = клавиша сейчас зажата
+KEY_DOWN = 0x80
+
+
+def pressed_keys(state: Sequence[int]) -> set[int]:
+    """Зажатые клавиши (кроме кнопок мыши) в массиве состояний из 256 байт, как у GetKeyboardState."""
+    return {vk for vk, key_state in enumerate(state) if key_state & KEY_DOWN and vk not in MOUSE_VKS}
+
+
+class KeyboardQuiescence(abc.ABC):
+
+    @abc.abstractmethod
+    def is_clean(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def wait_clean(self, stable_ms: int = 150, timeout_s: float = 3.0) -> bool:
+        """True - клавиатура чистая уже stable_ms; False - не дождались за timeout_s."""
+
+
+class PollingQuiescence(KeyboardQuiescence):
+    """Опрос is_clean() раз в poll_ms."""
+
+    def __init__(
+            self,
+            poll_ms: int = 10,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.poll_ms = poll_ms
+        self._clock = clock
+        self._sleep = sleep
+        # Сколько раз опрашивали - для замеров
+        self.reads = 0
+
+    def wait_clean(self, stable_ms: int = 150, timeout_s: float = 3.0) -> bool:
+        deadline = self._clock() + timeout_s
+        clean_since = None
+
+        while self._clock() < deadline:
+            if self.is_clean():
+                now = self._clock()
+                if clean_since is None:
+                    clean_since = now
+                elif (now - clean_since) * 1000 >= stable_ms:
+                    return True
+            else:
+                clean_since = None
+
+            self._sleep(self.poll_ms / 1000)
+
+        return False
+
+
+class SnapshotQuiescence(PollingQuiescence):
+    """Опрос массива состояний всех клавиш: read_state() раз в poll_ms."""
+
+    def __init__(self, read_state: Callable[[], Sequence[int]], poll_ms: int = 10, **kwargs):
+        super().__init__(poll_ms, **kwargs)
+        self._read_state = read_state
+
+    def is_clean(self) -> bool:
+        self.reads += 1
+        state = self._read_state()
+        return not any(key_state & KEY_DOWN for vk, key_state in enumerate(state) if vk not in MOUSE_VKS)
+
+
+class KeyPollQuiescence(PollingQuiescence):
+    """
+    Опрос по клавише: key_down(vk) раз в poll_ms для каждой клавиши, пока не найдется зажатая.
+
+    Пока что-то зажато, обычно хватает нескольких запросов; все 251 - только когда клавиатура чистая.
+    """
+
+    def __init__(self, key_down: Callable[[int], bool], poll_ms: int = 10, **kwargs):
+        super().__init__(poll_ms, **kwargs)
+        self._key_down = key_down
+        # Сколько всего запросов по клавишам - для замеров
+        self.key_reads = 0
+
+    def is_clean(self) -> bool:
+        self.reads += 1
+        for vk in range(256):
+            if vk in MOUSE_VKS:
+                continue
+            self.key_reads += 1
+            if self._key_down(vk):
+                return False
+        return True
+
+    def pressed(self) -> set[int]:
+        """Все зажатые клавиши (кроме кнопок мыши) - для сверки HookQuiescence."""
+        return {vk for vk in range(256) if vk not in MOUSE_VKS and self._key_down(vk)}
+
+
+class HookQuiescence(KeyboardQuiescence):
+    """
+    События от хука: on_key() вызывается на каждое нажатие и отпускание.
+
+    Момент, когда отпустили последнюю клавишу, известен точно, поэтому если это было давно, ожидание не нужно вовсе.
+    Пока хук не сообщил ничего, начальное состояние задает seed().
+
+    Хук может пропустить событие (например, клавишу отпустили, пока хук не стоял или Windows его сняла
+    по таймауту). Поэтому в начале каждого wait_clean() зажатые клавиши сверяются с read_pressed(), если он задан.
+    """
+
+    def __init__(
+            self,
+            read_pressed: Callable[[], Iterable[int]] | None = None,
+            clock: Callable[[], float] = time.monotonic,
+    ):
+        self._read_pressed = read_pressed
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._pressed: set[int] = set()
+        # Когда клавиатура стала чистой; None - что-то зажато
+        self._clean_since: float | None = clock()
+        # Сколько раз просыпалось ожидание - для замеров
+        self.wakeups = 0
+
+    def seed(self, pressed: Iterable[int]):
+        with self._cond:
+            self._pressed = set(pressed) - MOUSE_VKS
+            self._clean_since = None if self._pressed else self._clock()
+            self._cond.notify_all()
+
+    def resync(self):
+        """
+        Сверить зажатые клавиши с read_pressed().
+
+        Если клавиатура была и осталась чистой, момент отпускания не меняется.
+        """
+        if self._read_pressed is None:
+            return
+        pressed = set(self._read_pressed()) - MOUSE_VKS
+        with self._cond:
+            if pressed == self._pressed:
+                return
+            self._pressed = pressed
+            if pressed:
+                self._clean_since = None
+            elif self._clean_since is None:
+                self._clean_since = self._clock()
+            self._cond.notify_all()
+
+    def on_key(self, vk: int, down: bool):
+        if vk in MOUSE_VKS:
+            return
+        with self._cond:
+            if down:
+                self._pressed.add(vk)
+                self._clean_since = None
+            else:
+                self._pressed.discard(vk)
+                if not self._pressed and self._clean_since is None:
+                    self._clean_since = self._clock()
+            self._cond.notify_all()
+
+    def is_clean(self) -> bool:
+        with self._cond:
+            return not self._pressed
+
+    def wait_clean(self, stable_ms: int = 150, timeout_s: float = 3.0) -> bool:
+        deadline = self._clock() + timeout_s
+        self.resync()
+        with self._cond:
+            while True:
+                now = self._clock()
+                if self._clean_since is not None:
+                    stable_left = self._clean_since + stable_ms / 1000 - now
+                    if stable_left <= 0:
+                        return True
+                else:
+                    stable_left = None
+
+                timeout_left = deadline - now
+                if timeout_left <= 0:
+                    return False
+
+                self._cond.wait(timeout_left if stable_left is None else min(stable_left, timeout_left))
+                self.wakeups += 1
+
+
+class FakeKeyboard:
+    """
+    Клавиатура для проверок без Windows: read_state() - для SnapshotQuiescence, key_down() - для KeyPollQuiescence,
+    listeners - для HookQuiescence.
+
+    play() проигрывает сценарий [(через сколько мс от начала, клавиша, нажата)] в отдельном потоке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pressed: set[int] = set()
+        self.listeners: list[Callable[[int, bool], None]] = []
+        # Когда (time.monotonic) было последнее событие сценария
+        self.last_event_at: float | None = None
+
+    def read_state(self) -> bytes:
+        with self._lock:
+            pressed = set(self._pressed)
+        return bytes(KEY_DOWN if vk in pressed else 0 for vk in range(256))
+
+    def key_down(self, vk: int) -> bool:
+        with self._lock:
+            return vk in self._pressed
+
+    def key(self, vk: int, down: bool):
+        with self._lock:
+            if down:
+                self._pressed.add(vk)
+            else:
+                self._pressed.discard(vk)
+            self.last_event_at = time.monotonic()
+        for listener in self.listeners:
+            listener(vk, down)
+
+    def play(self, script: Iterable[tuple[int, int, bool]]) -> threading.Thread:
+        script = sorted(script)
+
+        def run():
+            started = time.monotonic()
+            for at_ms, vk, down in script:
+                delay = started + at_ms / 1000 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.key(vk, down)
+
+        thread = threading.Thread(target=run, name="fake-keyboard", daemon=True)
+        thread.start()
+        return thread
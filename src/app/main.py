@@ -1,34 +1,87 @@
 from __future__ import annotations
+import functools
+from importlib import resources
 
 from app.overlay import start_overlay
 import app.overlay
-from app.yandex_cloud_oauth import get_oauth_and_iam_tokens
+import app.yandex_cloud_oauth
+import app.credential_cache
+import app.audio_capture
+import app.yandex_speech_kit
+import app.startup
 import app.commands
 import app.keyboard.keyboard_sender
 import app.keyboard.clipboard_copier
+import app.keyboard.keyboard_state
 import app.wow_chat_sender
 import app.recognize_thread
 import app.recording_processor
 import app.idle_processor
 import app.mode_container
+import app.tokens_to_text_builder
+import app.tracing
+import app.beeps
+import app.async_runtime
 
 from app.app_logging import logging
 
 
 logger = logging.getLogger(__name__)
 
+# Пользовательские замены фраз на текст (сокращения и т.п.), если файл есть
+SMART_TOKENS_PATH = resources.files("resources") / "smart_tokens.txt"
+
+
+def load_smart_tokens():
+    if SMART_TOKENS_PATH.is_file():
+        app.tokens_to_text_builder.default_smart_tokens.load_file(SMART_TOKENS_PATH)
 
-def main():
-    security_tokens = get_oauth_and_iam_tokens()
 
-    logger.info("Итог:")
-    for k, v in security_tokens.items():
-        logger.info(f"{k}: {v}")
+def start_iam_refresher(credentials: app.credential_cache.Credentials) -> app.credential_cache.IamRefresher:
+    iam_refresher = app.credential_cache.IamRefresher(
+        credentials,
+        refresh=app.yandex_cloud_oauth.refresh_iam,
+        on_token=app.recognize_thread.set_iam_token,
+        save=functools.partial(app.credential_cache.save, app.credential_cache.credentials_path()),
+    )
+    iam_refresher.start()
+    return iam_refresher
 
-    iam_token = security_tokens["iam_token"]
-    app.recognize_thread.init(iam_token)
 
-    start_overlay()
+def build_startup() -> app.startup.Startup:
+    """
+    Шаги запуска. Независимые идут параллельно: модель Vosk, микрофон, канал к SpeechKit, оверлей и звук не ждут
+    OAuth (а тот может ждать браузер). Каталогу (folder_id) нужен IAM-токен, SpeechKit - токен, каталог и канал.
+    """
+    startup = app.startup.Startup()
+    startup.step("smart_tokens", load_smart_tokens)
+    startup.step("command_model", app.idle_processor.idle_processor.load_model)
+    startup.step("audio_capture", app.audio_capture.capture.start)
+    startup.step("overlay", start_overlay)
+    startup.step("cues", app.beeps.start)
+    startup.step("speechkit_channel", app.yandex_speech_kit.open_recognizer)
+    # Токены из файла, если они еще живы; браузер - только если без него никак
+    startup.step("credentials", app.yandex_cloud_oauth.get_credentials)
+    startup.step(
+        "folder_id",
+        lambda credentials: app.yandex_speech_kit.find_folder_id(credentials.iam_token),
+        requires=("credentials",),
+    )
+    startup.step(
+        "speechkit",
+        lambda credentials, folder_id, _: app.recognize_thread.init(credentials.iam_token, folder_id),
+        requires=("credentials", "folder_id", "speechkit_channel"),
+    )
+    startup.step("iam_refresher", start_iam_refresher, requires=("credentials",))
+    return startup
+
+
+def main():
+    startup = build_startup()
+    results = startup.run()
+    logger.info("%s", startup.format_timeline())
+    app.startup.append_report(startup)
+    iam_refresher = results["iam_refresher"]
 
     app.idle_processor.idle_processor.set_recording_processor(app.recording_processor.recording_processor)
     app.recording_processor.recording_processor.set_idle_processor(app.idle_processor.idle_processor)
@@ -39,7 +92,13 @@ def main():
         logger.info("")
         logger.info("[MAIN] Остановлено пользователем")
     finally:
+        iam_refresher.stop()
         app.recognize_thread.shutdown()
+        app.idle_processor.idle_processor.shutdown()
+        app.async_runtime.runtime.stop()
+        app.beeps.stop()
+        app.keyboard.keyboard_state.stop()
+        app.tracing.shutdown()
 
 
 if __name__ == "__main__":
@@ -3,11 +3,32 @@ from __future__ import annotations
 import threading
 from collections.abc import Callable
 
+import app.async_runtime
 from app.app_logging import logging
 
 
 logger = logging.getLogger(__name__)
 
+MODE_IDLE = "idle"  # ждем команду старта
+MODE_TIMER = "timer"  # пауза между режимами
+MODE_RECORDING = "recording"  # диктовка в SpeechKit
+
+# Режимы, в которых слушаем команды
+LISTENING_MODES = frozenset({MODE_IDLE})
+
+# Допустимые переходы. В любой режим и из любого - только через паузу между режимами.
+TRANSITIONS = {
+    MODE_IDLE: frozenset({MODE_TIMER}),
+    MODE_RECORDING: frozenset({MODE_TIMER}),
+    MODE_TIMER: frozenset({MODE_IDLE, MODE_RECORDING}),
+}
+
+# Пауза между режимами, секунд
+GRACE_SECONDS = 0.2
+
+# (старый режим, новый режим)
+ModeObserver = Callable[[str, str], None]
+
 
 class ModeProcessor(object):
 
@@ -23,18 +44,63 @@ class ModeProcessor(object):
 
 
 class ModeContainer(object):
+    """
+    Текущий режим и переходы между ними.
+
+    Подписчики (subscribe) узнают о каждом переходе сразу, в потоке, который его сделал.
+    Потоки-циклы могут ждать перехода в wait_for_change, а не опрашивать mode.
+    Пока идет переход (пауза между режимами), новый to_mode отклоняется.
+    """
+
+    def __init__(self):
+        self._mode = MODE_IDLE
+        self._switching = False
+        self._condition = threading.Condition()
+        self._observers: list[ModeObserver] = []
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def subscribe(self, observer: ModeObserver):
+        self._observers.append(observer)
+
+    def _set_mode(self, new_mode: str):
+        with self._condition:
+            old_mode = self._mode
+            if new_mode not in TRANSITIONS[old_mode]:
+                raise ValueError(f"Mode transition {old_mode} -> {new_mode} is not allowed")
+            self._mode = new_mode
+            self._condition.notify_all()
+
+        logger.debug("%s => %s", old_mode, new_mode)
+        for observer in list(self._observers):
+            observer(old_mode, new_mode)
+
+    def wait_for_change(self, known_mode: str, timeout: float | None = None) -> str:
+        """Ждет, пока режим станет отличным от known_mode (не дольше timeout), и возвращает текущий."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._mode != known_mode, timeout)
+            return self._mode
+
+    def to_mode(self, from_mode_processor: ModeProcessor, to_mode: str, enter_mode_callback: Callable) -> bool:
+        """False - переход отклонен: уже идет другой (например, вторая команда в паузе между режимами)."""
+        with self._condition:
+            if self._switching:
+                logger.info("Mode transition to %s rejected: already switching (mode=%s)", to_mode, self._mode)
+                return False
+            self._switching = True
 
-    mode = "idle"  # "idle" | "pause" | "timer" | "recording"
-
-    def to_mode(self, from_mode_processor: ModeProcessor, to_mode: str, enter_mode_callback: Callable):
         from_mode_processor.on_mode_leave()
-        self.mode = "timer"
-        threading.Timer(0.2, self.after_timer, (from_mode_processor, to_mode, enter_mode_callback)).start()
+        self._set_mode(MODE_TIMER)
+        app.async_runtime.call_later(GRACE_SECONDS, self.after_timer, from_mode_processor, to_mode, enter_mode_callback)
+        return True
 
     def after_timer(self, from_mode_processor: ModeProcessor, to_mode: str, enter_mode_callback: Callable):
-        logger.debug("%s => %s", self.mode, to_mode)
         from_mode_processor.on_after_mode_leave_grace()
-        self.mode = to_mode
+        self._set_mode(to_mode)
+        with self._condition:
+            self._switching = False
         enter_mode_callback()
 
 
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import string
+from functools import lru_cache
+from itertools import takewhile
+from rus2num import Rus2Num
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+_rus_2_num = Rus2Num()
+
+# Слова, которые сами по себе не числа, но могут продолжать числительное слева:
+# "пять с половиной", "два с пол", "полтора с пол тысячи", "две целых пять десятых", "два т. три", "пять тыс. три".
+# "пол" - и слово, и начало "половина"/"полтора"/"полутора" во всех формах
+_NUMBER_CONTINUATION_WORDS = frozenset({"с", "т", "тыс", "млн", "млрд", "трлн"})
+_NUMBER_CONTINUATION_PREFIXES = ("пол", "цел", "десят", "сот", "тысяч", "тыщ", "миллион", "миллиард", "триллион")
+
+_PUNCTUATION = string.punctuation + "«»…"
+
+
+def common_prefix_len(a: str, b: str) -> int:
+    return sum(
+        1
+        for _ in takewhile(lambda p: p[0] == p[1], zip(a, b))
+    )
+
+
+@lru_cache(maxsize=4096)
+def is_numeral_safe_word(chunk: str) -> bool:
+    """
+    True -> после этого слова можно резать текст: Rus2Num(a + b) == Rus2Num(a) + Rus2Num(b),
+    где a заканчивается этим словом, а b начинается с пробела.
+    """
+    if any(c.isdigit() for c in chunk):
+        return False
+    word = chunk.strip(_PUNCTUATION).lower()
+    if word in _NUMBER_CONTINUATION_WORDS or word.startswith(_NUMBER_CONTINUATION_PREFIXES):
+        return False
+    for _ in _rus_2_num.parser.findall(chunk):
+        return False
+    return True
+
+
+class StreamingNumeralNormalizer:
+    """
+    Замена числительных на числа (как Rus2Num), но без повторной обработки всего текста на каждый partial.
+
+    Держит нормализованную версию префикса финального текста, нарезанного по безопасным границам
+    (см. is_numeral_safe_word). Заново через Rus2Num проходит только хвост от последней
+    безопасной границы. Если текст поменялся внутри закэшированного префикса (например, "удалить"
+    откатило финальные слова), кэш откатывается до границы, которая еще совпадает.
+    """
+
+    def __init__(self):
+        self._raw_prefix = ""
+        self._normalized_prefix = ""
+        # (длина сырого префикса, длина нормализованного префикса) на каждой закэшированной границе
+        self._checkpoints: list[tuple[int, int]] = []
+
+    def reset(self):
+        self._raw_prefix = ""
+        self._normalized_prefix = ""
+        self._checkpoints.clear()
+
+    @property
+    def cached_raw_len(self) -> int:
+        return len(self._raw_prefix)
+
+    def _rollback_to(self, raw_stable_text: str):
+        # Закэшированный префикс должен оставаться префиксом стабильной части текста
+        if len(self._raw_prefix) <= len(raw_stable_text) and raw_stable_text.startswith(self._raw_prefix):
+            return
+        while self._checkpoints:
+            raw_len, normalized_len = self._checkpoints[-1]
+            if raw_len <= len(raw_stable_text) and raw_stable_text.startswith(self._raw_prefix[:raw_len]):
+                self._raw_prefix = self._raw_prefix[:raw_len]
+                self._normalized_prefix = self._normalized_prefix[:normalized_len]
+                logger.debug("rolled back to raw_len=%s", raw_len)
+                return
+            self._checkpoints.pop()
+        self._raw_prefix = ""
+        self._normalized_prefix = ""
+
+    def _commit(self, raw_stable_text: str):
+        # Ищем последнюю безопасную границу в стабильной (финальной) части текста
+        start = len(self._raw_prefix)
+        p = raw_stable_text.rfind(" ", start)
+        while p > start:
+            word_start = raw_stable_text.rfind(" ", 0, p) + 1
+            if is_numeral_safe_word(raw_stable_text[word_start:p]):
+                break
+            p = raw_stable_text.rfind(" ", start, word_start)
+        if p <= start:
+            return
+
+        self._normalized_prefix += _rus_2_num(raw_stable_text[start:p])
+        self._raw_prefix = raw_stable_text[:p]
+        self._checkpoints.append((len(self._raw_prefix), len(self._normalized_prefix)))
+        logger.debug("committed raw_len=%s", p)
+
+    def _normalize_tail(self, raw_text: str) -> str:
+        tail = raw_text[len(self._raw_prefix):]
+        return _rus_2_num(tail) if tail else ""
+
+    def normalize(self, raw_text: str, raw_final_text: str = "") -> tuple[str, str]:
+        """
+        Нормализует текст и его финальный префикс.
+
+        Возвращает (text, final_text), где text == Rus2Num(raw_text),
+        а final_text - самый длинный общий префикс Rus2Num(raw_final_text) и text.
+        raw_final_text должен быть префиксом raw_text.
+        """
+        self._rollback_to(raw_final_text)
+        self._commit(raw_final_text)
+
+        normalized_tail = self._normalize_tail(raw_text)
+        text = self._normalized_prefix + normalized_tail
+
+        if not raw_final_text:
+            return text, ""
+        if len(raw_final_text) == len(raw_text):
+            return text, text
+
+        normalized_final_tail = self._normalize_tail(raw_final_text)
+        final_tail_len = common_prefix_len(normalized_final_tail, normalized_tail)
+        final_text = text[:len(self._normalized_prefix) + final_tail_len]
+        return text, final_text
@@ -0,0 +1,194 @@
+"""
+Потоковое кодирование PCM в OGG/Opus для ContainerAudio.OGG_OPUS в SpeechKit.
+
+OGG (RFC 3533) и упаковка Opus в OGG (RFC 7845) - здесь, на чистом питоне.
+Само кодирование Opus - через opuslib (необязательная зависимость: pip install opuslib, нужна libopus).
+"""
+from __future__ import annotations
+import struct
+from collections.abc import Iterator
+
+try:
+    import opuslib
+except ImportError:
+    # Без opuslib доступно все, кроме самого кодера OggOpusEncoder
+    opuslib = None
+
+
+OGG_CAPTURE_PATTERN = b"OggS"
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+
+HEADER_CONTINUED = 0x01
+HEADER_BOS = 0x02
+HEADER_EOS = 0x04
+
+# Позиции (granule) в Ogg Opus всегда в сэмплах 48 кГц
+GRANULE_RATE = 48000
+
+
+def _crc_table() -> list[int]:
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    # CRC-32 из RFC 3533: полином 0x04C11DB7, без отражения, начальное значение 0
+    crc = 0
+    table = _CRC_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ b]
+    return crc
+
+
+def _lacing(size: int) -> bytes:
+    return b"\xff" * (size // 255) + bytes((size % 255,))
+
+
+class OggPageWriter:
+    """Собирает пакеты в страницы OGG одного логического потока."""
+
+    def __init__(self, serial: int = 1):
+        self.serial = serial
+        self.sequence = 0
+        self.bytes_written = 0
+
+    def page(self, packets: list[bytes], granule: int, header_type: int = 0) -> bytes:
+        # Пакеты целиком в одной странице (до 255 сегментов) - для наших пакетов по 20 мс этого хватает с запасом
+        segments = b"".join(_lacing(len(p)) for p in packets)
+        if len(segments) > 255:
+            raise ValueError(f"Too many segments for one page: {len(segments)}")
+
+        header = _PAGE_HEADER.pack(
+            OGG_CAPTURE_PATTERN, 0, header_type, granule, self.serial, self.sequence, 0, len(segments)
+        )
+        page = bytearray(header + segments + b"".join(packets))
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+
+        self.sequence += 1
+        self.bytes_written += len(page)
+        return bytes(page)
+
+
+def read_pages(data: bytes) -> Iterator[tuple[int, int, list[bytes]]]:
+    """(header_type, granule, пакеты) по страницам. Пакеты, продолжающиеся на следующей странице, не склеиваются."""
+    offset = 0
+    while offset < len(data):
+        capture, version, header_type, granule, _, _, crc, segments_count = _PAGE_HEADER.unpack_from(data, offset)
+        if capture != OGG_CAPTURE_PATTERN or version != 0:
+            raise ValueError(f"Not an OGG page at offset {offset}")
+        segments = data[offset + _PAGE_HEADER.size:offset + _PAGE_HEADER.size + segments_count]
+        body_offset = offset + _PAGE_HEADER.size + segments_count
+        page_size = body_offset - offset + sum(segments)
+
+        page = bytearray(data[offset:offset + page_size])
+        struct.pack_into("<I", page, 22, 0)
+        if ogg_crc(page) != crc:
+            raise ValueError(f"Bad OGG page CRC at offset {offset}")
+
+        packets = []
+        packet_size = 0
+        for lace in segments:
+            packet_size += lace
+            if lace < 255:
+                packets.append(data[body_offset:body_offset + packet_size])
+                body_offset += packet_size
+                packet_size = 0
+        if packet_size:
+            packets.append(data[body_offset:body_offset + packet_size])
+
+        yield header_type, granule, packets
+        offset += page_size
+
+
+def opus_head(sample_rate: int, pre_skip: int, channels: int = 1) -> bytes:
+    return b"OpusHead" + struct.pack("<BBHIhB", 1, channels, pre_skip, sample_rate, 0, 0)
+
+
+def opus_head_pre_skip(packet: bytes) -> int:
+    """pre_skip из пакета OpusHead."""
+    if not packet.startswith(b"OpusHead"):
+        raise ValueError("Not an OpusHead packet")
+    return struct.unpack_from("<H", packet, 10)[0]
+
+
+def encoder_lookahead(encoder) -> int:
+    """Задержка кодера opuslib (OPUS_GET_LOOKAHEAD), в сэмплах его частоты дискретизации."""
+    return opuslib.api.encoder.encoder_ctl(encoder.encoder_state, opuslib.api.ctl.get_lookahead)
+
+
+def opus_tags(vendor: str = "wow-speech-to-text") -> bytes:
+    vendor_bytes = vendor.encode("utf-8")
+    return b"OpusTags" + struct.pack("<I", len(vendor_bytes)) + vendor_bytes + struct.pack("<I", 0)
+
+
+class OggOpusEncoder:
+    """
+    Потоковый кодер: PCM 16 бит моно кусками любой длины -> страницы OGG/Opus.
+
+    headers() - первые две страницы (OpusHead, OpusTags), их надо отправить до аудио.
+    encode() - страница на каждый кусок (кадры по frame_ms, остаток ждет следующего куска).
+    flush() - последняя страница с флагом конца потока.
+
+    Позиции страниц - по RFC 7845: с учетом pre_skip (задержки кодера, ее спрашиваем у libopus),
+    у последней страницы - без тишины, которой добит последний кадр.
+    """
+
+    def __init__(self, sample_rate: int = 16000, bitrate: int = 24000, frame_ms: int = 20):
+        if opuslib is None:
+            raise RuntimeError("OGG_OPUS mode needs opuslib: pip install opuslib (and libopus)")
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._frame_bytes = self.frame_samples * 2
+
+        self._encoder = opuslib.Encoder(sample_rate, 1, opuslib.APPLICATION_VOIP)
+        self._encoder.bitrate = bitrate
+        # Сколько первых сэмплов (48 кГц) декодер должен выбросить
+        self.pre_skip = encoder_lookahead(self._encoder) * GRANULE_RATE // sample_rate
+        self._writer = OggPageWriter()
+        self._pending = bytearray()
+        # Сэмплов на входе, без добивки последнего кадра
+        self._samples = 0
+
+    @property
+    def bytes_written(self) -> int:
+        return self._writer.bytes_written
+
+    def headers(self) -> bytes:
+        return (
+            self._writer.page([opus_head(self.sample_rate, self.pre_skip)], 0, HEADER_BOS)
+            + self._writer.page([opus_tags()], 0)
+        )
+
+    @property
+    def granule(self) -> int:
+        return self.pre_skip + self._samples * GRANULE_RATE // self.sample_rate
+
+    def _encode_frames(self) -> list[bytes]:
+        packets = []
+        frames_bytes = len(self._pending) // self._frame_bytes * self._frame_bytes
+        for offset in range(0, frames_bytes, self._frame_bytes):
+            packets.append(self._encoder.encode(bytes(self._pending[offset:offset + self._frame_bytes]), self.frame_samples))
+        del self._pending[:frames_bytes]
+        return packets
+
+    def encode(self, pcm) -> bytes:
+        self._pending += pcm
+        packets = self._encode_frames()
+        if not packets:
+            return b""
+        self._samples += len(packets) * self.frame_samples
+        return self._writer.page(packets, self.granule)
+
+    def flush(self) -> bytes:
+        self._samples += len(self._pending) // 2
+        if self._pending:
+            self._pending += bytes(self._frame_bytes - len(self._pending) % self._frame_bytes)
+        return self._writer.page(self._encode_frames(), self.granule, HEADER_EOS)
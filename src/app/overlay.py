@@ -5,6 +5,9 @@ import win32api
 import win32con
 import win32gui
 
+import app.tracing
+import app.async_runtime
+from app.overlay_frames import BAND_BOTTOM, BAND_CENTER, BAND_TOP, EMPTY_STATE, FrameCoalescer, OverlayState
 from app.app_logging import logging
 
 
@@ -16,20 +19,48 @@ BOTTOM_TEXT = ""
 
 HWND = None
 H_FONT = None
+# Окно создано и показано
+_window_ready = threading.Event()
 
 WM_UPDATE_TEXT = win32con.WM_USER + 1
 
+# Полосы на всю ширину окна, где рисуется каждая строка; считаются при отрисовке. Пока их нет - перерисовываем все.
+BAND_RECTS: dict[str, tuple[int, int, int, int]] = {}
+
+
+class Win32Backend:
+    """Кадр - в окно: запоминаем состояние и измененные полосы, окно перерисует их по WM_UPDATE_TEXT."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = EMPTY_STATE
+        self._dirty: set[str] = set()
+
+    def render(self, state: OverlayState, bands: frozenset[str]):
+        with self._lock:
+            self.state = state
+            self._dirty |= bands
+        if HWND:
+            win32gui.PostMessage(HWND, WM_UPDATE_TEXT, 0, 0)
+
+    def take_dirty(self) -> set[str]:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+
+backend = Win32Backend()
+frames = FrameCoalescer(backend)
+
 
 def show_text(
         green_text: str,
         red_text: str,
         duration: float | None = None,
 ):
-    logger.info("start")
     set_text(green_text, red_text)
     if duration is not None:
-        logger.info("setting up timer")
-        threading.Timer(duration, clear_text).start()
+        app.async_runtime.call_later(duration, clear_text)
 
 
 def show_top(
@@ -38,7 +69,7 @@ def show_top(
 ):
     set_top_text(top_text)
     if duration is not None:
-        threading.Timer(duration, clear_top_text).start()
+        app.async_runtime.call_later(duration, clear_top_text)
 
 
 def show_bottom(
@@ -47,7 +78,7 @@ def show_bottom(
 ):
     set_bottom_text(bottom_text)
     if duration is not None:
-        threading.Timer(duration, clear_bottom_text).start()
+        app.async_runtime.call_later(duration, clear_bottom_text)
 
 
 def set_all(
@@ -68,7 +99,6 @@ def set_text(
         red_text: str,
 ):
     global CENTER_TEXT
-    logger.info("start")
     CENTER_TEXT = (green_text, red_text)
     refresh()
 
@@ -86,10 +116,9 @@ def set_bottom_text(bottom_text: str):
 
 
 def refresh():
-    logger.info("start")
-    if HWND:
-        logger.info("sending window message")
-        win32gui.PostMessage(HWND, WM_UPDATE_TEXT, 0, 0)
+    # Кадр уйдет в окно не сразу, если предыдущий был меньше 1/30 с назад; рисуется последнее состояние
+    green_text, red_text = CENTER_TEXT
+    frames.update(OverlayState(green_text, red_text, TOP_TEXT, BOTTOM_TEXT))
 
 
 def clear_all():
@@ -97,7 +126,6 @@ def clear_all():
 
 
 def clear_text():
-    logger.info("start")
     set_text("", "")
 
 
@@ -110,28 +138,23 @@ def clear_bottom_text():
 
 
 def wnd_proc(hwnd, msg, wparam, lparam):
-    global CENTER_TEXT, H_FONT, TOP_TEXT, BOTTOM_TEXT
-
-    logger.info("start")
+    global H_FONT
 
     if msg == win32con.WM_PAINT:
-        logger.info("msg == win32con.WM_PAINT")
+        paint_started_ns = app.tracing.now()
         hdc, ps = win32gui.BeginPaint(hwnd)
         try:
             rect = win32gui.GetClientRect(hwnd)
 
-            # фон заполняем как и раньше
+            # фон заполняем как и раньше (рисование обрезается по области, которую пометили к перерисовке)
             brush = win32gui.GetStockObject(win32con.BLACK_BRUSH)
             win32gui.FillRect(hdc, rect, brush)
 
-            # --- поддержка и старого и нового формата CENTER_TEXT ---
-            if isinstance(CENTER_TEXT, tuple):
-                green_text, red_text = CENTER_TEXT
-            else:
-                green_text, red_text = CENTER_TEXT, ""
-            full_text = (green_text or "") + (red_text or "")
-            top_text = TOP_TEXT or ""
-            bottom_text = BOTTOM_TEXT or ""
+            state = backend.state
+            green_text, red_text = state.green_text, state.red_text
+            full_text = green_text + red_text
+            top_text = state.top_text
+            bottom_text = state.bottom_text
 
             if full_text or top_text or bottom_text:
                 if H_FONT is None:
@@ -181,6 +204,10 @@ def wnd_proc(hwnd, msg, wparam, lparam):
                 # прямоугольник под всю строку
                 full_rect = (x, y, x + full_w, y + full_h)
 
+                BAND_RECTS[BAND_TOP] = (left, y - full_h - line_spacing, right, y - line_spacing)
+                BAND_RECTS[BAND_CENTER] = (left, y, right, y + full_h)
+                BAND_RECTS[BAND_BOTTOM] = (left, y + full_h + line_spacing, right, y + 2 * full_h + line_spacing)
+
                 if full_text:
                     # 1) весь текст красным
                     win32gui.SetTextColor(hdc, win32api.RGB(255, 0, 0))
@@ -221,12 +248,18 @@ def wnd_proc(hwnd, msg, wparam, lparam):
 
         finally:
             win32gui.EndPaint(hwnd, ps)
+            app.tracing.complete("overlay.paint", paint_started_ns)
 
         return 0
 
     if msg == WM_UPDATE_TEXT:
-        logger.info("msg == WM_UPDATE_TEXT")
-        win32gui.InvalidateRect(hwnd, None, True)
+        # Фон зальет WM_PAINT, поэтому без стирания (bErase=False)
+        dirty = backend.take_dirty()
+        if dirty and all(band in BAND_RECTS for band in dirty):
+            for band in dirty:
+                win32gui.InvalidateRect(hwnd, BAND_RECTS[band], False)
+        elif dirty:
+            win32gui.InvalidateRect(hwnd, None, False)
         return 0
 
     if msg == win32con.WM_MOUSEACTIVATE:
@@ -296,6 +329,7 @@ def _overlay_thread():
     )
 
     win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
+    _window_ready.set()
 
     # Для проверки: показываем тестовый текст
     def demo():
@@ -307,7 +341,9 @@ def _overlay_thread():
     win32gui.PumpMessages()
 
 
-def start_overlay():
-    """Запуск оверлея в отдельном потоке. Вызывать один раз при старте программы."""
+def start_overlay(ready_timeout_s: float = 5.0):
+    """Запуск оверлея в отдельном потоке. Вызывать один раз при старте программы. Возвращается, когда окно создано."""
     t = threading.Thread(target=_overlay_thread, daemon=True)
     t.start()
+    if not _window_ready.wait(ready_timeout_s):
+        logger.warning("Overlay window is not created after %.0f s", ready_timeout_s)
@@ -0,0 +1,118 @@
+"""
+Кадры оверлея: частые обновления текста склеиваются, на экран уходит не больше max_fps кадров в секунду.
+
+update() можно звать на каждый частичный результат. Если кадр недавно был, новый откладывается до конца бюджета
+кадра (1 / max_fps); пока он ждет, новые состояния просто заменяют ожидающее - рисуется последнее.
+Кадр сообщает backend'у, какие полосы (top, center, bottom) изменились - перерисовывать надо только их.
+Куда идут кадры, решает backend: в overlay.py - окно Windows, в проверках - HeadlessBackend.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+import app.async_runtime
+import app.tracing
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+MAX_FPS = 30
+
+BAND_TOP = "top"
+BAND_CENTER = "center"
+BAND_BOTTOM = "bottom"
+BANDS = (BAND_TOP, BAND_CENTER, BAND_BOTTOM)
+
+
+class OverlayState(NamedTuple):
+    green_text: str = ""
+    red_text: str = ""
+    top_text: str = ""
+    bottom_text: str = ""
+
+
+EMPTY_STATE = OverlayState()
+
+
+def changed_bands(old: OverlayState, new: OverlayState) -> frozenset[str]:
+    bands = set()
+    if old.top_text != new.top_text:
+        bands.add(BAND_TOP)
+    if (old.green_text, old.red_text) != (new.green_text, new.red_text):
+        bands.add(BAND_CENTER)
+    if old.bottom_text != new.bottom_text:
+        bands.add(BAND_BOTTOM)
+    return frozenset(bands)
+
+
+class HeadlessBackend:
+    """Никуда не рисует, только запоминает кадры: (time.monotonic, состояние, измененные полосы)."""
+
+    def __init__(self):
+        self.frames: list[tuple[float, OverlayState, frozenset[str]]] = []
+
+    def render(self, state: OverlayState, bands: frozenset[str]):
+        self.frames.append((time.monotonic(), state, bands))
+
+
+class FrameCoalescer:
+
+    def __init__(
+            self,
+            backend,
+            max_fps: float = MAX_FPS,
+            clock: Callable[[], float] = time.monotonic,
+            call_later: Callable[..., None] | None = None,
+    ):
+        self.backend = backend
+        self.frame_s = 1 / max_fps
+        self._clock = clock
+        self._call_later = call_later or app.async_runtime.call_later
+        self._lock = threading.Lock()
+        self._pending: OverlayState | None = None
+        self._scheduled = False
+        self._rendered = EMPTY_STATE
+        self._last_frame_at: float | None = None
+        # Для замеров: сколько пришло обновлений, сколько нарисовано кадров
+        self.updates = 0
+        self.frames = 0
+
+    @property
+    def rendered(self) -> OverlayState:
+        return self._rendered
+
+    def update(self, state: OverlayState):
+        with self._lock:
+            self.updates += 1
+            self._pending = state
+            if self._scheduled:
+                return
+            now = self._clock()
+            wait = 0.0 if self._last_frame_at is None else self._last_frame_at + self.frame_s - now
+            if wait > 0:
+                self._scheduled = True
+                self._call_later(wait, self._frame)
+                return
+            self._scheduled = True
+        self._frame()
+
+    def _frame(self):
+        with self._lock:
+            state, self._pending = self._pending, None
+            self._scheduled = False
+            if state is None:
+                return
+            bands = changed_bands(self._rendered, state)
+            if not bands:
+                return
+            self._rendered = state
+            self._last_frame_at = self._clock()
+            self.frames += 1
+            started_ns = app.tracing.now()
+            # Под блокировкой, чтобы кадры не обгоняли друг друга
+            self.backend.render(state, bands)
+            app.tracing.complete("overlay.refresh", started_ns)
+
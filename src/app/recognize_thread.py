@@ -1,3 +1,4 @@
+from __future__ import annotations
 import threading
 import app.yandex_speech_kit
 
@@ -6,35 +7,63 @@ from app.app_logging import logging
 
 logger = logging.getLogger(__name__)
 
-recognize_thread: threading.Thread | None = None
-recognize_thread_stop_event: threading.Event | None = None
+# Поток распознавания текущей записи - в своем потоке или задачей в цикле asyncio (см. app.async_runtime)
+recognize_stream: app.yandex_speech_kit.RecognizeStreamBase | None = None
 
+# Поток, открытый по команде старта (commit), пока режим записи его не забрал (start)
+started_stream: app.yandex_speech_kit.RecognizeStreamBase | None = None
+_lock = threading.Lock()
 
-def init(iam_token: str):
-    app.yandex_speech_kit.yandex_speech_kit_init(iam_token)
+
+def init(iam_token: str, folder_id: str | None = None):
+    app.yandex_speech_kit.yandex_speech_kit_init(iam_token, folder_id)
+
+
+def set_iam_token(iam_token: str):
+    app.yandex_speech_kit.set_iam_token(iam_token)
 
 
 def shutdown():
+    global started_stream
+    with _lock:
+        if started_stream is not None:
+            started_stream.stop()
+            started_stream = None
     app.yandex_speech_kit.yandex_speech_kit_shutdown()
 
 
+def commit(start_pos: int | None = None):
+    """
+    Команда старта сработала - открываем поток и начинаем слать аудио сразу, не дожидаясь паузы
+    перед режимом записи.
+
+    start_pos - позиция в захвате, с которой слать (конец слова-триггера).
+    """
+    global started_stream
+    with _lock:
+        if started_stream is not None and started_stream.is_alive:
+            return
+        logger.debug("Starting recognize stream before the grace")
+        started_stream = app.yandex_speech_kit.new_recognize_stream(start_pos)
+
+
 def start(callback: app.yandex_speech_kit.RecognizedFragmentCallback):
-    global recognize_thread_stop_event, recognize_thread
+    global recognize_stream, started_stream
+
+    commit()
+    with _lock:
+        stream = started_stream
+        started_stream = None
 
-    recognize_thread_stop_event = threading.Event()
-    recognize_thread = threading.Thread(
-        target=app.yandex_speech_kit.recognize_from_microphone,
-        args=(recognize_thread_stop_event, callback),
-        daemon=True
-    )
-    recognize_thread.start()
+    recognize_stream = stream
+    stream.attach(callback)
 
 
 def stop():
-    global recognize_thread, recognize_thread_stop_event
-    if recognize_thread:
-        logger.info("recognize_thread is set. Stopping the thread")
-        recognize_thread_stop_event.set()
-        recognize_thread = None
+    global recognize_stream
+    if recognize_stream:
+        logger.info("recognize_stream is set. Stopping the stream")
+        recognize_stream.stop()
+        recognize_stream = None
     else:
-        logger.info("recognize_thread is not set")
+        logger.info("recognize_stream is not set")
@@ -0,0 +1,63 @@
+from __future__ import annotations
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RecognizerPool(Generic[T]):
+    """
+    Готовые распознаватели по ключу (грамматике), чтобы не собирать их заново на каждую смену режима.
+
+    factory(key) строит новый (для Kaldi это компиляция грамматики), reset(item) готовит возвращенный
+    к повторному использованию. warm() заранее достраивает пул до size штук.
+    """
+
+    def __init__(self, factory: Callable[[Hashable], T], reset: Callable[[T], None], size: int = 2):
+        self._factory = factory
+        self._reset = reset
+        self.size = size
+        self._free: dict[Hashable, list[T]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+
+    def _build(self, key: Hashable) -> T:
+        started = time.perf_counter()
+        item = self._factory(key)
+        logger.debug("Recognizer built in %.1f ms", (time.perf_counter() - started) * 1000)
+        with self._lock:
+            self.built += 1
+        return item
+
+    def warm(self, key: Hashable):
+        while True:
+            with self._lock:
+                if len(self._free[key]) >= self.size:
+                    return
+            item = self._build(key)
+            with self._lock:
+                self._free[key].append(item)
+
+    def acquire(self, key: Hashable) -> T:
+        with self._lock:
+            free = self._free[key]
+            if free:
+                self.reused += 1
+                return free.pop()
+        return self._build(key)
+
+    def release(self, key: Hashable, item: T):
+        self._reset(item)
+        with self._lock:
+            free = self._free[key]
+            if len(free) < self.size:
+                free.append(item)
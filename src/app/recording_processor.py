@@ -10,6 +10,8 @@ import app.wow_chat_sender
 import app.recognize_thread
 import app.mode_container
 import app.idle_processor
+import app.tracing
+import app.session_recorder
 
 from app.app_logging import logging
 
@@ -28,12 +30,17 @@ class RecordingTextsProcessor(app.mode_container.ModeProcessor):
     idle_processor: app.idle_processor.IdleProcessor
 
     def __init__(self, mode_container: app.mode_container.ModeContainer):
-        super().__init__(mode_container, "recording")
+        super().__init__(mode_container, app.mode_container.MODE_RECORDING)
+        mode_container.subscribe(self.on_mode_changed)
 
     def set_idle_processor(self, idle_processor: app.idle_processor.IdleProcessor):
         self.idle_processor = idle_processor
 
     def handle_recognized_fragment(self, recognized_fragment: str, is_final: bool):
+        with app.tracing.span("handle_recognized_fragment"):
+            self._handle_recognized_fragment(recognized_fragment, is_final)
+
+    def _handle_recognized_fragment(self, recognized_fragment: str, is_final: bool):
 
         recognized_fragment = recognized_fragment.strip().lower()
         if not recognized_fragment:
@@ -87,7 +94,8 @@ class RecordingTextsProcessor(app.mode_container.ModeProcessor):
             self.to_idle()
 
     def on_recognized_fragment(self, alternatives: list[str], is_final: bool):
-        if self.mode_container.mode == "recording":
+        app.session_recorder.recorder.record_fragment(alternatives, is_final)
+        if self.mode_container.mode == app.mode_container.MODE_RECORDING:
             self.handle_recognized_fragment(alternatives[0], is_final)
 
     def recording_refresh_overlay(self):
@@ -101,18 +109,24 @@ class RecordingTextsProcessor(app.mode_container.ModeProcessor):
     def on_mode_enter(self, chat_channel: str):
         self.chat_channel = chat_channel
         self.prev_partial_text = None
+        app.tracing.next_utterance()
         self.recording_refresh_overlay()
         app.recognize_thread.start(self.on_recognized_fragment)
 
+    def on_mode_changed(self, old_mode: str, new_mode: str):
+        # Оверлей живет, пока идет запись и пауза после нее
+        if new_mode in app.mode_container.LISTENING_MODES:
+            app.overlay.clear_all()
+
     def on_mode_leave(self):
         logger.debug("start")
         app.recognize_thread.stop()
 
     def on_after_mode_leave_grace(self):
         logger.debug("start")
+        app.session_recorder.stop_session()
         self.chat_channel = None
         tokens_to_text_builder.reset()
-        app.overlay.clear_all()
 
 
 recording_processor = RecordingTextsProcessor(app.mode_container.mode_container)
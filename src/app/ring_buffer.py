@@ -0,0 +1,249 @@
+from __future__ import annotations
+import asyncio
+import struct
+import threading
+import time
+from collections.abc import Callable
+from multiprocessing import shared_memory
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """
+    Кольцевой буфер аудио: один писатель (колбэк захвата), сколько угодно читателей со своими курсорами.
+
+    Позиции - абсолютные, в байтах от начала захвата, и только растут.
+    Буфер выделяется один раз. Писатель никогда не ждет: медленный читатель теряет самое старое
+    (см. RingReader.overruns).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._write_pos = 0
+        self._condition = threading.Condition()
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def write_pos(self) -> int:
+        return self._write_pos
+
+    @property
+    def oldest_pos(self) -> int:
+        return max(0, self._write_pos - self.capacity)
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        size = len(data)
+
+        with self._condition:
+            pos = self._write_pos
+            if size > self.capacity:
+                # В буфер влезает только хвост
+                pos += size - self.capacity
+                data = data[size - self.capacity:]
+            start = pos % self.capacity
+            first = min(len(data), self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if first < len(data):
+                self._view[:len(data) - first] = data[first:]
+            self._write_pos += size
+            self._condition.notify_all()
+
+        for listener in self._listeners:
+            listener()
+
+    def add_listener(self, listener: Callable[[], None]):
+        """listener() вызывается после каждой записи, в потоке писателя. Должен быть быстрым."""
+        self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener: Callable[[], None]):
+        self._listeners = [other for other in self._listeners if other != listener]
+
+    def wait_for(self, pos: int, timeout: float | None) -> bool:
+        """Ждет, пока записано хотя бы pos байт."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._write_pos >= pos, timeout)
+
+    def view(self, start_pos: int, size: int) -> memoryview | None:
+        """Непрерывный кусок [start_pos, start_pos + size), если он не переходит через конец буфера."""
+        start = start_pos % self.capacity
+        if start + size > self.capacity:
+            return None
+        return self._view[start:start + size]
+
+    def copy_into(self, target: memoryview, start_pos: int):
+        size = len(target)
+        start = start_pos % self.capacity
+        first = min(size, self.capacity - start)
+        target[:first] = self._view[start:start + first]
+        if first < size:
+            target[first:] = self._view[:size - first]
+
+    def reader(self, start_pos: int | None = None) -> RingReader:
+        """Новый читатель с позиции start_pos (по умолчанию - с текущего конца записи)."""
+        return RingReader(self, self._write_pos if start_pos is None else start_pos)
+
+
+class SharedRingBuffer(RingBuffer):
+    """
+    RingBuffer в общей памяти (multiprocessing.shared_memory), чтобы его читали и другие процессы (app.idle_worker).
+
+    Пишет только процесс, создавший сегмент. Позиция записи - в первых 8 байтах сегмента, и обновляется
+    после данных. В других процессах условия нет, поэтому там wait_for опрашивает позицию раз в poll_interval.
+    """
+
+    _HEADER = struct.Struct("<Q")
+
+    def __init__(self, capacity: int, name: str | None = None, poll_interval: float = 0.005):
+        self.capacity = capacity
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self._HEADER.size + capacity)
+            self._HEADER.pack_into(self.shm.buf, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._view = self.shm.buf[self._HEADER.size:self._HEADER.size + capacity]
+        self._condition = threading.Condition()
+        self._listeners: list[Callable[[], None]] = []
+        self.poll_interval = poll_interval
+
+    @property
+    def _write_pos(self) -> int:
+        return self._HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    @_write_pos.setter
+    def _write_pos(self, pos: int):
+        self._HEADER.pack_into(self.shm.buf, 0, pos)
+
+    def wait_for(self, pos: int, timeout: float | None) -> bool:
+        if self.owner:
+            return super().wait_for(pos, timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._write_pos < pos:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def close(self):
+        self._view.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+
+    def __init__(self, ring: RingBuffer, pos: int):
+        self.ring = ring
+        self.pos = max(pos, ring.oldest_pos)
+        self.overruns = 0
+        self._scratch: bytearray | None = None
+
+    @property
+    def available(self) -> int:
+        return self.ring.write_pos - self.pos
+
+    def skip_to_end(self):
+        self.pos = self.ring.write_pos
+
+    def read(self, size: int, timeout: float | None = None) -> memoryview | None:
+        """
+        Следующие size байт, или None, если за timeout столько не набралось.
+
+        Возвращает memoryview прямо в кольцо, без копирования. Он годен, пока писатель
+        не сделал полный круг, то есть его надо использовать до следующего read.
+        Только если кусок переходит через конец буфера, он собирается в собственный буфер читателя.
+        """
+        if not self.ring.wait_for(self.pos + size, timeout):
+            return None
+
+        oldest_pos = self.ring.oldest_pos
+        if self.pos < oldest_pos:
+            # Писатель обогнал нас на целый круг - пропускаем потерянное
+            self.overruns += 1
+            logger.warning("Ring buffer overrun: lost %s bytes", oldest_pos - self.pos)
+            self.pos = oldest_pos
+
+        data = self.ring.view(self.pos, size)
+        if data is None:
+            if self._scratch is None or len(self._scratch) != size:
+                self._scratch = bytearray(size)
+            data = memoryview(self._scratch)
+            self.ring.copy_into(data, self.pos)
+
+        self.pos += size
+        return data
+
+
+class AsyncRingReader:
+    """
+    RingReader для asyncio (app.async_runtime): read() ждет данные в цикле событий, не занимая поток.
+
+    Писатель будит цикл через call_soon_threadsafe. Создавать и читать - в потоке цикла, close() - когда больше не нужен.
+    """
+
+    def __init__(self, reader: RingReader, loop: asyncio.AbstractEventLoop | None = None):
+        self.reader = reader
+        self._loop = loop or asyncio.get_running_loop()
+        self._written = asyncio.Event()
+        reader.ring.add_listener(self._on_write)
+
+    def _on_write(self):
+        self._loop.call_soon_threadsafe(self._written.set)
+
+    @property
+    def pos(self) -> int:
+        return self.reader.pos
+
+    @property
+    def available(self) -> int:
+        return self.reader.available
+
+    async def read(self, size: int) -> memoryview:
+        while self.reader.available < size:
+            self._written.clear()
+            # Запись могла пройти между проверкой и clear()
+            if self.reader.available >= size:
+                break
+            await self._written.wait()
+        return self.reader.read(size, timeout=0)
+
+    def close(self):
+        self.reader.ring.remove_listener(self._on_write)
+
+
+class PositionMap:
+    """
+    Соответствие позиций в потоке, поданном потребителю с пропусками (например, Vosk после отсева тишины),
+    позициям в кольце. Поток склеен из непрерывных отрезков кольца.
+    """
+
+    def __init__(self, max_segments: int = 64):
+        # (начало отрезка в поданном потоке, начало отрезка в кольце)
+        self._segments: list[tuple[int, int]] = []
+        self._max_segments = max_segments
+        self.fed = 0
+        self._next_ring_pos: int | None = None
+
+    def feed(self, ring_pos: int, size: int):
+        """Потребителю подан кусок кольца [ring_pos, ring_pos + size)."""
+        if ring_pos != self._next_ring_pos:
+            self._segments.append((self.fed, ring_pos))
+            if len(self._segments) > self._max_segments:
+                del self._segments[0]
+        self.fed += size
+        self._next_ring_pos = ring_pos + size
+
+    def ring_pos(self, fed_pos: int) -> int | None:
+        for fed_start, ring_start in reversed(self._segments):
+            if fed_start <= fed_pos:
+                return ring_start + fed_pos - fed_start
+        return None
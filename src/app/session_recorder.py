@@ -0,0 +1,158 @@
+from __future__ import annotations
+import os
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from typing import BinaryIO, NamedTuple
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Если задан каталог, каждый сеанс записи сохраняется в нем в отдельный файл .wstt
+RECORD_DIR_ENV = "WOW_STT_RECORD_DIR"
+
+# Формат файла:
+#   заголовок: MAGIC, версия (u8), частота дискретизации (u32), количество каналов (u8)
+#   записи:    тип (u8), время от начала сеанса в нс (u64), длина данных (u32), данные
+# Данные аудио - сырой PCM из захвата, как его прочитал поток распознавания: до отсева тишины (app.vad)
+# и до кодирования в Opus. Начинается с куска от конца слова-триггера (pre-roll).
+# Данные фрагмента - альтернативы в UTF-8, через "\n".
+MAGIC = b"WSTT"
+VERSION = 1
+_HEADER = struct.Struct("<4sBIB")
+_RECORD_HEADER = struct.Struct("<BQI")
+
+RECORD_AUDIO = 1
+RECORD_PARTIAL = 2
+RECORD_FINAL = 3
+
+
+class SessionRecord(NamedTuple):
+    kind: int
+    t_ns: int
+    data: bytes
+
+    @property
+    def alternatives(self) -> list[str]:
+        return self.data.decode("utf-8").split("\n")
+
+    @property
+    def is_final(self) -> bool:
+        return self.kind == RECORD_FINAL
+
+
+class SessionRecorder:
+    """Пишет в файл аудио и фрагменты распознавания одного сеанса записи, с монотонными метками времени."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file: BinaryIO | None = None
+        self._started_ns = 0
+        self.path: str | None = None
+
+    @property
+    def is_recording(self) -> bool:
+        return self._file is not None
+
+    def start(self, path: str, sample_rate: int = 16000, channels: int = 1):
+        with self._lock:
+            self._close_locked()
+            self._file = open(path, "wb")
+            self._file.write(_HEADER.pack(MAGIC, VERSION, sample_rate, channels))
+            self._started_ns = time.monotonic_ns()
+            self.path = path
+        logger.info("Записываем сеанс в %s", path)
+
+    def _write(self, kind: int, data: bytes):
+        t_ns = time.monotonic_ns()
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_RECORD_HEADER.pack(kind, t_ns - self._started_ns, len(data)))
+            self._file.write(data)
+
+    def record_audio(self, data: bytes):
+        if self._file is None:
+            return
+        self._write(RECORD_AUDIO, data)
+
+    def record_fragment(self, alternatives: list[str], is_final: bool):
+        if self._file is None:
+            return
+        self._write(RECORD_FINAL if is_final else RECORD_PARTIAL, "\n".join(alternatives).encode("utf-8"))
+
+    def _close_locked(self):
+        if self._file is not None:
+            self._file.close()
+            logger.info("Сеанс записан в %s", self.path)
+        self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+
+class SessionHeader(NamedTuple):
+    sample_rate: int
+    channels: int
+
+
+def _read_header(f: BinaryIO, path: str) -> SessionHeader:
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{path}: not a recorded session (file too short)")
+    magic, version, sample_rate, channels = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a recorded session (magic={magic!r}, version={version})")
+    return SessionHeader(sample_rate, channels)
+
+
+def read_session_header(path: str) -> SessionHeader:
+    with open(path, "rb") as f:
+        return _read_header(f, path)
+
+
+def read_session(path: str) -> Iterator[SessionRecord]:
+    with open(path, "rb") as f:
+        _read_header(f, path)
+        while True:
+            record_header = f.read(_RECORD_HEADER.size)
+            if not record_header:
+                return
+            if len(record_header) < _RECORD_HEADER.size:
+                raise ValueError(f"{path}: truncated record header")
+            kind, t_ns, length = _RECORD_HEADER.unpack(record_header)
+            data = f.read(length)
+            if len(data) < length:
+                raise ValueError(f"{path}: truncated record")
+            yield SessionRecord(kind, t_ns, data)
+
+
+recorder = SessionRecorder()
+
+
+def session_path(record_dir: str, now: float | None = None) -> str:
+    """Имя файла сеанса: время до миллисекунд, и счетчик, если такой файл уже есть."""
+    now = time.time() if now is None else now
+    name = time.strftime("session-%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+    path = os.path.join(record_dir, name + ".wstt")
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(record_dir, f"{name}-{counter}.wstt")
+        counter += 1
+    return path
+
+
+def start_session():
+    record_dir = os.environ.get(RECORD_DIR_ENV)
+    if not record_dir:
+        return
+    os.makedirs(record_dir, exist_ok=True)
+    recorder.start(session_path(record_dir))
+
+
+def stop_session():
+    recorder.close()
@@ -0,0 +1,126 @@
+"""
+Воспроизведение сеанса, записанного app.session_recorder, без микрофона и сети.
+
+Фрагменты распознавания подаются заново, в реальном времени (--realtime) или так быстро, как получится:
+- --target builder: прямо в TextBuilderSession (работает на любой ОС, удобно для замеров и регрессий);
+- --target processor: через RecordingTextsProcessor.handle_recognized_fragment, то есть с оверлеем,
+  звуками и, на стоп-словах, настоящей отправкой в чат.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python -m app.session_replay session-20250101-120000.wstt --target builder
+"""
+from __future__ import annotations
+import argparse
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+from app.session_recorder import read_session, read_session_header, RECORD_AUDIO
+from app.tokens_to_text_builder import TextBuilderSession
+import app.tracing
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+FragmentHandler = Callable[[str, bool], None]
+
+
+class ReplayStats(NamedTuple):
+    fragments: int
+    audio_seconds: float
+    recorded_seconds: float
+    elapsed_seconds: float
+    # Время обработчика на один фрагмент, мс, по возрастанию
+    handler_ms: list[float]
+
+
+def replay(path: str, handler: FragmentHandler, realtime: bool = False) -> ReplayStats:
+    header = read_session_header(path)
+    bytes_per_second = header.sample_rate * header.channels * 2
+
+    fragments = 0
+    audio_bytes = 0
+    last_t_ns = 0
+    handler_ms = []
+
+    started_ns = time.monotonic_ns()
+    for record in read_session(path):
+        last_t_ns = record.t_ns
+        if record.kind == RECORD_AUDIO:
+            audio_bytes += len(record.data)
+            continue
+
+        if realtime:
+            delay_ns = record.t_ns - (time.monotonic_ns() - started_ns)
+            if delay_ns > 0:
+                time.sleep(delay_ns / 1e9)
+
+        handler_started_ns = time.perf_counter_ns()
+        handler(record.alternatives[0], record.is_final)
+        handler_ms.append((time.perf_counter_ns() - handler_started_ns) / 1e6)
+        fragments += 1
+
+    handler_ms.sort()
+    return ReplayStats(
+        fragments=fragments,
+        audio_seconds=audio_bytes / bytes_per_second,
+        recorded_seconds=last_t_ns / 1e9,
+        elapsed_seconds=(time.monotonic_ns() - started_ns) / 1e9,
+        handler_ms=handler_ms,
+    )
+
+
+def builder_handler(session: TextBuilderSession) -> FragmentHandler:
+    # Та же подготовка текста, что в RecordingTextsProcessor, но без стоп-слов: они идут в текст как обычные слова
+    def handle(recognized_fragment: str, is_final: bool):
+        tokens = recognized_fragment.strip().lower().split()
+        if tokens:
+            session.build_text(tokens, is_final)
+    return handle
+
+
+def processor_handler(chat_channel: str) -> FragmentHandler:
+    import app.recording_processor
+    processor = app.recording_processor.recording_processor
+    processor.chat_channel = chat_channel
+    processor.prev_partial_text = None
+    return processor.handle_recognized_fragment
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded recognition session")
+    parser.add_argument("path")
+    parser.add_argument("--realtime", action="store_true", help="keep recorded timing instead of replaying as fast as possible")
+    parser.add_argument("--target", choices=("builder", "processor"), default="builder")
+    parser.add_argument("--chat-channel", default="s", help="chat channel for --target processor")
+    args = parser.parse_args()
+
+    session = None
+    if args.target == "builder":
+        session = TextBuilderSession()
+        handler = builder_handler(session)
+    else:
+        handler = processor_handler(args.chat_channel)
+
+    stats = replay(args.path, handler, realtime=args.realtime)
+
+    logger.info(
+        "fragments=%s audio=%.1f s recorded=%.1f s replayed in %.3f s",
+        stats.fragments, stats.audio_seconds, stats.recorded_seconds, stats.elapsed_seconds
+    )
+    logger.info(
+        "handler p50=%.3f ms  p95=%.3f ms  p99=%.3f ms",
+        app.tracing.percentile(stats.handler_ms, 50),
+        app.tracing.percentile(stats.handler_ms, 95),
+        app.tracing.percentile(stats.handler_ms, 99),
+    )
+    if session is not None:
+        logger.info("text=%s", session.text)
+
+
+if __name__ == "__main__":
+    main()
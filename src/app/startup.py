@@ -0,0 +1,176 @@
+"""
+Запуск по шагам: независимые шаги идут параллельно, зависимые ждут то, от чего зависят.
+
+Шаг - функция; ей передаются результаты шагов из requires, в том же порядке. Шаг стартует, как только готовы
+все его зависимости. Если шаг упал, новые шаги не начинаются, уже идущие дорабатывают, и run() поднимает ошибку.
+
+После run() есть хронология: когда начался и кончился каждый шаг, и критический путь - цепочка шагов, которая
+определила время до готовности. format_timeline() - для лога, append_report() - строка JSON в файл
+(WOW_STT_STARTUP_REPORT), чтобы сравнивать время запуска между версиями.
+"""
+from __future__ import annotations
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, NamedTuple
+
+import app.tracing
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE_ENV = "WOW_STT_STARTUP_REPORT"
+MAX_WORKERS = 8
+
+
+class Step(NamedTuple):
+    name: str
+    run: Callable[..., Any]
+    requires: tuple[str, ...]
+
+
+class StepTiming(NamedTuple):
+    name: str
+    # От начала run(), мс
+    started_ms: float
+    ended_ms: float
+    thread: str
+
+    @property
+    def duration_ms(self) -> float:
+        return self.ended_ms - self.started_ms
+
+
+class Startup:
+
+    def __init__(self, max_workers: int = MAX_WORKERS, clock: Callable[[], float] = time.perf_counter):
+        self.max_workers = max_workers
+        self._clock = clock
+        self.steps: dict[str, Step] = {}
+        self.timings: dict[str, StepTiming] = {}
+        self.ready_ms: float | None = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+
+    def step(self, name: str, run: Callable[..., Any], requires: tuple[str, ...] = ()):
+        if name in self.steps:
+            raise ValueError(f"Duplicate startup step {name!r}")
+        self.steps[name] = Step(name, run, tuple(requires))
+
+    def _check(self):
+        for step in self.steps.values():
+            for required in step.requires:
+                if required not in self.steps:
+                    raise ValueError(f"Startup step {step.name!r} requires unknown step {required!r}")
+
+        # Циклы: снимаем шаги без неснятых зависимостей, пока снимается
+        done: set[str] = set()
+        while len(done) < len(self.steps):
+            ready = [name for name, step in self.steps.items() if name not in done and done.issuperset(step.requires)]
+            if not ready:
+                raise ValueError(f"Startup steps have a dependency cycle: {sorted(set(self.steps) - done)}")
+            done.update(ready)
+
+    def _run_step(self, step: Step, args: list[Any]) -> Any:
+        started = self._clock()
+        started_ns = app.tracing.now()
+        try:
+            return step.run(*args)
+        finally:
+            ended = self._clock()
+            app.tracing.complete(f"startup.{step.name}", started_ns)
+            with self._lock:
+                self.timings[step.name] = StepTiming(
+                    step.name,
+                    (started - self._started) * 1000,
+                    (ended - self._started) * 1000,
+                    threading.current_thread().name,
+                )
+
+    def run(self) -> dict[str, Any]:
+        """Выполнить все шаги; результаты по именам шагов."""
+        self._check()
+        self._started = self._clock()
+        self.timings.clear()
+        results: dict[str, Any] = {}
+        pending = dict(self.steps)
+        running: dict[concurrent.futures.Future, str] = {}
+        error: BaseException | None = None
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="startup") as executor:
+            while pending or running:
+                if error is None:
+                    for name, step in list(pending.items()):
+                        if all(required in results for required in step.requires):
+                            del pending[name]
+                            args = [results[required] for required in step.requires]
+                            running[executor.submit(self._run_step, step, args)] = name
+                if not running:
+                    break
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException as e:
+                        logger.error("Startup step %r failed: %r", name, e)
+                        if error is None:
+                            error = e
+
+        self.ready_ms = (self._clock() - self._started) * 1000
+        if error is not None:
+            raise error
+        return results
+
+    def critical_path(self) -> list[str]:
+        """Цепочка шагов до последнего закончившегося: у каждого берем зависимость, которую он ждал дольше всех."""
+        if not self.timings:
+            return []
+        path = [max(self.timings.values(), key=lambda timing: timing.ended_ms).name]
+        while True:
+            requires = [name for name in self.steps[path[-1]].requires if name in self.timings]
+            if not requires:
+                break
+            path.append(max(requires, key=lambda name: self.timings[name].ended_ms))
+        path.reverse()
+        return path
+
+    def format_timeline(self, width: int = 40) -> str:
+        total_ms = max(self.ready_ms or 0.0, max((t.ended_ms for t in self.timings.values()), default=0.0), 1.0)
+        critical = set(self.critical_path())
+        name_width = max((len(name) for name in self.timings), default=4)
+        lines = [f"Startup ready in {total_ms:.0f} ms (* - critical path)"]
+        for timing in sorted(self.timings.values(), key=lambda t: (t.started_ms, t.name)):
+            begin = min(round(timing.started_ms / total_ms * width), width - 1)
+            end = max(round(timing.ended_ms / total_ms * width), begin + 1)
+            bar = " " * begin + "#" * (end - begin) + " " * (width - end)
+            lines.append(
+                f"{'*' if timing.name in critical else ' '} {timing.name:<{name_width}}"
+                f" {timing.started_ms:7.0f} {timing.duration_ms:7.0f} ms |{bar}|"
+            )
+        return "\n".join(lines)
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "ready_ms": round(self.ready_ms or 0.0, 1),
+            "critical_path": self.critical_path(),
+            "steps": {
+                name: {"started_ms": round(t.started_ms, 1), "duration_ms": round(t.duration_ms, 1)}
+                for name, t in sorted(self.timings.items())
+            },
+        }
+
+
+def append_report(startup: Startup, path: str | None = None):
+    """Строка JSON с хронологией запуска - в конец файла WOW_STT_STARTUP_REPORT (если задан)."""
+    path = path or os.environ.get(REPORT_FILE_ENV)
+    if not path:
+        return
+    line = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **startup.report()}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(line, ensure_ascii=False) + "\n")
@@ -1,60 +1,106 @@
 from __future__ import annotations
-import copy
-from typing import cast
-from itertools import takewhile
-from rus2num import Rus2Num
+from collections import OrderedDict
+from typing import cast, NamedTuple
 
+from app.numeral_normalizer import StreamingNumeralNormalizer, common_prefix_len
+import app.tracing
 from app.app_logging import logging
 
 
 _logger = logging.getLogger(__name__)
 
 
-__all__ = ["text", "build_text", "reset"]
-
-_rus_2_num = Rus2Num()
+__all__ = ["text", "final_text", "non_final_text", "build_text", "reset", "TextBuilderSession", "SmartTokenTable", "default_smart_tokens"]
 
 text: str = ""
 final_text: str = ""
 non_final_text: str = ""
 
-_all_tokens: list[str] = []
-_final_token_index: int = -1
-_prev_partial_tokens: list[str] = []
-_text_actions: list[_TextAction] = []
-_token_index_to_text_action_index: dict[int, int] = {}
-
 
 class _SentenceState:
+    """Неизменяемое состояние предложения. Экземпляры общие, берутся через _get_sentence_state."""
+
+    __slots__ = ("open_quote", "new_sentence")
+
     def __init__(self, open_quote=False, new_sentence=True):
         self.open_quote = open_quote
         self.new_sentence = new_sentence
 
 
+_SENTENCE_STATES = {
+    (open_quote, new_sentence): _SentenceState(open_quote, new_sentence)
+    for open_quote in (False, True)
+    for new_sentence in (False, True)
+}
+
+
+def _get_sentence_state(open_quote: bool, new_sentence: bool) -> _SentenceState:
+    return _SENTENCE_STATES[(open_quote, new_sentence)]
+
+
+_INITIAL_SENTENCE_STATE = _get_sentence_state(open_quote=False, new_sentence=True)
+
+
 class _TextAction:
+    __slots__ = ("raw_token_index",)
+
     def __init__(self, raw_token_index: int):
         self.raw_token_index = raw_token_index
 
 
 class _AdditionTextAction(_TextAction):
+    """
+    Добавление к тексту.
+
+    Версия текста целиком не хранится: только кусок (пробел и токен) и ссылка на добавление,
+    поверх которого он лег. Общие префиксы версий текста разделяются, память растет линейно.
+    """
+
+    __slots__ = ("base_action_index", "prev_addition", "piece", "text_length", "depth", "syntax_rules", "sentence_state")
+
     def __init__(
             self,
             raw_token_index: int,
             base_action_index: int,
-            addition: str,
+            prev_addition: _AdditionTextAction | None,
+            piece: str,
             syntax_rules: _SyntaxRules,
             sentence_state: _SentenceState,
-            text_version: str,
     ):
         super().__init__(raw_token_index)
         self.base_action_index = base_action_index
-        self.addition = addition
+        self.prev_addition = prev_addition
+        self.piece = piece
+        self.text_length = (prev_addition.text_length if prev_addition else 0) + len(piece)
+        self.depth = prev_addition.depth + 1 if prev_addition else 0
         self.syntax_rules = syntax_rules
         self.sentence_state = sentence_state
-        self.text_version = text_version
+
+
+class _CheckpointTextAction(_AdditionTextAction):
+    """
+    Замороженный префикс текста после сжатия истории (см. TextBuilderSession._compact).
+
+    Всегда первое действие. Его базовое действие - оно само, поэтому "удалить" его не убирает.
+    Его сырой токен - пустая строка, поэтому многословные команды через него не ищутся.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, frozen_text: str, syntax_rules: _SyntaxRules, sentence_state: _SentenceState):
+        super().__init__(
+            raw_token_index=0,
+            base_action_index=0,
+            prev_addition=None,
+            piece=frozen_text,
+            syntax_rules=syntax_rules,
+            sentence_state=sentence_state,
+        )
 
 
 class _RemovalTextAction(_TextAction):
+    __slots__ = ("base_action_index",)
+
     def __init__(
             self,
             raw_token_index: int,
@@ -65,6 +111,8 @@ class _RemovalTextAction(_TextAction):
 
 
 class _SyntaxRules:
+    __slots__ = ("lean_left", "lean_right", "sentence_end", "is_word")
+
     def __init__(self, lean_left=False, lean_right=False, sentence_end=False, is_word=False):
         self.lean_left = lean_left
         self.lean_right = lean_right
@@ -81,23 +129,86 @@ _SYNTAX_WORD = _SyntaxRules(is_word=True)
 
 
 class _SmartToken:
+    __slots__ = ("text", "syntax_rules")
+
     def __init__(self, text_arg: str, syntax_rules: _SyntaxRules | None):
         self.text = text_arg
         self.syntax_rules = syntax_rules
 
 
-_word_combination_to_smart_token: dict[tuple[str, ...], _SmartToken] = {}
-
-_MAX_COMMAND_WORDS = 0
-
-
-def _add_smart_token(syntax_rules: _SyntaxRules | None, smart_token: str, *word_combinations: str):
-    global _MAX_COMMAND_WORDS
-    smart_token = _SmartToken(smart_token, syntax_rules)
-    for word_combination in word_combinations:
-        words = word_combination.split()
-        _MAX_COMMAND_WORDS = max(_MAX_COMMAND_WORDS, len(words))
-        _word_combination_to_smart_token[tuple(words)] = smart_token
+class _SmartTokenTrieNode:
+    __slots__ = ("children", "smart_token")
+
+    def __init__(self):
+        self.children: dict[str, _SmartTokenTrieNode] = {}
+        self.smart_token: _SmartToken | None = None
+
+
+class SmartTokenTable:
+    """
+    Многословные команды и замены ("точка с запятой" -> ";").
+
+    Фразы лежат в обратном дереве: от последнего слова фразы к первому.
+    Поиск идет от текущего токена назад по видимым словам, по одному шагу дерева на слово.
+    Для слова, которым не заканчивается ни одна фраза, это один поиск в словаре, сколько бы фраз ни было.
+    """
+
+    def __init__(self):
+        self.root = _SmartTokenTrieNode()
+        self._entries: list[tuple[_SyntaxRules | None, str, tuple[str, ...]]] = []
+        # Сколько слов в самой длинной фразе
+        self.max_phrase_len = 0
+
+    def add(self, syntax_rules: _SyntaxRules | None, smart_token: str, *word_combinations: str):
+        smart_token_object = _SmartToken(smart_token, syntax_rules)
+        for word_combination in word_combinations:
+            words = tuple(word_combination.lower().split())
+            if not words:
+                raise ValueError(f"Empty word combination for smart token {smart_token!r}")
+            self._entries.append((syntax_rules, smart_token, words))
+            self.max_phrase_len = max(self.max_phrase_len, len(words))
+            node = self.root
+            for word in reversed(words):
+                child = node.children.get(word)
+                if child is None:
+                    child = _SmartTokenTrieNode()
+                    node.children[word] = child
+                node = child
+            node.smart_token = smart_token_object
+
+    def copy(self) -> SmartTokenTable:
+        table = SmartTokenTable()
+        for syntax_rules, smart_token, words in self._entries:
+            table.add(syntax_rules, smart_token, " ".join(words))
+        return table
+
+    def load_file(self, path):
+        """
+        Загружает замены из текстового файла в UTF-8. Формат строки:
+
+            ЦЛК = цлк | цитадель ледяной короны
+
+        Слева - текст, который появится в сообщении, справа - фразы через "|".
+        Пустые строки и строки, начинающиеся с "#", пропускаются.
+        """
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                smart_token, sep, word_combinations = line.partition("=")
+                smart_token = smart_token.strip()
+                word_combinations = [w for w in (w.strip() for w in word_combinations.split("|")) if w]
+                if not sep or not smart_token or not word_combinations:
+                    raise ValueError(f"{path}:{line_number}: expected 'text = phrase | phrase', got {line!r}")
+                self.add(_SYNTAX_WORD, smart_token, *word_combinations)
+                count += 1
+        _logger.info("Loaded %s smart tokens from %s", count, path)
+
+
+default_smart_tokens = SmartTokenTable()
+_add_smart_token = default_smart_tokens.add
 
 
 _add_smart_token(_SYNTAX_LEAN_LEFT, ",", "запятая", "запятая запятая")
@@ -122,6 +233,16 @@ _add_smart_token(_SYNTAX_SENTENCE_END, "!", "восклицательный зн
 _add_smart_token(_SYNTAX_SENTENCE_END, "?", "вопросительный знак")
 
 
+class _PartialCacheEntry(NamedTuple):
+    # Действия после финальной части, их индексы видимости и номера действий по токенам
+    text_actions: list[_TextAction]
+    last_visible_addition_indexes: list[int]
+    token_text_action_indexes: list[int]
+    text: str
+    final_text: str
+    non_final_text: str
+
+
 def _get_first_diff_index(a: list[str], b: list[str]):
     for i, (x, y) in enumerate(zip(a, b)):
         if x != y:
@@ -130,259 +251,483 @@ def _get_first_diff_index(a: list[str], b: list[str]):
     return min(len(a), len(b)) if len(a) != len(b) else None
 
 
-def _get_last_visible_text_addition(max_index: int | None = None) -> tuple[int, _AdditionTextAction | None]:
-    j = len(_text_actions) - 1
-    if max_index is not None:
-        j = min(j, max_index)
-    while j >= 0:
-        action = _text_actions[j]
-        if isinstance(action, _AdditionTextAction):
-            return j, cast(_AdditionTextAction, action)
-        elif isinstance(action, _RemovalTextAction):
-            j = cast(_RemovalTextAction, action).base_action_index
-        else:
-            raise TypeError(f"Unexpected subclass {type(action).__name__}")
-    return j, None
-
-
-def common_prefix_len(a: str, b: str) -> int:
-    return sum(
-        1
-        for _ in takewhile(lambda p: p[0] == p[1], zip(a, b))
-    )
-
-
 def common_prefix(a: str, b: str) -> str:
     n = common_prefix_len(a, b)
     return a[:n]
 
 
-def build_text(new_raw_tokens: list[str], is_final: bool) -> str:
-    global text, final_text, non_final_text, _all_tokens, _final_token_index, _prev_partial_tokens
+class TextBuilderSession:
+    """
+    Состояние построения текста в рамках одного сеанса записи.
 
-    _logger.debug(
-        "_all_tokens=%s, _final_token_index=%s, _prev_partial_tokens=%s, new_raw_tokens=%s, is_final=%s",
-        _all_tokens, _final_token_index, _prev_partial_tokens, new_raw_tokens, is_final
-    )
+    Кроме списка действий, держит индекс видимости: для каждого действия k в нем лежит индекс
+    последнего видимого добавления среди действий 0..k (или -1, если видимых добавлений нет).
+    Поэтому вопрос "какое добавление видно на момент действия k" решается за O(1),
+    а не обходом цепочки удалений назад.
+    """
 
-    del _all_tokens[_final_token_index + 1:]
-    _all_tokens.extend(new_raw_tokens)
+    def __init__(
+            self,
+            normalize_numerals: bool = True,
+            smart_tokens: SmartTokenTable | None = None,
+            partial_cache_size: int = 16,
+            undo_window: int | None = 100,
+    ):
+        self.normalize_numerals = normalize_numerals
+        self.smart_tokens = smart_tokens if smart_tokens is not None else default_smart_tokens
+        # Сколько последних частичных гипотез помнить. 0 - не кэшировать.
+        self.partial_cache_size = partial_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Сколько последних видимых слов финального текста можно откатить "удалить".
+        # Все, что раньше, сжимается в замороженный префикс. None - не сжимать.
+        # Не меньше самой длинной фразы smart_tokens (см. _effective_undo_window).
+        self.undo_window = undo_window
+
+        self.text: str = ""
+        self.final_text: str = ""
+        self.non_final_text: str = ""
+
+        self._all_tokens: list[str] = []
+        self._final_token_index: int = -1
+        self._prev_partial_tokens: list[str] = []
+        self._text_actions: list[_TextAction] = []
+        self._token_index_to_text_action_index: dict[int, int] = {}
+        # Параллелен _text_actions: индекс последнего видимого добавления на момент действия
+        self._last_visible_addition_indexes: list[int] = []
+        self._numeral_normalizer = StreamingNumeralNormalizer()
+        # Цепочка добавлений (по глубине), для которой уже собран текст, и сам этот текст
+        self._materialized_chain: list[_AdditionTextAction] = []
+        self._materialized_text = ""
+        # Номер версии финальной части. Меняется на каждом финале и сбросе.
+        self._final_generation = 0
+        # Сколько действий относится к финальной части
+        self._final_text_action_count = 0
+        # (версия финальной части, токены частичной гипотезы) -> результат
+        self._partial_cache: OrderedDict[tuple[int, tuple[str, ...]], _PartialCacheEntry] = OrderedDict()
+
+    def reset(self):
+        _logger.debug("start, cache_hits=%s, cache_misses=%s", self.cache_hits, self.cache_misses)
+
+        self.text = ""
+        self.final_text = ""
+        self.non_final_text = ""
+        self._all_tokens.clear()
+        self._final_token_index = -1
+        self._prev_partial_tokens.clear()
+        self._text_actions.clear()
+        self._token_index_to_text_action_index.clear()
+        self._last_visible_addition_indexes.clear()
+        self._numeral_normalizer.reset()
+        self._materialized_chain.clear()
+        self._materialized_text = ""
+        self._final_generation += 1
+        self._final_text_action_count = 0
+        self._partial_cache.clear()
+
+    def _get_last_visible_text_addition(self, max_index: int | None = None) -> tuple[int, _AdditionTextAction | None]:
+        j = len(self._text_actions) - 1
+        if max_index is not None:
+            j = min(j, max_index)
+        if j < 0:
+            return -1, None
+        j = self._last_visible_addition_indexes[j]
+        if j < 0:
+            return -1, None
+        return j, cast(_AdditionTextAction, self._text_actions[j])
+
+    def _append_text_action(self, action: _TextAction):
+        if isinstance(action, _AdditionTextAction):
+            last_visible_addition_index = len(self._text_actions)
+        elif isinstance(action, _RemovalTextAction):
+            base_action_index = cast(_RemovalTextAction, action).base_action_index
+            if base_action_index >= 0:
+                last_visible_addition_index = self._last_visible_addition_indexes[base_action_index]
+            else:
+                last_visible_addition_index = -1
+        else:
+            raise TypeError(f"Unexpected subclass {type(action).__name__}")
 
-    _logger.debug("_all_tokens=%s", _all_tokens)
+        self._text_actions.append(action)
+        self._last_visible_addition_indexes.append(last_visible_addition_index)
+
+    def _discard_text_actions(self, first_discarded_action_index: int):
+        del self._text_actions[first_discarded_action_index:]
+        del self._last_visible_addition_indexes[first_discarded_action_index:]
+
+    def _restore_partial(self, new_raw_tokens: list[str], entry: _PartialCacheEntry):
+        del self._all_tokens[self._final_token_index + 1:]
+        self._all_tokens.extend(new_raw_tokens)
+
+        self._discard_text_actions(self._final_text_action_count)
+        self._text_actions.extend(entry.text_actions)
+        self._last_visible_addition_indexes.extend(entry.last_visible_addition_indexes)
+        first_token_index = self._final_token_index + 1
+        for j, text_action_index in enumerate(entry.token_text_action_indexes):
+            self._token_index_to_text_action_index[first_token_index + j] = text_action_index
+
+        self._prev_partial_tokens = new_raw_tokens
+        self.text = entry.text
+        self.final_text = entry.final_text
+        self.non_final_text = entry.non_final_text
+
+    def _store_partial(self, key: tuple[int, tuple[str, ...]]):
+        first_token_index = self._final_token_index + 1
+        self._partial_cache[key] = _PartialCacheEntry(
+            text_actions=self._text_actions[self._final_text_action_count:],
+            last_visible_addition_indexes=self._last_visible_addition_indexes[self._final_text_action_count:],
+            token_text_action_indexes=[
+                self._token_index_to_text_action_index[token_index]
+                for token_index in range(first_token_index, len(self._all_tokens))
+            ],
+            text=self.text,
+            final_text=self.final_text,
+            non_final_text=self.non_final_text,
+        )
+        if len(self._partial_cache) > self.partial_cache_size:
+            self._partial_cache.popitem(last=False)
+
+    def _effective_undo_window(self) -> int | None:
+        # Окно короче фразы из smart_tokens разрезало бы ее: "точка с" ушло бы в замороженный префикс,
+        # и "запятой" в следующей фразе уже не собралось бы в ";". Таблицу могут дополнить после создания
+        # сеанса (load_file), поэтому смотрим на нее при каждом сжатии.
+        if self.undo_window is None:
+            return None
+        return max(self.undo_window, self.smart_tokens.max_phrase_len)
+
+    def _compact(self):
+        """
+        Сжатие финальной истории.
+
+        Вызывается на финале, когда все действия финальные. Из действий остается только цепочка
+        видимых добавлений: последние _effective_undo_window() слов, а все, что раньше, сливается в один
+        _CheckpointTextAction с замороженным текстом. После этого:
+        - "удалить" откатывает не дальше замороженного префикса;
+        - окно не короче самой длинной фразы smart_tokens, так что фраза, начатая до финала, еще соберется;
+        - "очистить" по-прежнему очищает весь текст.
+        """
+        _, last_visible_addition = self._get_last_visible_text_addition()
+        full_text = self._materialize_text(last_visible_addition)
+
+        undo_window = self._effective_undo_window()
+        kept_additions = []
+        node = last_visible_addition
+        while node is not None and len(kept_additions) <= undo_window:
+            kept_additions.append(node)
+            node = node.prev_addition
+        kept_additions.reverse()
+
+        _logger.debug("Compacting %s actions to %s", len(self._text_actions), len(kept_additions))
+
+        new_all_tokens = []
+        new_text_actions = []
+        prev_addition = None
+        for addition in kept_additions:
+            j = len(new_text_actions)
+            if j == 0 and (addition.prev_addition is not None or isinstance(addition, _CheckpointTextAction)):
+                # Все, что до этого добавления включительно, замораживаем
+                new_addition = _CheckpointTextAction(
+                    frozen_text=full_text[:addition.text_length],
+                    syntax_rules=addition.syntax_rules,
+                    sentence_state=addition.sentence_state,
+                )
+                new_all_tokens.append("")
+            else:
+                new_addition = _AdditionTextAction(
+                    raw_token_index=j,
+                    base_action_index=j - 1,
+                    prev_addition=prev_addition,
+                    piece=addition.piece,
+                    syntax_rules=addition.syntax_rules,
+                    sentence_state=addition.sentence_state,
+                )
+                new_all_tokens.append(self._all_tokens[addition.raw_token_index])
+            new_text_actions.append(new_addition)
+            prev_addition = new_addition
+
+        self._all_tokens[:] = new_all_tokens
+        self._final_token_index = len(new_all_tokens) - 1
+        self._text_actions[:] = new_text_actions
+        self._last_visible_addition_indexes[:] = range(len(new_text_actions))
+        self._token_index_to_text_action_index.clear()
+        self._final_text_action_count = len(new_text_actions)
+
+        # Текст тот же, меняется только цепочка, из которой он собран
+        self._materialized_chain[:] = new_text_actions
+        self._materialized_text = full_text
+
+    def _materialize_text(self, addition: _AdditionTextAction | None) -> str:
+        """
+        Собирает текст версии из кусков.
+
+        Держим цепочку добавлений, текст которой уже собран. Для новой версии находим ее общего
+        предка с этой цепочкой и доклеиваем только куски после него.
+        """
+        if addition is None:
+            return ""
+
+        chain = self._materialized_chain
+        new_additions = []
+        node = addition
+        while node is not None and not (node.depth < len(chain) and chain[node.depth] is node):
+            new_additions.append(node)
+            node = node.prev_addition
+
+        if node is None:
+            chain.clear()
+            materialized_text = ""
+        else:
+            del chain[node.depth + 1:]
+            materialized_text = self._materialized_text[:node.text_length]
+
+        new_additions.reverse()
+        chain.extend(new_additions)
+        self._materialized_text = materialized_text + "".join(a.piece for a in new_additions)
+        return self._materialized_text
+
+    def build_text(self, new_raw_tokens: list[str], is_final: bool) -> str:
+        _logger.debug(
+            "_all_tokens=%s, _final_token_index=%s, _prev_partial_tokens=%s, new_raw_tokens=%s, is_final=%s",
+            self._all_tokens, self._final_token_index, self._prev_partial_tokens, new_raw_tokens, is_final
+        )
+
+        # SpeechKit часто прыгает между двумя-тремя гипотезами для одного и того же звука.
+        # Уже виденную гипотезу восстанавливаем из кэша, без пересборки действий.
+        partial_cache_key = None
+        if not is_final and self.partial_cache_size > 0:
+            partial_cache_key = (self._final_generation, tuple(new_raw_tokens))
+            entry = self._partial_cache.get(partial_cache_key)
+            if entry is not None:
+                self._partial_cache.move_to_end(partial_cache_key)
+                self.cache_hits += 1
+                _logger.debug("Partial cache hit")
+                self._restore_partial(new_raw_tokens, entry)
+                return self.text
+            self.cache_misses += 1
+
+        all_tokens = self._all_tokens
+        text_actions = self._text_actions
+
+        del all_tokens[self._final_token_index + 1:]
+        all_tokens.extend(new_raw_tokens)
+
+        _logger.debug("_all_tokens=%s", all_tokens)
+
+        first_diff_index = _get_first_diff_index(self._prev_partial_tokens, new_raw_tokens)
+
+        _logger.debug("first_diff_index=%s", first_diff_index)
+
+        if first_diff_index is None:
+            _logger.debug("Same partial tokens")
+            # Здесь захода в цикл обхода новых токенов не будет, как будто все новые токены уже обработали.
+            i = len(all_tokens)
+        else:
+            i = self._final_token_index + 1 + first_diff_index
 
-    first_diff_index = _get_first_diff_index(_prev_partial_tokens, new_raw_tokens)
+        _logger.debug("i=%s", i)
 
-    _logger.debug("first_diff_index=%s", first_diff_index)
+        # Отбрасывание действий тех токенов, которые не пришли в этот раз.
+        first_discarded_action_index = self._token_index_to_text_action_index.get(i)
+        _logger.debug("first_discarded_action_index=%s", first_discarded_action_index)
+        if first_discarded_action_index is not None:
+            self._discard_text_actions(first_discarded_action_index)
 
-    if first_diff_index is None:
-        _logger.debug("Same partial tokens")
-        # Здесь захода в цикл обхода новых токенов не будет, как будто все новые токены уже обработали.
-        i = len(_all_tokens)
-    else:
-        i = _final_token_index + 1 + first_diff_index
+        while i < len(all_tokens):
 
-    _logger.debug("i=%s", i)
+            # Достаем текущий сырой токен
+            token = all_tokens[i]
+            _logger.debug("i=%s, token=%s", i, token)
 
-    # Отбрасывание действий тех токенов, которые не пришли в этот раз.
-    first_discarded_action_index = _token_index_to_text_action_index.get(i)
-    _logger.debug("first_discarded_action_index=%s", first_discarded_action_index)
-    if first_discarded_action_index is not None:
-        del _text_actions[first_discarded_action_index:]
+            if token == "удалить":
+                # Какое сейчас последнее видимое добавление?
+                # Будем откатывать до базовой версии этого видимого добавления
+                last_visible_addition_index, last_visible_addition = self._get_last_visible_text_addition()
+                if last_visible_addition_index >= 0:
+                    base_action_index = last_visible_addition.base_action_index
+                else:
+                    base_action_index = -1
+
+                new_text_action = _RemovalTextAction(
+                    raw_token_index=i,
+                    base_action_index=base_action_index,
+                )
+            elif token == "очистить":
+                new_text_action = _RemovalTextAction(
+                    raw_token_index=i,
+                    base_action_index=-1,
+                )
+            else:
+                # Добавление к тексту
+
+                # Ищем многословные команды, заканчивающиеся текущим токеном.
+                # Идем по обратному дереву команд и одновременно назад по видимым добавлениям.
+                # Выбираем самую длинную найденную команду.
+                substitute = None
+                first_token_addition = None
+                node = self.smart_tokens.root.children.get(token)
+                if node is not None:
+                    substitute = node.smart_token
+                    text_action_index = len(text_actions) - 1
+                    while node.children:
+                        last_visible_addition_index, last_visible_addition = self._get_last_visible_text_addition(text_action_index)
+                        if not last_visible_addition:
+                            break
+                        node = node.children.get(all_tokens[last_visible_addition.raw_token_index])
+                        if node is None:
+                            break
+                        if node.smart_token:
+                            substitute = node.smart_token
+                            first_token_addition = last_visible_addition
+                        text_action_index = last_visible_addition_index - 1
 
-    while i < len(_all_tokens):
+                if substitute:
+                    if first_token_addition is None:
+                        # Значит, первый токен - это текущий токен, по которому действие еще не создано.
+                        # Это значит, что мы должны базироваться на последнем действии, какое есть.
+                        base_action_index = len(text_actions) - 1
+                    else:
+                        base_action_index = first_token_addition.base_action_index
+                    token = substitute.text
+                    syntax_rules = substitute.syntax_rules
+                else:
+                    base_action_index = len(text_actions) - 1
+                    syntax_rules = _SYNTAX_WORD
+
+                _, last_visible_addition = self._get_last_visible_text_addition(base_action_index)
+                last_addition_sentence_state = last_visible_addition.sentence_state if last_visible_addition else _INITIAL_SENTENCE_STATE
+
+                # Наследуем состояние как мы его оставим после себя
+                # от
+                # состояния как его оставило после себя предыдущее добавление к тексту
+                open_quote = last_addition_sentence_state.open_quote
+                new_sentence = last_addition_sentence_state.new_sentence
+
+                # Открывающие и закрывающие кавычки
+                if token == "\"":
+                    open_quote = not open_quote
+                    if open_quote:
+                        syntax_rules = _SYNTAX_LEAN_RIGHT
+                        _logger.debug("Данные кавычки - открывающие")
+                    else:
+                        syntax_rules = _SYNTAX_LEAN_LEFT
+                        _logger.debug("Данные кавычки - закрывающие")
+                _logger.debug("new_sentence=%s", new_sentence)
+
+                # Большие буквы в начале предложения
+                if syntax_rules.sentence_end:
+                    new_sentence = True
+                elif syntax_rules.is_word and new_sentence:
+                    # Не capitalize(), чтобы не портить замены вида "ЦЛК"
+                    token = token[:1].upper() + token[1:]
+                    new_sentence = False
+                _logger.debug("new_sentence=%s, token=%s", new_sentence, token)
+
+                # Расстановка пробелов
+                not_need_space = last_visible_addition is None or last_visible_addition.syntax_rules.lean_right or syntax_rules.lean_left
+                need_space = not not_need_space
+                space_or_empty = " " if need_space else ""
+
+                # Новая версия текста - это предыдущая видимая версия плюс кусок
+                new_text_action = _AdditionTextAction(
+                    raw_token_index=i,
+                    base_action_index=base_action_index,
+                    prev_addition=last_visible_addition,
+                    piece=space_or_empty + token,
+                    syntax_rules=syntax_rules,
+                    sentence_state=_get_sentence_state(open_quote, new_sentence),
+                )
+
+            self._append_text_action(new_text_action)
+
+            # Записываем связь от сырых токенов к версии
+            this_version_index = len(text_actions) - 1
+            self._token_index_to_text_action_index[new_text_action.raw_token_index] = this_version_index
+
+            _logger.debug("new_text_action=%s", new_text_action)
+
+            i += 1
+
+        if is_final:
+            self._final_token_index = len(all_tokens) - 1
+            self._prev_partial_tokens = []
+            self._final_text_action_count = len(text_actions)
+            self._final_generation += 1
+            self._partial_cache.clear()
+            undo_window = self._effective_undo_window()
+            if undo_window is not None and len(text_actions) > 2 * undo_window + 1:
+                self._compact()
+        else:
+            self._prev_partial_tokens = new_raw_tokens
+
+        _logger.debug("_final_token_index=%s", self._final_token_index)
+
+        last_visible_addition_index, last_visible_addition = self._get_last_visible_text_addition()
+        text_arg = self._materialize_text(last_visible_addition)
+        last_visible_token_index = last_visible_addition.raw_token_index if last_visible_addition else -1
+
+        _logger.debug(
+            "last_visible_addition_index=%s, last_visible_addition.raw_token_index=%s",
+            last_visible_addition_index, last_visible_token_index)
+
+        if self._final_token_index < 0:
+            final_text_arg = ""
+        elif self._final_token_index < last_visible_token_index:
+            _logger.debug("Будем искать финальное действие...")
+            # Не весь текст финальный. Нужно найти видимое действие, завершающее финальный текст.
+            # Идем по цепочке видимых добавлений, чтобы финальный текст был префиксом текста.
+            while True:
+                last_visible_addition = last_visible_addition.prev_addition
+                if not last_visible_addition:
+                    final_text_arg = ""
+                    break
+                last_visible_token_index = last_visible_addition.raw_token_index
+                if last_visible_token_index <= self._final_token_index:
+                    # Мы нашли видимое действие, которое финальное.
+                    final_text_arg = text_arg[:last_visible_addition.text_length]
+                    break
+        else:
+            final_text_arg = text_arg
+            _logger.debug("Не будем искать финальное действие")
 
-        # Достаем текущий сырой токен
-        token = _all_tokens[i]
-        _logger.debug("i=%s, token=%s", i, token)
+        if text_arg and self.normalize_numerals:
+            text_arg, final_text_arg = self._numeral_normalizer.normalize(text_arg, final_text_arg)
 
-        if token == "удалить":
-            # Какое сейчас последнее видимое добавление?
-            # Будем откатывать до базовой версии этого видимого добавления
-            last_visible_addition_index, last_visible_addition = _get_last_visible_text_addition()
-            if last_visible_addition_index >= 0:
-                base_action_index = last_visible_addition.base_action_index
-            else:
-                base_action_index = -1
-
-            new_text_action = _RemovalTextAction(
-                raw_token_index=i,
-                base_action_index=base_action_index,
-            )
-        elif token == "очистить":
-            new_text_action = _RemovalTextAction(
-                raw_token_index=i,
-                base_action_index=-1,
-            )
-        else:
-            # Добавление к тексту
+        self.text = text_arg
+        self.final_text = final_text_arg
+        self.non_final_text = text_arg[len(final_text_arg):]
 
-            # Идем назад, ищем видимые токены, чтоб по ним потом смотреть, нет ли таких многословных команд
-            visible_additions = [None]
-            command_candidate_words = [token]
-            text_action_index = len(_text_actions) - 1
-            while len(visible_additions) < _MAX_COMMAND_WORDS:
-                last_visible_addition_index, last_visible_addition = _get_last_visible_text_addition(text_action_index)
-                if last_visible_addition:
+        _logger.debug(">>>")
+        _logger.debug(">>>")
+        _logger.debug(self.text)
+        _logger.debug(self.final_text)
+        _logger.debug(self.non_final_text.strip())
+        _logger.debug(">>>")
+        _logger.debug(">>>")
 
-                    visible_additions.insert(0, last_visible_addition)
+        if partial_cache_key is not None:
+            self._store_partial(partial_cache_key)
 
-                    candidate_word_token_index = last_visible_addition.raw_token_index
-                    candidate_word_token = _all_tokens[candidate_word_token_index]
-                    command_candidate_words.insert(0, candidate_word_token)
+        return self.text
 
-                    text_action_index = last_visible_addition_index - 1
-                else:
-                    break
 
-            # Используем найденные токены для поиска команд разной длины.
-            # Начинаем от самых длинных команд.
-            substitute = None
-            while len(command_candidate_words) > 0:
-                substitute = _word_combination_to_smart_token.get(tuple(command_candidate_words))
-                if substitute:
-                    break
-                del visible_additions[0]
-                del command_candidate_words[0]
-
-            if substitute:
-                first_token_addition = visible_additions[0]
-                if first_token_addition is None:
-                    # Значит, первый токен - это текущий токен, по которому действие еще не создано.
-                    # Это значит, что мы должны базироваться на последнем действии, какое есть.
-                    base_action_index = len(_text_actions) - 1
-                else:
-                    base_action_index = first_token_addition.base_action_index
-                token = substitute.text
-                syntax_rules = substitute.syntax_rules
-            else:
-                base_action_index = len(_text_actions) - 1
-                syntax_rules = _SYNTAX_WORD
-
-            _, last_visible_addition = _get_last_visible_text_addition(base_action_index)
-            last_addition_sentence_state = last_visible_addition.sentence_state if last_visible_addition else _SentenceState(open_quote=False, new_sentence=True)
-
-            # Наследуем объект состояния как мы его оставим после себя
-            # от
-            # объекта состояния как его оставило после себя предыдущее добавление к тексту
-            this_addition_sentence_state = copy.copy(last_addition_sentence_state)
-
-            # Открывающие и закрывающие кавычки
-            if token == "\"":
-                this_addition_sentence_state.open_quote = not this_addition_sentence_state.open_quote
-                if this_addition_sentence_state.open_quote:
-                    syntax_rules = _SYNTAX_LEAN_RIGHT
-                    _logger.debug("Данные кавычки - открывающие")
-                else:
-                    syntax_rules = _SYNTAX_LEAN_LEFT
-                    _logger.debug("Данные кавычки - закрывающие")
-            _logger.debug("new_sentence=%s", this_addition_sentence_state.new_sentence)
-
-            # Большие буквы в начале предложения
-            if syntax_rules.sentence_end:
-                this_addition_sentence_state.new_sentence = True
-            elif syntax_rules.is_word and this_addition_sentence_state.new_sentence:
-                token = token.capitalize()
-                this_addition_sentence_state.new_sentence = False
-            _logger.debug("new_sentence=%s, token=%s", this_addition_sentence_state.new_sentence, token)
-
-            # Расстановка пробелов
-            not_need_space = last_visible_addition is None or last_visible_addition.syntax_rules.lean_right or syntax_rules.lean_left
-            need_space = not not_need_space
-            space_or_empty = " " if need_space else ""
-
-            # Новая версия текста
-            prev_text = last_visible_addition.text_version if last_visible_addition else ""
-            new_text = prev_text + space_or_empty + token
-            new_text_action = _AdditionTextAction(
-                raw_token_index=i,
-                base_action_index=base_action_index,
-                addition=token,
-                syntax_rules=syntax_rules,
-                sentence_state=this_addition_sentence_state,
-                text_version=new_text,
-            )
-
-        _text_actions.append(new_text_action)
-
-        # Записываем связь от сырых токенов к версии
-        this_version_index = len(_text_actions) - 1
-        _token_index_to_text_action_index[new_text_action.raw_token_index] = this_version_index
-
-        _logger.debug("new_text_action=%s", new_text_action)
-
-        i += 1
-
-    if is_final:
-        _final_token_index = len(_all_tokens) - 1
-        _prev_partial_tokens.clear()
-    else:
-        _prev_partial_tokens = new_raw_tokens
-
-    _logger.debug("_final_token_index=%s", _final_token_index)
-
-    last_visible_addition_index, last_visible_addition = _get_last_visible_text_addition()
-    text = last_visible_addition.text_version if last_visible_addition else ""
-    last_visible_token_index = last_visible_addition.raw_token_index if last_visible_addition else -1
-
-    _logger.debug(
-        "last_visible_addition_index=%s, last_visible_addition.raw_token_index=%s",
-        last_visible_addition_index, last_visible_token_index)
-
-    if _final_token_index < 0:
-        final_text = ""
-    elif _final_token_index < last_visible_token_index:
-        _logger.debug("Будем искать финальное действие...")
-        # Не весь текст финальный. Нужно найти видимое действие, завершающее финальный текст
-        while True:
-            k = last_visible_addition_index - 1
-            last_visible_addition_index, last_visible_addition = _get_last_visible_text_addition(k)
-            if not last_visible_addition:
-                final_text = ""
-                break
-            last_visible_token_index = last_visible_addition.raw_token_index
-            if last_visible_token_index <= _final_token_index:
-                # Мы нашли видимое действие, которое финальное.
-                final_text = last_visible_addition.text_version
-                break
-    else:
-        final_text = text
-        _logger.debug("Не будем искать финальное действие")
-
-    if text:
-        normalized_text = _rus_2_num(text)
-        text = normalized_text
-        if final_text:
-            first_number_index = common_prefix_len(normalized_text, text)
-            if first_number_index > len(final_text):
-                # final_text оставляем как есть, там нет цифр
-                pass
-            else:
-                # В final_text уже должны быть какие-то цифры
-                normalized_final_text = _rus_2_num(final_text)
-                final_text = common_prefix(normalized_final_text, normalized_text)
-    non_final_text = text[len(final_text):]
-
-    _logger.debug(">>>")
-    _logger.debug(">>>")
-    _logger.debug(text)
-    _logger.debug(final_text)
-    _logger.debug(non_final_text.strip())
-    _logger.debug(">>>")
-    _logger.debug(">>>")
+# Сеанс, с которым работает модульный API ниже
+_session = TextBuilderSession()
 
+
+def _publish_session_texts():
+    global text, final_text, non_final_text
+    text = _session.text
+    final_text = _session.final_text
+    non_final_text = _session.non_final_text
+
+
+def build_text(new_raw_tokens: list[str], is_final: bool) -> str:
+    with app.tracing.span("build_text"):
+        _session.build_text(new_raw_tokens, is_final)
+    _publish_session_texts()
     return text
 
 
 def reset():
-    global text, final_text, non_final_text, _final_token_index
-
-    _logger.debug("start")
-
-    text = ""
-    final_text = ""
-    non_final_text = ""
-    _all_tokens.clear()
-    _final_token_index = -1
-    _prev_partial_tokens.clear()
-    _text_actions.clear()
-    _token_index_to_text_action_index.clear()
+    _session.reset()
+    _publish_session_texts()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Куда писать трассу в формате Chrome trace-event (открывается в chrome://tracing или https://ui.perfetto.dev).
+# Если переменная не задана, трассировка выключена и ничего не стоит.
+TRACE_FILE_ENV = "WOW_STT_TRACE_FILE"
+
+enabled = False
+trace_file: str | None = None
+
+# (name, phase, ts_ns, dur_ns, thread_id, utterance, args)
+_events: list[tuple[str, str, int, int, int, int, dict | None]] = []
+_utterance = 0
+
+
+def configure(trace_file_arg: str | None):
+    global enabled, trace_file
+    trace_file = trace_file_arg
+    enabled = trace_file_arg is not None
+    _events.clear()
+
+
+def now() -> int:
+    return time.perf_counter_ns()
+
+
+def instant(name: str, **args):
+    """Отметка момента: пришел кусок аудио, пришел ответ сервера и т.п."""
+    if not enabled:
+        return
+    _events.append((name, "i", time.perf_counter_ns(), 0, threading.get_ident(), _utterance, args or None))
+
+
+def complete(name: str, started_ns: int, **args):
+    """Отрезок от started_ns (см. now()) до текущего момента."""
+    if not enabled:
+        return
+    ended_ns = time.perf_counter_ns()
+    _events.append((name, "X", started_ns, ended_ns - started_ns, threading.get_ident(), _utterance, args or None))
+
+
+class _Span:
+    __slots__ = ("name", "started_ns")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_ns = 0
+
+    def __enter__(self):
+        self.started_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        complete(self.name, self.started_ns)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """with tracing.span("build_text"): ..."""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def next_utterance():
+    """Начало новой фразы: события дальше относятся к ней (новый сеанс записи или финал от сервера)."""
+    global _utterance
+    if not enabled:
+        return
+    _utterance += 1
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    # Ближайший ранг
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def stage_durations_ms() -> dict[str, list[float]]:
+    """
+    Длительности по стадиям, мс.
+
+    Кроме отрезков (handle_recognized_fragment, build_text, overlay.refresh, ...) считает сквозные стадии по фразам:
+    - audio_to_first_response: от первого куска аудио фразы до первого ответа сервера;
+    - response_to_overlay: от ответа сервера до конца следующего за ним overlay.refresh.
+    """
+    durations: dict[str, list[float]] = defaultdict(list)
+
+    first_audio_ns: dict[int, int] = {}
+    first_response_seen: set[int] = set()
+    pending_response_ns: int | None = None
+
+    for name, phase, ts_ns, dur_ns, _, utterance, _ in sorted(_events, key=lambda e: e[2] + e[3]):
+        if phase == "X":
+            durations[name].append(dur_ns / 1e6)
+        if name == "audio_chunk":
+            first_audio_ns.setdefault(utterance, ts_ns)
+        elif name == "response":
+            if utterance not in first_response_seen and utterance in first_audio_ns:
+                first_response_seen.add(utterance)
+                durations["audio_to_first_response"].append((ts_ns - first_audio_ns[utterance]) / 1e6)
+            pending_response_ns = ts_ns
+        elif name == "overlay.refresh" and pending_response_ns is not None:
+            durations["response_to_overlay"].append((ts_ns + dur_ns - pending_response_ns) / 1e6)
+            pending_response_ns = None
+
+    return durations
+
+
+def summary() -> dict[str, tuple[int, float, float, float]]:
+    """Стадия -> (количество, p50, p95, p99), мс."""
+    result = {}
+    for name, values in sorted(stage_durations_ms().items()):
+        values.sort()
+        result[name] = (len(values), percentile(values, 50), percentile(values, 95), percentile(values, 99))
+    return result
+
+
+def write_chrome_trace(path: str):
+    pid = os.getpid()
+    trace_events = []
+    for name, phase, ts_ns, dur_ns, thread_id, utterance, args in _events:
+        event = {
+            "name": name,
+            "ph": phase,
+            "ts": ts_ns / 1000,
+            "pid": pid,
+            "tid": thread_id,
+            "args": {"utterance": utterance, **(args or {})},
+        }
+        if phase == "X":
+            event["dur"] = dur_ns / 1000
+        else:
+            event["s"] = "t"
+        trace_events.append(event)
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+def shutdown():
+    if not enabled:
+        return
+
+    write_chrome_trace(trace_file)
+    logger.info("Трасса записана в %s (%s событий)", trace_file, len(_events))
+
+    for name, (count, p50, p95, p99) in summary().items():
+        logger.info("%-28s n=%-6s p50=%8.2f ms  p95=%8.2f ms  p99=%8.2f ms", name, count, p50, p95, p99)
+
+
+configure(os.environ.get(TRACE_FILE_ENV))
@@ -0,0 +1,159 @@
+from __future__ import annotations
+from collections import deque
+
+import numpy as np
+
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2  # 16 бит, моно
+
+
+class VoiceActivityDetector:
+    """
+    Детектор речи по энергии и частоте пересечений нуля (ZCR), по кадрам в 20 мс, векторно на numpy.
+
+    Кадр - речь, если его громкость выше уровня шума на margin_db (и не ниже min_dbfs).
+    Тихие шипящие ("с", "ш") почти без энергии, зато с высоким ZCR - им хватает на fricative_relief_db меньше.
+    Уровень шума подстраивается сам: быстро вниз, медленно вверх.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 20,
+        margin_db: float = 12.0,
+        min_dbfs: float = -50.0,
+        fricative_zcr: float = 0.3,
+        fricative_relief_db: float = 6.0,
+        noise_rise: float = 0.05,
+    ):
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.fricative_zcr = fricative_zcr
+        self.fricative_relief_db = fricative_relief_db
+        self.noise_rise = noise_rise
+        self.noise_floor_dbfs = -60.0
+
+    def frame_levels(self, pcm) -> tuple[np.ndarray, np.ndarray]:
+        """(громкость кадров в dBFS, ZCR кадров) для 16-битного PCM. Неполный последний кадр не считается."""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        frames_count = len(samples) // self.frame_samples
+        frames = samples[:frames_count * self.frame_samples].reshape(frames_count, self.frame_samples)
+
+        frames_float = frames.astype(np.float32) / 32768.0
+        energy = np.mean(frames_float * frames_float, axis=1)
+        dbfs = 10.0 * np.log10(energy + 1e-12)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_samples - 1)
+        return dbfs, zcr
+
+    def speech_frames(self, pcm) -> np.ndarray:
+        dbfs, zcr = self.frame_levels(pcm)
+        if len(dbfs) == 0:
+            return np.zeros(0, dtype=bool)
+
+        threshold = max(self.min_dbfs, self.noise_floor_dbfs + self.margin_db)
+        speech = (dbfs > threshold) | ((dbfs > threshold - self.fricative_relief_db) & (zcr > self.fricative_zcr))
+
+        quietest = float(dbfs.min())
+        if quietest < self.noise_floor_dbfs:
+            self.noise_floor_dbfs = quietest
+        else:
+            self.noise_floor_dbfs += (quietest - self.noise_floor_dbfs) * self.noise_rise
+        return speech
+
+    def is_speech(self, pcm) -> bool:
+        return bool(self.speech_frames(pcm).any())
+
+
+class VadGate:
+    """
+    Пропускает только куски аудио с речью, с запасом вокруг.
+
+    hangover_ms - сколько еще пропускать после последней речи (паузы между словами, затухание).
+    lookback_ms - сколько тишины перед речью отдать вместе с первым куском речи (начало слова тихое).
+    process() возвращает куски, которые надо отправить: пусто - кусок тишины пока придержан (в lookback).
+    Отброшенным кусок становится, только когда выпадает из lookback - сколько байт так выпало,
+    отдает take_dropped_bytes(). Отправленное плюс отброшенное (после flush()) = захваченное: ни один байт
+    не учитывается дважды, поэтому по отброшенному можно слать SilenceChunk, не сдвигая время на сервере.
+    """
+
+    def __init__(
+        self,
+        detector: VoiceActivityDetector | None = None,
+        hangover_ms: int = 500,
+        lookback_ms: int = 300,
+        bytes_per_second: int = BYTES_PER_SECOND,
+    ):
+        self.detector = detector or VoiceActivityDetector()
+        self.bytes_per_second = bytes_per_second
+        self.hangover_bytes = hangover_ms * bytes_per_second // 1000
+        self.lookback_bytes = lookback_ms * bytes_per_second // 1000
+        self._lookback: deque[bytes] = deque()
+        self._lookback_size = 0
+        self._since_speech_bytes: int | None = None
+        self._dropped_bytes = 0
+        self.captured_bytes = 0
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+
+    @property
+    def captured_seconds(self) -> float:
+        return self.captured_bytes / self.bytes_per_second
+
+    @property
+    def sent_seconds(self) -> float:
+        return self.sent_bytes / self.bytes_per_second
+
+    def process(self, chunk) -> list[bytes]:
+        chunk = bytes(chunk)
+        self.captured_bytes += len(chunk)
+
+        if self.detector.is_speech(chunk):
+            self._since_speech_bytes = 0
+            result = list(self._lookback)
+            result.append(chunk)
+            self._lookback.clear()
+            self._lookback_size = 0
+        elif self._since_speech_bytes is not None and self._since_speech_bytes < self.hangover_bytes:
+            self._since_speech_bytes += len(chunk)
+            result = [chunk]
+        else:
+            self._since_speech_bytes = None
+            self._lookback.append(chunk)
+            self._lookback_size += len(chunk)
+            while self._lookback and self._lookback_size - len(self._lookback[0]) >= self.lookback_bytes:
+                dropped = len(self._lookback.popleft())
+                self._lookback_size -= dropped
+                self._dropped_bytes += dropped
+            result = []
+
+        self.sent_bytes += sum(len(c) for c in result)
+        return result
+
+    def take_dropped_bytes(self) -> int:
+        """Сколько байт тишины отброшено навсегда с прошлого вызова."""
+        dropped, self._dropped_bytes = self._dropped_bytes, 0
+        self.dropped_bytes += dropped
+        return dropped
+
+    def flush(self) -> int:
+        """Конец потока: придержанная тишина уже не уйдет - она тоже отброшена. Возвращает take_dropped_bytes()."""
+        self._dropped_bytes += self._lookback_size
+        self._lookback.clear()
+        self._lookback_size = 0
+        return self.take_dropped_bytes()
+
+    def log_summary(self):
+        if not self.captured_bytes:
+            return
+        logger.info(
+            "VAD: sent %.1f s of %.1f s captured (%.0f%%)",
+            self.sent_seconds, self.captured_seconds, 100 * self.sent_bytes / self.captured_bytes
+        )
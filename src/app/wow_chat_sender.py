@@ -1,12 +1,11 @@
 from __future__ import annotations
+import os
 import time
 
-import pyautogui
-
 from app.keyboard.layout_switch import switch_to_russian
 from app.keyboard.keyboard_state import keyboard_is_clean, wait_for_keyboard_clean
 import app.commands
-import app.keyboard.keyboard_sender
+import app.keyboard.input_injection
 import app.keyboard.clipboard_copier
 import app.overlay
 
@@ -16,8 +15,12 @@ from app.app_logging import logging
 logger = logging.getLogger(__name__)
 
 
-# Задержки между нажатиями, чтобы игра точно всё проглотила
-KEY_DELAY = 0.05  # секунды
+# Пауза между шагами (Enter, Ctrl+V, Enter), мс: игре нужно время открыть чат до вставки.
+# Прежние 50 мс перед каждым шагом и после него сокращены до одной короткой паузы между шагами.
+# Без пауз (0) вся последовательность уходит одним SendInput - в игре это не проверено.
+KEY_STEP_MS = int(os.environ.get("WOW_STT_KEY_STEP_MS", "20"))
+
+injector = app.keyboard.input_injection.InputInjector(app.keyboard.input_injection.SendInputBackend())
 
 
 def send_to_wow_chat(channel: str, text: str, let_edit: bool = False):
@@ -38,28 +41,19 @@ def send_to_wow_chat(channel: str, text: str, let_edit: bool = False):
 
     app.keyboard.clipboard_copier.clipboard_copy(full_msg)
 
-    # Небольшая пауза, чтобы не перебивать предыдущее действие
-    time.sleep(KEY_DELAY)
-
     if not keyboard_is_clean():
         app.overlay.set_bottom_text("Отпускай!")
 
+    wait_started = time.perf_counter()
     still_clean = wait_for_keyboard_clean()
+    logger.debug("Keyboard wait %.1f ms, clean=%s", (time.perf_counter() - wait_started) * 1000, still_clean)
 
     app.overlay.clear_bottom_text()
 
     if not still_clean:
         return
 
-    # Открываем чат
-    pyautogui.press("enter")
-    time.sleep(KEY_DELAY)
-
-    # Вставляем текст через буфер
-    app.keyboard.keyboard_sender.press_ctrl_v()
-    time.sleep(KEY_DELAY)
-
-    # Отправляем
-    if not let_edit:
-        pyautogui.press("enter")
-        time.sleep(KEY_DELAY)
+    # Открываем чат, вставляем текст через буфер и отправляем - одной пачкой
+    started = time.perf_counter()
+    injector.play(app.keyboard.input_injection.chat_send_sequence(let_edit, KEY_STEP_MS))
+    logger.debug("Keys sent in %.1f ms", (time.perf_counter() - started) * 1000)
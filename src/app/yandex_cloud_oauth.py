@@ -10,9 +10,13 @@ import webbrowser
 import secrets
 import base64
 import hashlib
+import os
+from pathlib import Path
 from typing import Any, Dict
 import requests
 
+from app.credential_cache import Credentials, credentials_path, parse_expires_at
+import app.credential_cache
 from app.app_logging import logging, TRACE
 
 
@@ -26,8 +30,17 @@ CLIENT_ID = "50988b5588004fc1bdc757217b681a9b"
 SCOPE = "cloud:auth"
 
 AUTH_URL = "https://oauth.yandex.ru/authorize"
-TOKEN_URL = "https://oauth.yandex.com/token"
-IAM_URL = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
+
+# Для проверок с локальной заменой сервисов токенов:
+#   set WOW_STT_OAUTH_TOKEN_URL=http://localhost:8080/token
+#   set WOW_STT_IAM_URL=http://localhost:8080/iam/v1/tokens
+TOKEN_URL_ENV = "WOW_STT_OAUTH_TOKEN_URL"
+IAM_URL_ENV = "WOW_STT_IAM_URL"
+TOKEN_URL = os.environ.get(TOKEN_URL_ENV, "https://oauth.yandex.com/token")
+IAM_URL = os.environ.get(IAM_URL_ENV, "https://iam.api.cloud.yandex.net/iam/v1/tokens")
+
+# IAM-токен из файла берем, только если ему жить еще хотя бы столько
+MIN_IAM_LIFETIME_S = 600.0
 
 
 class OAuth:
@@ -217,6 +230,28 @@ def get_oauth_and_iam_tokens(timeout: float = 300.0) -> Dict[str, Any]:
         "code_verifier": oauth.code_verifier,
         # device_id / device_name можно добавить при желании
     }
+    tj = _post_token(token_data)
+    oauth_access_token = tj["access_token"]
+    oauth_refresh_token = tj.get("refresh_token")
+    oauth_expires_in = tj.get("expires_in")
+
+    logger.info("OAuth-токен получен.")
+
+    logger.info("Обмениваю OAuth-токен на IAM-токен...")
+    iam_token, iam_expires_at = exchange_oauth_for_iam(oauth_access_token)
+
+    logger.info("IAM-токен получен.")
+
+    return {
+        "oauth_access_token": oauth_access_token,
+        "oauth_refresh_token": oauth_refresh_token,
+        "oauth_expires_in": oauth_expires_in,
+        "iam_token": iam_token,
+        "iam_expires_at": iam_expires_at,
+    }
+
+
+def _post_token(token_data: dict[str, str]) -> dict[str, Any]:
     resp = requests.post(
         TOKEN_URL,
         data=token_data,
@@ -224,7 +259,6 @@ def get_oauth_and_iam_tokens(timeout: float = 300.0) -> Dict[str, Any]:
         timeout=10,
     )
     resp.raise_for_status()
-    tj = resp.json()
     # По доке:
     # {
     #   "token_type": "bearer",
@@ -233,13 +267,10 @@ def get_oauth_and_iam_tokens(timeout: float = 300.0) -> Dict[str, Any]:
     #   "refresh_token": "...",
     #   "scope": "..."
     # }
-    oauth_access_token = tj["access_token"]
-    oauth_refresh_token = tj.get("refresh_token")
-    oauth_expires_in = tj.get("expires_in")
+    return resp.json()
 
-    logger.info("OAuth-токен получен.")
 
-    logger.info("Обмениваю OAuth-токен на IAM-токен...")
+def exchange_oauth_for_iam(oauth_access_token: str) -> tuple[str, str | None]:
     iam_resp = requests.post(
         IAM_URL,
         json={"yandexPassportOauthToken": oauth_access_token},
@@ -249,15 +280,91 @@ def get_oauth_and_iam_tokens(timeout: float = 300.0) -> Dict[str, Any]:
     ij = iam_resp.json()
     # По доке:
     # { "iamToken": "...", "expiresAt": "..." }
-    iam_token = ij["iamToken"]
-    iam_expires_at = ij.get("expiresAt")
+    return ij["iamToken"], ij.get("expiresAt")
 
-    logger.info("IAM-токен получен.")
 
-    return {
-        "oauth_access_token": oauth_access_token,
-        "oauth_refresh_token": oauth_refresh_token,
-        "oauth_expires_in": oauth_expires_in,
-        "iam_token": iam_token,
-        "iam_expires_at": iam_expires_at,
-    }
+def refresh_oauth_token(refresh_token: str) -> dict[str, Any]:
+    """Новый OAuth-токен по refresh token, без браузера."""
+    return _post_token({
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+        "client_id": CLIENT_ID,
+    })
+
+
+def _credentials(
+        oauth_access_token: str,
+        oauth_refresh_token: str | None,
+        oauth_expires_in: float | None,
+        iam_token: str,
+        iam_expires_at: str | None,
+        now: float,
+) -> Credentials:
+    return Credentials(
+        oauth_access_token=oauth_access_token,
+        oauth_refresh_token=oauth_refresh_token,
+        oauth_expires_at=None if oauth_expires_in is None else now + oauth_expires_in,
+        iam_token=iam_token,
+        # Срока нет - считаем по доке: IAM-токен живет не больше 12 часов
+        iam_expires_at=parse_expires_at(iam_expires_at) if iam_expires_at else now + 12 * 3600,
+    )
+
+
+def refresh_iam(credentials: Credentials) -> Credentials:
+    """
+    Новый IAM-токен. OAuth-токен, если он истек (или вот-вот истечет), сначала обновляется по refresh token.
+    """
+    now = time.time()
+    if credentials.oauth_valid(MIN_IAM_LIFETIME_S, now):
+        oauth_access_token = credentials.oauth_access_token
+        oauth_refresh_token = credentials.oauth_refresh_token
+        oauth_expires_in = None if credentials.oauth_expires_at is None else credentials.oauth_expires_at - now
+    else:
+        if not credentials.oauth_refresh_token:
+            raise RuntimeError("OAuth-токен истек, а refresh token нет")
+        logger.info("Обновляю OAuth-токен по refresh token...")
+        tj = refresh_oauth_token(credentials.oauth_refresh_token)
+        oauth_access_token = tj["access_token"]
+        oauth_refresh_token = tj.get("refresh_token") or credentials.oauth_refresh_token
+        oauth_expires_in = tj.get("expires_in")
+
+    iam_token, iam_expires_at = exchange_oauth_for_iam(oauth_access_token)
+    return _credentials(oauth_access_token, oauth_refresh_token, oauth_expires_in, iam_token, iam_expires_at, now)
+
+
+def get_credentials(path: Path | None = None, timeout: float = 300.0) -> Credentials:
+    """
+    Токены для старта: из файла, если IAM-токен там еще жив; иначе новый IAM-токен по сохраненным OAuth-токенам;
+    и только если не вышло и это - вход через браузер. Полученное сохраняется в файл.
+    """
+    path = path or credentials_path()
+    cached = app.credential_cache.load(path)
+
+    if cached is not None and cached.iam_valid(MIN_IAM_LIFETIME_S):
+        logger.info("IAM-токен из %s, действует еще %.0f мин.", path, (cached.iam_expires_at - time.time()) / 60)
+        return cached
+
+    credentials = None
+    if cached is not None:
+        try:
+            credentials = refresh_iam(cached)
+            logger.info("IAM-токен получен по сохраненным OAuth-токенам.")
+        except (requests.RequestException, RuntimeError, KeyError, ValueError) as e:
+            logger.warning("Сохраненные токены не подошли (%r), вход через браузер", e)
+
+    if credentials is None:
+        tokens = get_oauth_and_iam_tokens(timeout)
+        credentials = _credentials(
+            tokens["oauth_access_token"],
+            tokens["oauth_refresh_token"],
+            tokens["oauth_expires_in"],
+            tokens["iam_token"],
+            tokens["iam_expires_at"],
+            time.time(),
+        )
+
+    try:
+        app.credential_cache.save(path, credentials)
+    except OSError as e:
+        logger.warning("Не удалось сохранить токены в %s: %r", path, e)
+    return credentials
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import abc
+import asyncio
+import os
 import threading
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
 from typing import Protocol
-import pyaudio
 import grpc
+import grpc.aio
 
 import yandex.cloud.ai.stt.v3.stt_pb2 as stt_pb2
 import yandex.cloud.ai.stt.v3.stt_service_pb2_grpc as stt_service_pb2_grpc
@@ -12,33 +16,92 @@ import yandex.cloud.resourcemanager.v1.cloud_service_pb2_grpc as cloud_service_p
 import yandex.cloud.resourcemanager.v1.folder_service_pb2 as folder_service_pb2
 import yandex.cloud.resourcemanager.v1.folder_service_pb2_grpc as folder_service_pb2_grpc
 
+import app.tracing
+import app.async_runtime
+import app.audio_capture
+import app.ring_buffer
+import app.vad
+import app.ogg_opus
+import app.session_recorder
 from app.app_logging import logging, TRACE
 
 
 logger = logging.getLogger(__name__)
 
 # Настройки потокового распознавания.
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
-FRAMES_PER_SECOND = 16000
-FRAMES_PER_BUFFER = 4096
+FRAMES_PER_SECOND = app.audio_capture.SAMPLE_RATE
+# Сколько аудио в одном AudioChunk
+CHUNK_BYTES = app.audio_capture.BLOCK_BYTES
+# Насколько назад от текущего момента можно начать поток (пре-ролл с конца слова-триггера)
+PRE_ROLL_MS = 2000
+
+# Отсев тишины перед отправкой (app.vad):
+#   off     - слать все;
+#   drop    - тишину не слать вовсе;
+#   silence - вместо тишины слать SilenceChunk с ее длительностью (сервер видит паузы, а аудио не идет).
+#     В ogg_opus вместо SilenceChunk кодируется цифровая тишина: иначе в позициях OGG будет дыра.
+# По умолчанию off: детектор еще не проверен на живой диктовке.
+VAD_MODE_ENV = "WOW_STT_VAD"
+VAD_MODES = ("off", "drop", "silence")
+vad_mode = os.environ.get(VAD_MODE_ENV, "off")
+
+# Как кодировать аудио для отправки:
+#   pcm      - LINEAR16_PCM, 256 кбит/с;
+#   ogg_opus - ContainerAudio.OGG_OPUS с битрейтом WOW_STT_OPUS_BITRATE (нужен opuslib, см. app.ogg_opus).
+AUDIO_ENCODING_ENV = "WOW_STT_AUDIO_ENCODING"
+AUDIO_ENCODINGS = ("pcm", "ogg_opus")
+audio_encoding = os.environ.get(AUDIO_ENCODING_ENV, "pcm")
+OPUS_BITRATE_ENV = "WOW_STT_OPUS_BITRATE"
+opus_bitrate = int(os.environ.get(OPUS_BITRATE_ENV, "24000"))
+
+# Адреса API. Для замеров без сети можно направить на локальный сервер (app.yandex_speech_kit_local_server):
+#   set WOW_STT_SPEECHKIT_ENDPOINT=localhost:50051
+#   set WOW_STT_RESOURCE_MANAGER_ENDPOINT=localhost:50051
+SPEECHKIT_ENDPOINT_ENV = "WOW_STT_SPEECHKIT_ENDPOINT"
+RESOURCE_MANAGER_ENDPOINT_ENV = "WOW_STT_RESOURCE_MANAGER_ENDPOINT"
+speechkit_endpoint = os.environ.get(SPEECHKIT_ENDPOINT_ENV, "stt.api.cloud.yandex.net:443")
+resource_manager_endpoint = os.environ.get(RESOURCE_MANAGER_ENDPOINT_ENV, "resource-manager.api.cloud.yandex.net:443")
+
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "[::1]"}
+
+# Сколько при запуске ждать подключения канала к SpeechKit
+CHANNEL_READY_TIMEOUT_S = 5.0
 
-audio: pyaudio.PyAudio | None = None
-cred: grpc.ChannelCredentials | None = None
 channel: grpc.Channel | None = None
 recognizer: stt_service_pb2_grpc.RecognizerStub | None = None
+# То же для WOW_STT_RUNTIME=asyncio (app.async_runtime). Создается в потоке цикла, при первом сеансе.
+aio_channel: grpc.aio.Channel | None = None
+aio_recognizer: stt_service_pb2_grpc.RecognizerStub | None = None
 secret: str | None = None
 folder_id: str | None = None
 
 
-def yandex_speech_kit_init(secret_arg: str):
-    global cred, channel, recognizer, audio, secret, folder_id
+def open_channel(endpoint: str) -> grpc.Channel:
+    # К локальному серверу ходим без TLS, к остальным - с дефолтными кредами
+    host = endpoint.rsplit(":", 1)[0]
+    if host in _LOCAL_HOSTS:
+        return grpc.insecure_channel(endpoint)
+    return grpc.secure_channel(endpoint, grpc.ssl_channel_credentials())
 
-    # Создаем дефолтный объект кредов для соединения.
-    cred = grpc.ssl_channel_credentials()
 
-    # С этими кредами создаем соединение с TLS эндпойнтом нужного нам gRPC API
-    channel = grpc.secure_channel('stt.api.cloud.yandex.net:443', cred)
+def open_aio_channel(endpoint: str) -> grpc.aio.Channel:
+    host = endpoint.rsplit(":", 1)[0]
+    if host in _LOCAL_HOSTS:
+        return grpc.aio.insecure_channel(endpoint)
+    return grpc.aio.secure_channel(endpoint, grpc.ssl_channel_credentials())
+
+
+def open_recognizer(ready_timeout_s: float = CHANNEL_READY_TIMEOUT_S):
+    """Канал к SpeechKit и заглушка распознавателя. Ждем, пока канал подключится (TCP + TLS), - тогда первый сеанс
+    не платит за соединение. Не подключился за ready_timeout_s - не беда, подключится при первом сеансе."""
+    global channel, recognizer
+
+    if recognizer is not None:
+        return
+
+    # Создаем соединение с эндпойнтом нужного нам gRPC API
+    channel = open_channel(speechkit_endpoint)
 
     # В рамках установленного соединения
     # получаем
@@ -46,72 +109,248 @@ def yandex_speech_kit_init(secret_arg: str):
     # Это у нас интерфейс какого-то распознавателя.
     recognizer = stt_service_pb2_grpc.RecognizerStub(channel)
 
-    audio = pyaudio.PyAudio()
+    try:
+        grpc.channel_ready_future(channel).result(timeout=ready_timeout_s)
+    except grpc.FutureTimeoutError:
+        logger.warning("SpeechKit channel is not ready after %.0f s", ready_timeout_s)
+
+
+def find_folder_id(iam_token: str) -> str:
+    return list_folders(iam_token)[0].id
+
+
+def yandex_speech_kit_init(secret_arg: str, folder_id_arg: str | None = None):
+    """Канал (если еще не открыт, см. open_recognizer), токен и каталог. folder_id_arg нет - ищем его сами."""
+    global secret, folder_id
+
+    open_recognizer()
+
     secret = secret_arg
 
-    folders = list_folders()
-    folder_id = folders[0].id
+    folder_id = folder_id_arg or find_folder_id(secret_arg)
 
 
-def yandex_speech_kit_shutdown():
-    audio.terminate()
+def set_iam_token(iam_token: str):
+    """Новый IAM-токен (см. app.credential_cache.IamRefresher). Заголовки берутся на каждый сеанс, так что он
+    действует со следующего сеанса; идущий сеанс доживает со старым."""
+    global secret
+    secret = iam_token
 
 
-def recognize_requests_generator():
-    global audio
+def yandex_speech_kit_shutdown():
+    app.audio_capture.capture.stop()
 
-    stream = None
-    try:
-        # Из объектов модели конфигурации распознания нашего gRPC API создаем конфигурацию.
-        recognize_options = stt_pb2.StreamingOptions(
-            recognition_model=stt_pb2.RecognitionModelOptions(
-                audio_format=stt_pb2.AudioFormatOptions(
-                    raw_audio=stt_pb2.RawAudio(
-                        audio_encoding=stt_pb2.RawAudio.LINEAR16_PCM,
-                        sample_rate_hertz=FRAMES_PER_SECOND,
-                        audio_channel_count=1
-                    )
-                ),
-                text_normalization=stt_pb2.TextNormalizationOptions(
-                    text_normalization=stt_pb2.TextNormalizationOptions.TEXT_NORMALIZATION_DISABLED,
-                    profanity_filter=False,
-                    literature_text=False,
-                    phone_formatting_mode=stt_pb2.TextNormalizationOptions.PHONE_FORMATTING_MODE_DISABLED,
-                ),
-                language_restriction=stt_pb2.LanguageRestrictionOptions(
-                    restriction_type=stt_pb2.LanguageRestrictionOptions.WHITELIST,
-                    # language_code=['ru-RU', 'en-US'],
-                    language_code=['ru-RU'],
-                ),
-                audio_processing_type=stt_pb2.RecognitionModelOptions.REAL_TIME
+
+def build_audio_format_options(audio_encoding_arg: str = "pcm") -> stt_pb2.AudioFormatOptions:
+    if audio_encoding_arg == "ogg_opus":
+        return stt_pb2.AudioFormatOptions(
+            container_audio=stt_pb2.ContainerAudio(
+                container_audio_type=stt_pb2.ContainerAudio.OGG_OPUS
             )
         )
+    return stt_pb2.AudioFormatOptions(
+        raw_audio=stt_pb2.RawAudio(
+            audio_encoding=stt_pb2.RawAudio.LINEAR16_PCM,
+            sample_rate_hertz=FRAMES_PER_SECOND,
+            audio_channel_count=1
+        )
+    )
 
-        # Отправляем на сервер собранные нами настройки распознавания.
-        yield stt_pb2.StreamingRequest(session_options=recognize_options)
-
-        # При помощи PyAudio открываем поток аудио данных с микрофона.
-        stream = audio.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=FRAMES_PER_SECOND,
-            input=True,
-            frames_per_buffer=FRAMES_PER_BUFFER
+
+def build_streaming_options(audio_encoding_arg: str = "pcm") -> stt_pb2.StreamingOptions:
+    # Из объектов модели конфигурации распознания нашего gRPC API создаем конфигурацию.
+    return stt_pb2.StreamingOptions(
+        recognition_model=stt_pb2.RecognitionModelOptions(
+            audio_format=build_audio_format_options(audio_encoding_arg),
+            text_normalization=stt_pb2.TextNormalizationOptions(
+                text_normalization=stt_pb2.TextNormalizationOptions.TEXT_NORMALIZATION_DISABLED,
+                profanity_filter=False,
+                literature_text=False,
+                phone_formatting_mode=stt_pb2.TextNormalizationOptions.PHONE_FORMATTING_MODE_DISABLED,
+            ),
+            language_restriction=stt_pb2.LanguageRestrictionOptions(
+                restriction_type=stt_pb2.LanguageRestrictionOptions.WHITELIST,
+                # language_code=['ru-RU', 'en-US'],
+                language_code=['ru-RU'],
+            ),
+            audio_processing_type=stt_pb2.RecognitionModelOptions.REAL_TIME
         )
+    )
 
-        logger.info("recording")
 
-        while True:
-            # Читаем из микрофона очередной блок.
-            data = stream.read(FRAMES_PER_BUFFER)
+class _PcmChunkEncoder:
+    """Без кодирования: PCM как есть."""
+
+    bytes_written = 0
+
+    def headers(self) -> bytes:
+        return b""
+
+    def encode(self, pcm: bytes) -> bytes:
+        self.bytes_written += len(pcm)
+        return pcm
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _StreamingRequests:
+    """Аудио -> запросы StreamingRequest: отсев тишины, кодирование, SilenceChunk. Общее для потоков и asyncio."""
+
+    def __init__(self, vad_mode_arg: str, audio_encoding_arg: str):
+        if vad_mode_arg not in VAD_MODES:
+            raise ValueError(f"Unknown VAD mode {vad_mode_arg!r}, expected one of {VAD_MODES}")
+        if audio_encoding_arg not in AUDIO_ENCODINGS:
+            raise ValueError(f"Unknown audio encoding {audio_encoding_arg!r}, expected one of {AUDIO_ENCODINGS}")
+        self.vad_mode = vad_mode_arg
+        self.audio_encoding = audio_encoding_arg
+        self.encoder = None
+        self.gate = app.vad.VadGate() if vad_mode_arg != "off" else None
+        self.captured_bytes = 0
+        # Отброшенная тишина, еще не ушедшая в SilenceChunk (меньше миллисекунды, или ждет целой мс)
+        self._silence_bytes = 0
+
+    def start(self) -> Iterator[stt_pb2.StreamingRequest]:
+        # Отправляем на сервер собранные нами настройки распознавания.
+        yield stt_pb2.StreamingRequest(session_options=build_streaming_options(self.audio_encoding))
+
+        if self.audio_encoding == "ogg_opus":
+            self.encoder = app.ogg_opus.OggOpusEncoder(FRAMES_PER_SECOND, opus_bitrate)
+        else:
+            self.encoder = _PcmChunkEncoder()
+
+        headers = self.encoder.headers()
+        if headers:
+            yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=headers))
+
+    def _audio_requests(self, data: bytes) -> Iterator[stt_pb2.StreamingRequest]:
+        encoded = self.encoder.encode(data)
+        if encoded:
+            # Отправляем очередной блок на распознание.
+            yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=encoded))
+
+    def audio(self, data: bytes) -> Iterator[stt_pb2.StreamingRequest]:
+        self.captured_bytes += len(data)
+        if self.gate is None:
+            yield from self._audio_requests(data)
+            return
+
+        to_send = self.gate.process(data)
+        # Отброшенная тишина всегда раньше того, что уходит сейчас (придержанное в lookback уходит при начале речи)
+        yield from self._silence_requests(self.gate.take_dropped_bytes())
+        for speech_data in to_send:
+            yield from self._audio_requests(speech_data)
+
+    def _silence_requests(self, dropped_bytes: int) -> Iterator[stt_pb2.StreamingRequest]:
+        if self.vad_mode != "silence" or not dropped_bytes:
+            return
+        if self.audio_encoding == "ogg_opus":
+            # Позиции OGG считают только закодированные сэмплы - тишину кодируем (Opus сжимает ее до пары байт)
+            yield from self._audio_requests(bytes(dropped_bytes))
+            return
+        self._silence_bytes += dropped_bytes
+        # Целые миллисекунды; остаток копится до следующего раза, чтобы округление не набегало
+        bytes_per_ms = app.audio_capture.BYTES_PER_SECOND // 1000
+        duration_ms = self._silence_bytes // bytes_per_ms
+        if duration_ms:
+            self._silence_bytes -= duration_ms * bytes_per_ms
+            yield stt_pb2.StreamingRequest(silence_chunk=stt_pb2.SilenceChunk(duration_ms=duration_ms))
+
+    def finish(self) -> Iterator[stt_pb2.StreamingRequest]:
+        if self.gate is not None:
+            yield from self._silence_requests(self.gate.flush())
+        tail = self.encoder.flush()
+        if tail:
+            yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=tail))
+
+    def log_summary(self):
+        if self.gate is not None:
+            self.gate.log_summary()
+        if self.captured_bytes:
+            logger.info(
+                "Sent %s bytes of %s audio for %.1f s captured",
+                self.encoder.bytes_written, self.audio_encoding, self.captured_bytes / app.audio_capture.BYTES_PER_SECOND
+            )
+
+
+def streaming_requests(
+    chunks: Iterable[bytes],
+    vad_mode_arg: str = "off",
+    audio_encoding_arg: str = "pcm",
+) -> Iterator[stt_pb2.StreamingRequest]:
+    requests = _StreamingRequests(vad_mode_arg, audio_encoding_arg)
+    try:
+        yield from requests.start()
+        for data in chunks:
+            yield from requests.audio(data)
+        yield from requests.finish()
+    finally:
+        requests.log_summary()
 
-            # Отправляем считанный из микрофона блок на распознание.
-            yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=data))
+
+async def streaming_requests_async(
+    chunks: AsyncIterable[bytes],
+    vad_mode_arg: str = "off",
+    audio_encoding_arg: str = "pcm",
+) -> AsyncIterator[stt_pb2.StreamingRequest]:
+    requests = _StreamingRequests(vad_mode_arg, audio_encoding_arg)
+    try:
+        for request in requests.start():
+            yield request
+        async for data in chunks:
+            for request in requests.audio(data):
+                yield request
+        for request in requests.finish():
+            yield request
     finally:
-        # Закрываем поток аудио данных
-        if stream:
-            stream.stop_stream()
-            stream.close()
+        requests.log_summary()
+
+
+def _pre_roll_start_pos(start_pos: int | None) -> int | None:
+    # С start_pos, если задана, но не раньше, чем PRE_ROLL_MS назад
+    if start_pos is None:
+        return None
+    ring = app.audio_capture.capture.ring
+    pre_roll_bytes = PRE_ROLL_MS * app.audio_capture.BYTES_PER_SECOND // 1000
+    return min(max(start_pos, ring.write_pos - pre_roll_bytes), ring.write_pos)
+
+
+def microphone_chunks(start_pos: int | None = None) -> Iterator[bytes]:
+    # Читаем общий захват с микрофона (app.audio_capture) своим курсором.
+    # С start_pos, но не раньше, чем PRE_ROLL_MS назад. Накопленное уходит первой пачкой.
+    reader = app.audio_capture.capture.reader(_pre_roll_start_pos(start_pos))
+
+    logger.info("recording, pre-roll %.0f ms", reader.available * 1000 / app.audio_capture.BYTES_PER_SECOND)
+
+    while True:
+        data = reader.read(CHUNK_BYTES, timeout=1)
+        if data is None:
+            continue
+        app.tracing.instant("audio_chunk")
+        app.session_recorder.recorder.record_audio(data)
+
+        # protobuf принимает только bytes - копируем на границе
+        yield bytes(data)
+
+
+async def microphone_chunks_async(start_pos: int | None = None) -> AsyncIterator[bytes]:
+    # То же, что microphone_chunks, но ждем данные в цикле событий, а не в потоке
+    reader = app.ring_buffer.AsyncRingReader(app.audio_capture.capture.reader(_pre_roll_start_pos(start_pos)))
+
+    logger.info("recording, pre-roll %.0f ms", reader.available * 1000 / app.audio_capture.BYTES_PER_SECOND)
+
+    try:
+        while True:
+            data = await reader.read(CHUNK_BYTES)
+            app.tracing.instant("audio_chunk")
+            app.session_recorder.recorder.record_audio(data)
+            yield bytes(data)
+    finally:
+        reader.close()
+
+
+def recognize_requests_generator():
+    yield from streaming_requests(microphone_chunks(), vad_mode, audio_encoding)
 
 
 class RecognizedFragmentCallback(Protocol):
@@ -120,6 +359,132 @@ class RecognizedFragmentCallback(Protocol):
 
 
 def recognize_from_microphone(stop_event: threading.Event, callback: RecognizedFragmentCallback):
+    recognize(recognize_requests_generator(), stop_event, callback)
+
+
+class RecognizeStreamBase(abc.ABC):
+    """
+    Поток распознавания одной записи. Открывается по команде старта (app.recognize_thread.commit), еще до входа
+    в режим записи: аудио начинает уходить в SpeechKit, не дожидаясь паузы между режимами.
+
+    start_pos - с какой позиции в захвате слать аудио (по умолчанию - с текущего момента).
+    stop() - закрываем поток после записи. Результаты, пришедшие до attach(callback), копятся и отдаются при attach.
+    """
+
+    def __init__(self, start_pos: int | None = None):
+        # Когда сработала команда старта (в единицах app.tracing.now())
+        self.started_ns = app.tracing.now()
+        self._start_pos = start_pos
+        self._lock = threading.Lock()
+        self._callback: RecognizedFragmentCallback | None = None
+        self._pending: list[tuple[list[str], bool]] = []
+        self._first_partial_seen = False
+
+    @property
+    @abc.abstractmethod
+    def is_alive(self) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def stop(self):
+        ...
+
+    def _on_fragment(self, alternatives: list[str], is_final: bool):
+        with self._lock:
+            if not self._first_partial_seen:
+                self._first_partial_seen = True
+                app.tracing.complete("hotword_to_first_partial", self.started_ns)
+                logger.info("hotword -> first partial: %.0f ms", (app.tracing.now() - self.started_ns) / 1e6)
+            if self._callback is None:
+                self._pending.append((alternatives, is_final))
+            else:
+                self._callback(alternatives, is_final)
+
+    def attach(self, callback: RecognizedFragmentCallback):
+        with self._lock:
+            self._callback = callback
+            for alternatives, is_final in self._pending:
+                callback(alternatives, is_final)
+            self._pending.clear()
+
+
+class RecognizeStream(RecognizeStreamBase):
+    """Поток распознавания в своем потоке (thread), на блокирующем gRPC."""
+
+    def __init__(self, start_pos: int | None = None):
+        super().__init__(start_pos)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def _run(self):
+        try:
+            recognize(
+                streaming_requests(microphone_chunks(self._start_pos), vad_mode, audio_encoding),
+                self.stop_event,
+                self._on_fragment,
+            )
+        except grpc.RpcError:
+            # Уже залогировано в recognize
+            pass
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class AsyncRecognizeStream(RecognizeStreamBase):
+    """Поток распознавания задачей в цикле app.async_runtime, на grpc.aio. stop() отменяет задачу сразу."""
+
+    def __init__(self, start_pos: int | None = None):
+        super().__init__(start_pos)
+        self._runtime = app.async_runtime.runtime
+        self._task: asyncio.Task | None = None
+        self._stopped = False
+        self.future = self._runtime.submit(self._run())
+
+    @property
+    def is_alive(self) -> bool:
+        return not self.future.done()
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        if self._stopped:
+            return
+        try:
+            await recognize_async(
+                streaming_requests_async(microphone_chunks_async(self._start_pos), vad_mode, audio_encoding),
+                self._on_fragment,
+            )
+        except grpc.RpcError:
+            # Уже залогировано в recognize_async
+            pass
+        except asyncio.CancelledError:
+            logger.debug("Recognize stream cancelled")
+
+    def _cancel(self):
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def stop(self):
+        self._runtime.call_soon(self._cancel)
+
+
+def new_recognize_stream(start_pos: int | None = None) -> RecognizeStreamBase:
+    if app.async_runtime.is_asyncio():
+        return AsyncRecognizeStream(start_pos)
+    return RecognizeStream(start_pos)
+
+
+def recognize(
+    requests: Iterator[stt_pb2.StreamingRequest],
+    stop_event: threading.Event,
+    callback: RecognizedFragmentCallback
+):
     global recognizer, secret
 
     # Отправьте данные для распознавания.
@@ -132,18 +497,10 @@ def recognize_from_microphone(stop_event: threading.Event, callback: RecognizedF
         # Сохранить отправленные бинарные данные в .wav файл.
         # Это функция-генератор, т.к. там внутри используется yield.
         # Что-то вроде флоу в котлине.
-        recognize_requests_generator(),
+        requests,
 
         # Для установки соединения использовать такие заголовки.
-        metadata=(
-
-            # Параметры для аутентификации с API-ключом от имени сервисного аккаунта
-            # ('authorization', f'Api-Key {secret}'),
-
-            # Параметры для аутентификации с IAM-токеном
-            ('authorization', f'Bearer {secret}'),
-            ('x-folder-id', folder_id),
-        )
+        metadata=_metadata()
     )
 
     # Обработайте ответы сервера и выведите результат в консоль.
@@ -154,32 +511,79 @@ def recognize_from_microphone(stop_event: threading.Event, callback: RecognizedF
             if stop_event.is_set():
                 break
 
-            # Получаем имя того поля группы Event внутри StreamingResponse,
-            # которое (поле) присутствует в StreamingResponse.
-            # В каждом из этих полей содержится объект какого-то своего класса и какой-то своей структуры.
-            event_type = streaming_response.WhichOneof('Event')
-            # Делаем разное, в зависимости от того, какое из этих полей там было задано.
-            # Достаем список альтернативных слов из соответствующего объекта.
-            if event_type == 'partial' and len(streaming_response.partial.alternatives) > 0:
-                logger.debug("alternatives=%r", streaming_response.partial.alternatives)
-                alternatives = [a.text for a in streaming_response.partial.alternatives]
-                callback(alternatives, False)
-            if event_type == 'final':
-                logger.debug("alternatives=%r", streaming_response.partial.alternatives)
-                alternatives = [a.text for a in streaming_response.final.alternatives]
-                callback(alternatives, True)
-
-    except grpc._channel._Rendezvous as err:
-        logger.error("Error code %s, message: %s", err._state.code, err._state.details)
+            fragment = _response_fragment(streaming_response)
+            if fragment is not None:
+                callback(*fragment)
+                if fragment[1]:
+                    app.tracing.next_utterance()
+
+    except grpc.RpcError as err:
+        logger.error("Error code %s, message: %s", err.code(), err.details())
         raise err
 
 
-def list_folders():
-    resource_manager_channel = grpc.secure_channel(
-        "resource-manager.api.cloud.yandex.net:443",
-        grpc.ssl_channel_credentials()
+def _response_fragment(streaming_response: stt_pb2.StreamingResponse) -> tuple[list[str], bool] | None:
+    """(альтернативы, финал ли) из ответа, или None, если в нем нет текста."""
+    # Получаем имя того поля группы Event внутри StreamingResponse,
+    # которое (поле) присутствует в StreamingResponse.
+    # В каждом из этих полей содержится объект какого-то своего класса и какой-то своей структуры.
+    event_type = streaming_response.WhichOneof('Event')
+    app.tracing.instant("response", event=event_type)
+    # Делаем разное, в зависимости от того, какое из этих полей там было задано.
+    # Достаем список альтернативных слов из соответствующего объекта.
+    if event_type == 'partial' and len(streaming_response.partial.alternatives) > 0:
+        logger.debug("alternatives=%r", streaming_response.partial.alternatives)
+        return [a.text for a in streaming_response.partial.alternatives], False
+    if event_type == 'final':
+        logger.debug("alternatives=%r", streaming_response.final.alternatives)
+        return [a.text for a in streaming_response.final.alternatives], True
+    return None
+
+
+def _metadata() -> tuple[tuple[str, str], ...]:
+    return (
+        # Параметры для аутентификации с API-ключом от имени сервисного аккаунта
+        # ('authorization', f'Api-Key {secret}'),
+
+        # Параметры для аутентификации с IAM-токеном
+        ('authorization', f'Bearer {secret}'),
+        ('x-folder-id', folder_id),
     )
-    metadata = [("authorization", f"Bearer {secret}")]
+
+
+async def recognize_async(
+    requests: AsyncIterator[stt_pb2.StreamingRequest],
+    callback: RecognizedFragmentCallback,
+):
+    """
+    recognize() для asyncio: grpc.aio, в потоке цикла app.async_runtime. Остановить - отменить задачу.
+
+    callback синхронный и выполняется в потоке processors. Следующий ответ не читается, пока он не вернется.
+    """
+    global aio_channel, aio_recognizer
+
+    if aio_recognizer is None:
+        aio_channel = open_aio_channel(speechkit_endpoint)
+        aio_recognizer = stt_service_pb2_grpc.RecognizerStub(aio_channel)
+
+    call = aio_recognizer.RecognizeStreaming(requests, metadata=_metadata())
+    try:
+        async for streaming_response in call:
+            fragment = _response_fragment(streaming_response)
+            if fragment is not None:
+                await app.async_runtime.runtime.run_processor(callback, *fragment)
+                if fragment[1]:
+                    app.tracing.next_utterance()
+    except grpc.RpcError as err:
+        logger.error("Error code %s, message: %s", err.code(), err.details())
+        raise err
+    finally:
+        call.cancel()
+
+
+def list_folders(iam_token: str | None = None):
+    resource_manager_channel = open_channel(resource_manager_endpoint)
+    metadata = [("authorization", f"Bearer {iam_token or secret}")]
 
     cloud_stub = cloud_service_pb2_grpc.CloudServiceStub(resource_manager_channel)
     clouds_resp = cloud_stub.List(cloud_service_pb2.ListCloudsRequest(), metadata=metadata)
@@ -0,0 +1,228 @@
+"""
+Локальная замена Yandex SpeechKit gRPC API для замеров задержек и нагрузки без сети.
+
+Реализует Recognizer.RecognizeStreaming и заглушки CloudService/FolderService.List из resource manager.
+Отвечает заранее заданными частичными/финальными результатами: по сценарию из фраз (--script)
+или по сеансу, записанному app.session_recorder (--session). Ответы привязаны к количеству
+полученного аудио, а не к часам, поэтому прогон детерминирован. Можно добавить задержку ответа,
+разброс задержки и обрыв потока с ошибкой.
+
+Запуск:
+
+    set PYTHONPATH=src
+    python -m app.yandex_speech_kit_local_server --port 50051 --script "зима лето точка|осень" --latency-ms 80 --jitter-ms 20
+
+Клиент направляется на него переменными окружения (см. app.yandex_speech_kit):
+
+    set WOW_STT_SPEECHKIT_ENDPOINT=localhost:50051
+    set WOW_STT_RESOURCE_MANAGER_ENDPOINT=localhost:50051
+"""
+from __future__ import annotations
+import argparse
+import random
+import threading
+import time
+from collections.abc import Iterator
+from concurrent import futures
+from typing import NamedTuple
+
+import grpc
+
+import yandex.cloud.ai.stt.v3.stt_pb2 as stt_pb2
+import yandex.cloud.ai.stt.v3.stt_service_pb2_grpc as stt_service_pb2_grpc
+import yandex.cloud.resourcemanager.v1.cloud_pb2 as cloud_pb2
+import yandex.cloud.resourcemanager.v1.cloud_service_pb2 as cloud_service_pb2
+import yandex.cloud.resourcemanager.v1.cloud_service_pb2_grpc as cloud_service_pb2_grpc
+import yandex.cloud.resourcemanager.v1.folder_pb2 as folder_pb2
+import yandex.cloud.resourcemanager.v1.folder_service_pb2 as folder_service_pb2
+import yandex.cloud.resourcemanager.v1.folder_service_pb2_grpc as folder_service_pb2_grpc
+
+from app.session_recorder import read_session, RECORD_AUDIO
+from app.ogg_opus import read_pages, opus_head_pre_skip, GRANULE_RATE, HEADER_BOS
+from app.app_logging import logging
+
+
+logger = logging.getLogger(__name__)
+
+CLOUD_ID = "local-cloud"
+FOLDER_ID = "local-folder"
+
+# 16 кГц, 16 бит, моно
+BYTES_PER_SECOND = 16000 * 2
+
+
+class ScriptEvent(NamedTuple):
+    # Ответ отправляется, когда от клиента пришло столько байт аудио
+    after_audio_bytes: int
+    alternatives: list[str]
+    is_final: bool
+
+
+def scripted_events(utterances: list[str], word_ms: int = 300) -> list[ScriptEvent]:
+    """Каждая фраза отдается по слову на word_ms мс аудио, частичными результатами, и в конце финалом."""
+    bytes_per_word = BYTES_PER_SECOND * word_ms // 1000
+    events = []
+    audio_bytes = 0
+    for utterance in utterances:
+        words = utterance.split()
+        for n in range(1, len(words) + 1):
+            audio_bytes += bytes_per_word
+            events.append(ScriptEvent(audio_bytes, [" ".join(words[:n])], False))
+        events.append(ScriptEvent(audio_bytes, [utterance], True))
+    return events
+
+
+def recorded_events(path: str) -> list[ScriptEvent]:
+    """Фрагменты записанного сеанса, каждый после того же количества аудио, что и при записи."""
+    events = []
+    audio_bytes = 0
+    for record in read_session(path):
+        if record.kind == RECORD_AUDIO:
+            audio_bytes += len(record.data)
+        else:
+            events.append(ScriptEvent(audio_bytes, record.alternatives, record.is_final))
+    return events
+
+
+def _response(event: ScriptEvent) -> stt_pb2.StreamingResponse:
+    update = stt_pb2.AlternativeUpdate(alternatives=[stt_pb2.Alternative(text=text) for text in event.alternatives])
+    if event.is_final:
+        return stt_pb2.StreamingResponse(final=update)
+    return stt_pb2.StreamingResponse(partial=update)
+
+
+class RecognizerServicer(stt_service_pb2_grpc.RecognizerServicer):
+
+    def __init__(
+        self,
+        events: list[ScriptEvent],
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.events = events
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # Вероятность оборвать поток с UNAVAILABLE перед очередным ответом
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.chunks = 0
+        self.silence_chunks = 0
+        self.audio_bytes = 0
+
+    def _delay(self):
+        with self._lock:
+            delay_ms = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            fail = self._random.random() < self.error_rate
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return fail
+
+    def RecognizeStreaming(self, request_iterator, context) -> Iterator[stt_pb2.StreamingResponse]:
+        with self._lock:
+            self.streams += 1
+
+        first_request = next(request_iterator, None)
+        if first_request is None or first_request.WhichOneof("Event") != "session_options":
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "first request must be session_options")
+
+        # В OGG/Opus длительность аудио берем из позиций страниц, а не из количества байт
+        container_audio = (
+            first_request.session_options.recognition_model.audio_format.WhichOneof("AudioFormat") == "container_audio"
+        )
+
+        next_event = 0
+        audio_bytes = 0
+        silence_bytes = 0
+        pre_skip = 0
+        for request in request_iterator:
+            event_type = request.WhichOneof("Event")
+            if event_type == "chunk":
+                if container_audio:
+                    for header_type, granule, packets in read_pages(request.chunk.data):
+                        if header_type & HEADER_BOS:
+                            pre_skip = opus_head_pre_skip(packets[0])
+                            continue
+                        # Позиции страниц идут с учетом задержки кодера (RFC 7845)
+                        audio_samples = max(granule - pre_skip, 0)
+                        audio_bytes = max(audio_bytes, silence_bytes + audio_samples * BYTES_PER_SECOND // GRANULE_RATE)
+                else:
+                    audio_bytes += len(request.chunk.data)
+                with self._lock:
+                    self.chunks += 1
+                    self.audio_bytes += len(request.chunk.data)
+            elif event_type == "silence_chunk":
+                # Тишина, вырезанная клиентом (app.vad), идет в счет аудио по длительности
+                silence = request.silence_chunk.duration_ms * BYTES_PER_SECOND // 1000
+                audio_bytes += silence
+                silence_bytes += silence
+                with self._lock:
+                    self.silence_chunks += 1
+            else:
+                continue
+
+            while next_event < len(self.events) and self.events[next_event].after_audio_bytes <= audio_bytes:
+                if self._delay():
+                    logger.info("Injected error after %s events", next_event)
+                    context.abort(grpc.StatusCode.UNAVAILABLE, "injected error")
+                yield _response(self.events[next_event])
+                next_event += 1
+
+
+class CloudServiceServicer(cloud_service_pb2_grpc.CloudServiceServicer):
+
+    def List(self, request, context):
+        return cloud_service_pb2.ListCloudsResponse(clouds=[cloud_pb2.Cloud(id=CLOUD_ID, name="local")])
+
+
+class FolderServiceServicer(folder_service_pb2_grpc.FolderServiceServicer):
+
+    def List(self, request, context):
+        return folder_service_pb2.ListFoldersResponse(
+            folders=[folder_pb2.Folder(id=FOLDER_ID, cloud_id=request.cloud_id, name="local")]
+        )
+
+
+def serve(recognizer_servicer: RecognizerServicer, port: int = 0, max_workers: int = 8) -> tuple[grpc.Server, int]:
+    """Запускает сервер на localhost. port=0 - любой свободный. Возвращает (сервер, порт)."""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    stt_service_pb2_grpc.add_RecognizerServicer_to_server(recognizer_servicer, server)
+    cloud_service_pb2_grpc.add_CloudServiceServicer_to_server(CloudServiceServicer(), server)
+    folder_service_pb2_grpc.add_FolderServiceServicer_to_server(FolderServiceServicer(), server)
+    port = server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    logger.info("Local SpeechKit server on localhost:%s", port)
+    return server, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Yandex SpeechKit gRPC API")
+    parser.add_argument("--port", type=int, default=50051)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--script", default="зима лето точка|осень запятая весна", help="utterances separated by |")
+    source.add_argument("--session", help="session recorded with WOW_STT_RECORD_DIR")
+    parser.add_argument("--word-ms", type=int, default=300, help="audio per word for --script")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.session:
+        events = recorded_events(args.session)
+    else:
+        events = scripted_events(args.script.split("|"), args.word_ms)
+
+    servicer = RecognizerServicer(events, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    server, _ = serve(servicer, args.port)
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    main()
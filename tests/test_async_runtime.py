@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+import app.async_runtime
+from app.async_runtime import AsyncRuntime
+
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime()
+    yield runtime
+    runtime.stop()
+
+
+def test_submit_runs_in_loop_thread(runtime):
+    async def whoami():
+        return threading.current_thread().name
+
+    assert runtime.submit(whoami()).result(timeout=5) == "asyncio"
+
+
+def test_run_processor_keeps_loop_free(runtime):
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(runtime.run_processor(release.wait, 5))
+        # Обработчик висит в своем потоке, а цикл продолжает работать
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        release.set()
+        return await blocked
+
+    assert runtime.submit(scenario()).result(timeout=5) is True
+
+
+def test_call_later_runs_callbacks_in_order_on_processors_thread(runtime):
+    calls = []
+    done = threading.Event()
+
+    def callback(name: str):
+        calls.append((name, threading.current_thread().name.startswith("processors")))
+        if len(calls) == 2:
+            done.set()
+
+    runtime.call_later(0.02, callback, "second")
+    runtime.call_later(0.01, callback, "first")
+
+    assert done.wait(timeout=5)
+    assert calls == [("first", True), ("second", True)]
+
+
+def test_call_later_with_threads(monkeypatch):
+    monkeypatch.setattr(app.async_runtime, "runtime_name", "threads")
+    done = threading.Event()
+
+    app.async_runtime.call_later(0.01, done.set)
+
+    assert done.wait(timeout=5)
+
+
+def test_unknown_runtime(monkeypatch):
+    monkeypatch.setattr(app.async_runtime, "runtime_name", "fibers")
+
+    with pytest.raises(ValueError):
+        app.async_runtime.call_later(0.01, lambda: None)
+
+
+def test_call_later_after_stop_is_noop():
+    runtime = AsyncRuntime()
+    runtime.call_later(10, lambda: None)
+    runtime.stop()
+
+    runtime.call_later(0.01, lambda: None)
+
+    # Цикл заново не поднялся
+    assert runtime._loop is None
+
+
+def test_submit_and_call_soon_after_stop_do_not_restart():
+    runtime = AsyncRuntime()
+    runtime.submit(asyncio.sleep(0)).result(timeout=5)
+    runtime.stop()
+    threads_before = threading.active_count()
+    ran = []
+
+    async def coroutine():
+        ran.append("submit")
+
+    future = runtime.submit(coroutine())
+    runtime.call_soon(ran.append, "call_soon")
+
+    assert future.cancelled()
+    assert ran == []
+    assert runtime._loop is None and runtime._thread is None
+    assert threading.active_count() <= threads_before
+    with pytest.raises(RuntimeError):
+        runtime.loop
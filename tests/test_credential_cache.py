@@ -0,0 +1,114 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from app.credential_cache import Credentials, IamRefresher, load, parse_expires_at, save
+
+
+def _credentials(iam_token: str = "iam-1", iam_expires_in: float = 3600) -> Credentials:
+    return Credentials("oauth", "refresh", time.time() + 86400, iam_token, time.time() + iam_expires_in)
+
+
+def test_save_and_load(tmp_path):
+    path = tmp_path / "dir" / "credentials.json"
+    credentials = _credentials()
+
+    save(path, credentials)
+
+    assert load(path) == credentials
+    assert not (tmp_path / "dir" / "credentials.json.tmp").exists()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права доступа - только POSIX")
+def test_file_permissions(tmp_path):
+    path = tmp_path / "dir" / "credentials.json"
+    save(path, _credentials())
+    save(path, _credentials("iam-2"))
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+
+
+def test_missing_or_broken_file(tmp_path):
+    path = tmp_path / "credentials.json"
+    assert load(path) is None
+
+    path.write_text("{not json", encoding="utf-8")
+    assert load(path) is None
+
+    path.write_text('{"iam_token": "x"}', encoding="utf-8")
+    assert load(path) is None
+
+
+def test_parse_expires_at():
+    assert parse_expires_at("2024-05-01T12:00:00Z") == 1714564800.0
+    assert parse_expires_at("2024-05-01T12:00:00.123456789Z") == pytest.approx(1714564800.123456)
+    assert parse_expires_at("2024-05-01T15:00:00.5+03:00") == 1714564800.5
+
+
+def test_validity():
+    credentials = Credentials("oauth", None, None, "iam", 1000.0)
+
+    assert credentials.iam_valid(now=999)
+    assert not credentials.iam_valid(margin_s=10, now=995)
+    assert credentials.oauth_valid(now=10 ** 12)
+
+
+def test_refresher_renews_ahead_of_expiry():
+    tokens = []
+    saved = []
+    refreshed = threading.Event()
+
+    def refresh(old: Credentials) -> Credentials:
+        refreshed.set()
+        return _credentials(old.iam_token + "+", iam_expires_in=3600)
+
+    # Токен живет 0.3 с, обновляем за 0.2 с до конца
+    refresher = IamRefresher(_credentials(iam_expires_in=0.3), refresh, tokens.append, saved.append, lead_s=0.2)
+    started = time.monotonic()
+    refresher.start()
+
+    assert refreshed.wait(2)
+    elapsed = time.monotonic() - started
+    refresher.stop()
+
+    assert 0.05 <= elapsed < 0.3
+    assert tokens == ["iam-1+"]
+    assert [c.iam_token for c in saved] == ["iam-1+"]
+    assert refresher.credentials.iam_token == "iam-1+"
+
+
+def test_refresher_retries_after_failure():
+    tokens = []
+    calls = []
+
+    def refresh(old: Credentials) -> Credentials:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise ConnectionError("token endpoint is down")
+        return _credentials("iam-2")
+
+    refresher = IamRefresher(_credentials(iam_expires_in=0), refresh, tokens.append, lead_s=0, retry_s=0.05)
+    refresher.start()
+    deadline = time.monotonic() + 2
+    while not tokens and time.monotonic() < deadline:
+        time.sleep(0.01)
+    refresher.stop()
+
+    assert tokens == ["iam-2"]
+    assert refresher.failures == 1
+    assert calls[1] - calls[0] >= 0.05
+
+
+def test_refresher_stops_while_waiting():
+    refresher = IamRefresher(_credentials(), lambda old: old, lambda token: None)
+    refresher.start()
+
+    started = time.monotonic()
+    refresher.stop()
+
+    assert time.monotonic() - started < 1
+    assert refresher.refreshes == 0
@@ -0,0 +1,63 @@
+import time
+import wave
+
+import numpy as np
+
+from app.cue_engine import CueEngine, FileBackend, Mixer, NullBackend, synthesize_tone
+
+SOUND_MAP = {
+    "low": ("beep", (220, 100)),
+    "high": ("beep", (440, 50)),
+}
+
+
+def test_tone_frequency_and_fades():
+    tone = synthesize_tone(440, 100, sample_rate=8000)
+
+    assert len(tone) == 800
+    spectrum = np.abs(np.fft.rfft(tone))
+    assert np.argmax(spectrum) * 8000 / len(tone) == 440
+    # Края плавные - без щелчков
+    assert tone[0] == 0.0
+    assert abs(tone[-1]) < 1e-3
+
+
+def test_mixer_sums_voices_and_clips():
+    mixer = Mixer()
+    mixer.add(np.full(4, 0.6, dtype=np.float32))
+    mixer.add(np.full(2, 0.6, dtype=np.float32))
+
+    assert list(mixer.render(3)) == [1.0, 1.0, np.float32(0.6)]
+    assert mixer.active
+    assert list(mixer.render(3)) == [np.float32(0.6), 0.0, 0.0]
+    assert not mixer.active
+
+
+def test_play_does_not_block():
+    engine = CueEngine(SOUND_MAP, NullBackend())
+    engine.start()
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        engine.play("low")
+    per_call = (time.perf_counter() - started) / 1000
+
+    assert per_call < 0.001
+    engine.stop()
+
+
+def test_file_backend_writes_cues(tmp_path):
+    path = tmp_path / "cues.wav"
+    engine = CueEngine(SOUND_MAP, FileBackend(str(path)), sample_rate=8000)
+    engine.start()
+
+    engine.play("low")
+    engine.play("unknown")
+    engine.stop()
+
+    with wave.open(str(path), "rb") as f:
+        assert f.getframerate() == 8000
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    # Блоки по 10 мс - сигнал на 100 мс целиком, без хвоста тишины
+    assert len(samples) == 800
+    assert np.abs(samples).max() > 0.25 * 32767
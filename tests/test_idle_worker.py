@@ -0,0 +1,38 @@
+import pytest
+
+from app.idle_worker import IdleWorker, HotwordEvent, WorkerReady, WorkerFailed
+
+
+@pytest.fixture
+def worker():
+    # Процесс не запускаем: события кладем в очередь сами
+    return IdleWorker("unused", 16, 4, "unused", "[]", use_vad=False)
+
+
+def test_events_of_current_listen_only(worker):
+    worker.listen(0)
+    worker._events.put(HotwordEvent(1, "сказать", False, 100))
+    worker.listen(200)
+    worker._events.put(HotwordEvent(1, "сказать привет", True, 100))
+    worker._events.put(HotwordEvent(2, "бой", False, 300))
+
+    assert worker.get_event(timeout=5) == HotwordEvent(2, "бой", False, 300)
+    assert worker.get_event(timeout=0.05) is None
+
+
+def test_events_dropped_after_pause(worker):
+    worker.listen(0)
+    worker.pause()
+    worker._events.put(HotwordEvent(1, "сказать", False, 100))
+
+    assert worker.get_event(timeout=0.05) is None
+
+
+def test_ready_and_failure(worker):
+    worker._events.put(WorkerReady(123.0))
+    assert worker.get_event(timeout=0.05) is None
+    assert worker.ready_ms == 123.0
+
+    worker._events.put(WorkerFailed("OSError()"))
+    with pytest.raises(RuntimeError):
+        worker.get_event(timeout=5)
@@ -0,0 +1,51 @@
+from app.keyboard.input_injection import (
+    VK_CONTROL, VK_RETURN, VK_V, InputInjector, KeyEvent, RecordingBackend, batches, chat_send_sequence
+)
+
+
+def _keys(backend: RecordingBackend) -> list[tuple[int, bool]]:
+    return [(event.vk, event.keyup) for _, event in backend.events]
+
+
+def test_chat_send_sequence_is_one_batch():
+    backend = RecordingBackend()
+    InputInjector(backend).play(chat_send_sequence())
+
+    assert backend.batches == 1
+    assert _keys(backend) == [
+        (VK_RETURN, False), (VK_RETURN, True),
+        (VK_CONTROL, False), (VK_V, False), (VK_V, True), (VK_CONTROL, True),
+        (VK_RETURN, False), (VK_RETURN, True),
+    ]
+
+
+def test_let_edit_keeps_chat_open():
+    backend = RecordingBackend()
+    InputInjector(backend).play(chat_send_sequence(let_edit=True))
+
+    assert _keys(backend)[-1] == (VK_CONTROL, True)
+    assert (VK_RETURN, False) not in _keys(backend)[2:]
+
+
+def test_delays_split_batches():
+    events = [KeyEvent(1), KeyEvent(1, True), KeyEvent(2, False, 30), KeyEvent(2, True)]
+
+    assert batches(events) == [(0, events[:2]), (30, events[2:])]
+
+
+def test_step_delay_is_honoured():
+    backend = RecordingBackend()
+    sleeps = []
+    InputInjector(backend, sleep=sleeps.append).play(chat_send_sequence(step_ms=20))
+
+    assert backend.batches == 3
+    assert sleeps == [0.02, 0.02]
+
+
+def test_step_delay_timing():
+    backend = RecordingBackend()
+    InputInjector(backend).play(chat_send_sequence(step_ms=20))
+
+    times = sorted({sent_ns for sent_ns, _ in backend.events})
+    assert len(times) == 3
+    assert all(b - a >= 20_000_000 for a, b in zip(times, times[1:]))
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import app.mode_container
+from app.mode_container import ModeContainer, ModeProcessor, MODE_IDLE, MODE_TIMER, MODE_RECORDING
+
+
+class RecordingModeProcessor(ModeProcessor):
+
+    def __init__(self, mode_container: ModeContainer, mode: str, events: list):
+        super().__init__(mode_container, mode)
+        self.events = events
+
+    def on_mode_leave(self):
+        self.events.append(("leave", self.mode_container.mode))
+
+    def on_after_mode_leave_grace(self):
+        self.events.append(("grace", self.mode_container.mode))
+
+
+@pytest.fixture(autouse=True)
+def no_grace(monkeypatch):
+    monkeypatch.setattr(app.mode_container, "GRACE_SECONDS", 0.01)
+
+
+def test_observers_see_every_transition_in_order():
+    container = ModeContainer()
+    events = []
+    container.subscribe(lambda old, new: events.append(("changed", old, new)))
+    processor = RecordingModeProcessor(container, MODE_IDLE, events)
+    entered = threading.Event()
+
+    def enter_mode():
+        events.append(("enter", container.mode))
+        entered.set()
+
+    container.to_mode(processor, MODE_RECORDING, enter_mode)
+    assert entered.wait(timeout=2)
+
+    assert events == [
+        ("leave", MODE_IDLE),
+        ("changed", MODE_IDLE, MODE_TIMER),
+        ("grace", MODE_TIMER),
+        ("changed", MODE_TIMER, MODE_RECORDING),
+        ("enter", MODE_RECORDING),
+    ]
+
+
+def test_transition_must_go_through_timer():
+    container = ModeContainer()
+
+    with pytest.raises(ValueError):
+        container._set_mode(MODE_RECORDING)
+    assert container.mode == MODE_IDLE
+
+
+def test_wait_for_change_wakes_on_transition():
+    container = ModeContainer()
+    processor = ModeProcessor(container, MODE_IDLE)
+
+    threading.Timer(0.05, container.to_mode, (processor, MODE_RECORDING, lambda: None)).start()
+
+    assert container.wait_for_change(MODE_IDLE, timeout=2) == MODE_TIMER
+    assert container.wait_for_change(MODE_TIMER, timeout=2) == MODE_RECORDING
+
+
+def test_wait_for_change_times_out():
+    container = ModeContainer()
+
+    assert container.wait_for_change(MODE_IDLE, timeout=0.01) == MODE_IDLE
+
+
+def test_second_transition_during_timer_is_rejected():
+    container = ModeContainer()
+    events = []
+    idle = RecordingModeProcessor(container, MODE_IDLE, events)
+    entered = threading.Event()
+
+    assert container.to_mode(idle, MODE_RECORDING, entered.set)
+    assert container.mode == MODE_TIMER
+    # Вторая команда старта в паузе между режимами - отклоняется, а не падает
+    assert not container.to_mode(idle, MODE_RECORDING, lambda: events.append(("second enter",)))
+    assert entered.wait(timeout=2)
+
+    assert container.mode == MODE_RECORDING
+    assert events == [("leave", MODE_IDLE), ("grace", MODE_TIMER)]
+
+    recording = RecordingModeProcessor(container, MODE_RECORDING, events)
+    assert container.to_mode(recording, MODE_IDLE, lambda: None)
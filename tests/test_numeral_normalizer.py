@@ -0,0 +1,56 @@
+import random
+
+import pytest
+from rus2num import Rus2Num
+
+from app.numeral_normalizer import StreamingNumeralNormalizer
+from app.tokens_to_text_builder import TextBuilderSession, common_prefix
+
+
+_rus_2_num = Rus2Num()
+
+WORDS = [
+    "зима", "лето", "и", "с", "половиной", "один", "два", "три", "пять", "двадцать", "сто", "триста",
+    "тысяч", "тысяча", "миллион", "целых", "десятых", "т", "точка", "запятая", "дефис", "удалить",
+    "пол", "полтора", "полторы", "полутора", "половина", "поле",
+]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_same_as_rus2num(seed: int):
+    rnd = random.Random(seed)
+    # Сырой (ненормализованный) текст берем у построителя без нормализации
+    session = TextBuilderSession(normalize_numerals=False)
+    normalizer = StreamingNumeralNormalizer()
+
+    def check():
+        text, final_text = normalizer.normalize(session.text, session.final_text)
+        expected_text = _rus_2_num(session.text) if session.text else ""
+        assert text == expected_text
+        if session.final_text:
+            assert final_text == common_prefix(_rus_2_num(session.final_text), expected_text)
+        else:
+            assert final_text == ""
+
+    for _ in range(10):
+        utterance = [rnd.choice(WORDS) for _ in range(rnd.randint(1, 5))]
+        for n in range(1, len(utterance) + 1):
+            session.build_text(utterance[:n], False)
+            check()
+        session.build_text(utterance, True)
+        check()
+
+
+def test_number_continues_across_final():
+    normalizer = StreamingNumeralNormalizer()
+    normalizer.normalize("Зима лето пять", "Зима лето пять")
+
+    assert normalizer.normalize("Зима лето пять тысяч три", "Зима лето пять") == ("Зима лето 5003", "Зима лето 5")
+
+
+def test_half_continues_number():
+    normalizer = StreamingNumeralNormalizer()
+    raw = "Пол полтора с пол тысячи"
+
+    assert normalizer.normalize(raw, raw) == ("Пол 2000", "Пол 2000")
+    assert normalizer.normalize(raw + " зима", raw) == (_rus_2_num(raw + " зима"), "Пол 2000")
@@ -0,0 +1,92 @@
+import struct
+
+import pytest
+
+from app.ogg_opus import (
+    HEADER_BOS, HEADER_EOS, OggPageWriter, ogg_crc, opus_head, opus_head_pre_skip, opus_tags, read_pages
+)
+
+
+def _reference_crc(data: bytes) -> int:
+    crc = 0
+    for b in data:
+        crc ^= b << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) & 0xFFFFFFFF if crc & 0x80000000 else (crc << 1) & 0xFFFFFFFF
+    return crc
+
+
+def test_crc():
+    data = bytes(range(256)) * 3
+    assert ogg_crc(data) == _reference_crc(data)
+    assert ogg_crc(b"") == 0
+
+
+@pytest.mark.parametrize("sizes", [[0], [1, 2, 3], [254, 255, 256], [510, 100]])
+def test_page_roundtrip(sizes):
+    writer = OggPageWriter(serial=7)
+    packets = [bytes([i % 256]) * size for i, size in enumerate(sizes)]
+
+    data = writer.page([b"head"], 0, HEADER_BOS) + writer.page(packets, 960, HEADER_EOS)
+
+    assert list(read_pages(data)) == [(HEADER_BOS, 0, [b"head"]), (HEADER_EOS, 960, packets)]
+    assert writer.sequence == 2
+    assert writer.bytes_written == len(data)
+
+
+def test_page_header():
+    page = OggPageWriter(serial=7).page([b"abc"], 1234)
+
+    assert page[:4] == b"OggS"
+    assert struct.unpack_from("<qII", page, 6) == (1234, 7, 0)
+    assert page[26:28] == bytes((1, 3))
+
+
+def test_bad_crc():
+    page = bytearray(OggPageWriter().page([b"abc"], 0))
+    page[-1] ^= 1
+
+    with pytest.raises(ValueError, match="CRC"):
+        list(read_pages(bytes(page)))
+
+
+def test_opus_headers():
+    head = opus_head(16000, 312)
+    assert len(head) == 19
+    assert head[:8] == b"OpusHead"
+    assert struct.unpack_from("<BBHIhB", head, 8) == (1, 1, 312, 16000, 0, 0)
+    assert opus_head_pre_skip(head) == 312
+
+    assert opus_tags("x") == b"OpusTags\x01\x00\x00\x00x\x00\x00\x00\x00"
+
+
+def test_encoder():
+    pytest.importorskip("opuslib")
+    from app.ogg_opus import OggOpusEncoder
+
+    encoder = OggOpusEncoder(16000, bitrate=24000)
+    data = encoder.headers()
+    for _ in range(10):
+        data += encoder.encode(bytes(3200))
+    data += encoder.flush()
+
+    pages = list(read_pages(data))
+    assert pages[0][0] == HEADER_BOS
+    assert pages[-1][0] == HEADER_EOS
+    # pre_skip - из libopus: 6.5 мс при 16 кГц
+    assert encoder.pre_skip == 312
+    assert struct.unpack_from("<H", pages[0][2][0], 10) == (encoder.pre_skip,)
+    # 10 кусков по 100 мс - 50 кадров по 20 мс, 960 позиций 48 кГц на кадр, плюс pre_skip
+    assert pages[-1][1] == encoder.pre_skip + 50 * 960
+    assert encoder.bytes_written == len(data) < 10 * 3200
+
+
+def test_encoder_final_granule_without_padding():
+    pytest.importorskip("opuslib")
+    from app.ogg_opus import OggOpusEncoder
+
+    encoder = OggOpusEncoder(16000)
+    data = encoder.headers() + encoder.encode(bytes(3200 + 100)) + encoder.flush()
+
+    # 100 байт = 50 сэмплов 16 кГц сверх 100 мс: последний кадр добит тишиной, но позиция - по реальному концу
+    assert list(read_pages(data))[-1][1] == encoder.pre_skip + (1600 + 50) * 3
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from app.overlay_frames import (
+    BAND_BOTTOM, BAND_CENTER, BAND_TOP, FrameCoalescer, HeadlessBackend, OverlayState, changed_bands
+)
+
+
+class ManualTimers:
+    """Часы и таймеры, которые двигаем сами."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.pending: list[tuple[float, object]] = []
+
+    def clock(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, callback):
+        self.pending.append((self.now + delay, callback))
+
+    def advance(self, seconds: float):
+        self.now += seconds
+        due = [item for item in self.pending if item[0] <= self.now]
+        self.pending = [item for item in self.pending if item[0] > self.now]
+        for _, callback in due:
+            callback()
+
+
+def _coalescer(max_fps: float = 30):
+    timers = ManualTimers()
+    backend = HeadlessBackend()
+    return FrameCoalescer(backend, max_fps, clock=timers.clock, call_later=timers.call_later), backend, timers
+
+
+def test_changed_bands():
+    old = OverlayState("при", "вет", "top", "")
+
+    assert changed_bands(old, old) == frozenset()
+    assert changed_bands(old, old._replace(red_text="ве")) == {BAND_CENTER}
+    assert changed_bands(old, OverlayState()) == {BAND_TOP, BAND_CENTER}
+    assert changed_bands(old, old._replace(bottom_text="Отпускай!")) == {BAND_BOTTOM}
+
+
+def test_first_update_renders_immediately():
+    frames, backend, _ = _coalescer()
+
+    frames.update(OverlayState("привет", ""))
+
+    assert len(backend.frames) == 1
+    assert backend.frames[0][1:] == (OverlayState("привет", ""), {BAND_CENTER})
+
+
+def test_burst_coalesced_latest_wins():
+    frames, backend, timers = _coalescer()
+    frames.update(OverlayState("п", ""))
+    for text in ("пр", "при", "прив", "привет"):
+        timers.advance(0.001)
+        frames.update(OverlayState(text, ""))
+
+    assert len(backend.frames) == 1
+    assert len(timers.pending) == 1
+
+    timers.advance(1 / 30)
+
+    assert [state.green_text for _, state, _ in backend.frames] == ["п", "привет"]
+    assert frames.updates == 5
+    assert frames.frames == 2
+
+
+def test_unchanged_state_not_rendered():
+    frames, backend, timers = _coalescer()
+    frames.update(OverlayState("привет", ""))
+    timers.advance(1)
+    frames.update(OverlayState("привет", ""))
+
+    assert len(backend.frames) == 1
+
+
+def test_only_changed_bands_reported():
+    frames, backend, timers = _coalescer()
+    frames.update(OverlayState("привет", "", "top", ""))
+    timers.advance(1)
+    frames.update(OverlayState("привет", "", "top", "Отпускай!"))
+
+    assert backend.frames[-1][2] == {BAND_BOTTOM}
+
+
+def test_rate_limited_in_real_time():
+    backend = HeadlessBackend()
+    frames = FrameCoalescer(backend, max_fps=30, call_later=lambda delay, cb: threading.Timer(delay, cb).start())
+
+    started = time.monotonic()
+    i = 0
+    while time.monotonic() - started < 0.5:
+        frames.update(OverlayState(str(i), ""))
+        i += 1
+        time.sleep(0.001)
+    time.sleep(0.1)
+
+    # Не больше 30 кадров в секунду (плюс первый), последнее состояние дошло
+    assert len(backend.frames) <= 0.6 * 30 + 1
+    assert backend.frames[-1][1] == OverlayState(str(i - 1), "")
+    gaps = [b[0] - a[0] for a, b in zip(backend.frames, backend.frames[1:])]
+    assert min(gaps) >= 1 / 30 - 0.002
@@ -0,0 +1,152 @@
+import time
+
+import pytest
+
+from app.keyboard.quiescence import FakeKeyboard, HookQuiescence, KeyPollQuiescence, SnapshotQuiescence, pressed_keys
+
+VK_SHIFT = 0x10
+VK_A = 0x41
+VK_LBUTTON = 0x01
+
+
+def _snapshot(keyboard: FakeKeyboard) -> SnapshotQuiescence:
+    return SnapshotQuiescence(keyboard.read_state, poll_ms=2)
+
+
+def _key_poll(keyboard: FakeKeyboard) -> KeyPollQuiescence:
+    return KeyPollQuiescence(keyboard.key_down, poll_ms=2)
+
+
+def _hook(keyboard: FakeKeyboard) -> HookQuiescence:
+    detector = HookQuiescence()
+    keyboard.listeners.append(detector.on_key)
+    return detector
+
+
+@pytest.fixture(params=[_snapshot, _key_poll, _hook], ids=["snapshot", "key_poll", "hook"])
+def make_detector(request):
+    return request.param
+
+
+def test_mouse_buttons_ignored(make_detector):
+    keyboard = FakeKeyboard()
+    detector = make_detector(keyboard)
+    keyboard.key(VK_LBUTTON, True)
+
+    assert detector.is_clean()
+    assert pressed_keys(keyboard.read_state()) == set()
+
+    keyboard.key(VK_A, True)
+    assert not detector.is_clean()
+    assert pressed_keys(keyboard.read_state()) == {VK_A}
+
+
+def test_waits_for_last_release(make_detector):
+    keyboard = FakeKeyboard()
+    detector = make_detector(keyboard)
+    keyboard.key(VK_SHIFT, True)
+    keyboard.key(VK_A, True)
+    thread = keyboard.play([(20, VK_A, False), (60, VK_SHIFT, False)])
+
+    assert detector.wait_clean(stable_ms=30, timeout_s=2)
+    woke_at = time.monotonic()
+    thread.join()
+
+    assert woke_at - keyboard.last_event_at >= 0.03
+
+
+def test_new_press_restarts_stable_window(make_detector):
+    keyboard = FakeKeyboard()
+    detector = make_detector(keyboard)
+    keyboard.key(VK_A, True)
+    thread = keyboard.play([(10, VK_A, False), (30, VK_A, True), (50, VK_A, False)])
+
+    assert detector.wait_clean(stable_ms=40, timeout_s=2)
+    woke_at = time.monotonic()
+    thread.join()
+
+    assert woke_at - keyboard.last_event_at >= 0.04
+
+
+def test_timeout_while_held(make_detector):
+    keyboard = FakeKeyboard()
+    detector = make_detector(keyboard)
+    keyboard.key(VK_A, True)
+
+    started = time.monotonic()
+    assert not detector.wait_clean(stable_ms=10, timeout_s=0.1)
+    assert time.monotonic() - started >= 0.1
+
+
+def test_key_poll_stops_at_first_pressed_key():
+    keyboard = FakeKeyboard()
+    detector = _key_poll(keyboard)
+    keyboard.key(0x08, True)  # BACKSPACE - первая клавиша после кнопок мыши
+
+    assert not detector.is_clean()
+    assert detector.key_reads == 4  # 0x00, 0x03, 0x07, 0x08
+
+    keyboard.key(0x08, False)
+    assert detector.is_clean()
+    assert detector.key_reads == 4 + 256 - 5
+    assert detector.pressed() == set()
+
+
+def test_hook_knows_release_time():
+    keyboard = FakeKeyboard()
+    detector = _hook(keyboard)
+    keyboard.key(VK_A, True)
+    keyboard.key(VK_A, False)
+    time.sleep(0.05)
+
+    # Клавиатура чистая дольше stable_ms - ждать нечего
+    started = time.monotonic()
+    assert detector.wait_clean(stable_ms=30, timeout_s=1)
+    assert time.monotonic() - started < 0.01
+    assert detector.wakeups == 0
+
+
+def test_hook_sleeps_while_held():
+    keyboard = FakeKeyboard()
+    detector = _hook(keyboard)
+    keyboard.key(VK_A, True)
+    thread = keyboard.play([(100, VK_A, False)])
+
+    assert detector.wait_clean(stable_ms=10, timeout_s=2)
+    thread.join()
+
+    # Разбудило отпускание и конец окна, а не опрос
+    assert detector.wakeups <= 3
+
+
+def test_hook_seed():
+    detector = HookQuiescence()
+    detector.seed({VK_LBUTTON, VK_A})
+
+    assert not detector.is_clean()
+    detector.on_key(VK_A, False)
+    assert detector.is_clean()
+
+
+def test_hook_resyncs_missed_release():
+    keyboard = FakeKeyboard()
+    detector = HookQuiescence(lambda: pressed_keys(keyboard.read_state()))
+    # Хук видел нажатие, а отпускание пропустил
+    detector.on_key(VK_A, True)
+    assert not detector.is_clean()
+
+    assert detector.wait_clean(stable_ms=10, timeout_s=1)
+    assert detector.is_clean()
+
+
+def test_hook_resync_keeps_release_time():
+    keyboard = FakeKeyboard()
+    detector = HookQuiescence(lambda: pressed_keys(keyboard.read_state()))
+    keyboard.listeners.append(detector.on_key)
+    keyboard.key(VK_A, True)
+    keyboard.key(VK_A, False)
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    assert detector.wait_clean(stable_ms=30, timeout_s=1)
+    assert time.monotonic() - started < 0.01
@@ -0,0 +1,49 @@
+from app.recognizer_pool import RecognizerPool
+
+
+class FakeRecognizer:
+    def __init__(self, grammar: str):
+        self.grammar = grammar
+        self.resets = 0
+
+
+def _reset(recognizer: FakeRecognizer):
+    recognizer.resets += 1
+
+
+def test_reuse_after_release():
+    pool = RecognizerPool(FakeRecognizer, _reset, size=2)
+
+    first = pool.acquire("a")
+    pool.release("a", first)
+
+    assert pool.acquire("a") is first
+    assert first.resets == 1
+    assert (pool.built, pool.reused) == (1, 1)
+
+
+def test_pools_are_per_grammar():
+    pool = RecognizerPool(FakeRecognizer, _reset)
+
+    a = pool.acquire("a")
+    pool.release("a", a)
+    b = pool.acquire("b")
+
+    assert b is not a
+    assert b.grammar == "b"
+
+
+def test_warm_and_size_limit():
+    pool = RecognizerPool(FakeRecognizer, _reset, size=2)
+    pool.warm("a")
+    pool.warm("a")
+    assert pool.built == 2
+
+    items = [pool.acquire("a") for _ in range(3)]
+    assert pool.built == 3
+    for item in items:
+        pool.release("a", item)
+
+    # Лишний сверх size не хранится
+    assert len({id(pool.acquire("a")) for _ in range(3)}) == 3
+    assert pool.built == 4
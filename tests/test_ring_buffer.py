@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+import threading
+
+from app.ring_buffer import AsyncRingReader, PositionMap, RingBuffer, SharedRingBuffer
+
+
+def test_readers_have_independent_cursors():
+    ring = RingBuffer(8)
+    first = ring.reader()
+    ring.write(b"abcd")
+    second = ring.reader()
+    ring.write(b"ef")
+
+    assert bytes(first.read(4, timeout=0)) == b"abcd"
+    assert bytes(second.read(2, timeout=0)) == b"ef"
+    assert bytes(first.read(2, timeout=0)) == b"ef"
+    assert first.read(1, timeout=0) is None
+
+
+def test_read_returns_view_without_copy():
+    ring = RingBuffer(8)
+    reader = ring.reader()
+    ring.write(b"abcd")
+
+    data = reader.read(4, timeout=0)
+
+    assert isinstance(data, memoryview)
+    assert data.obj is ring._buffer
+
+
+def test_wrap_around():
+    ring = RingBuffer(8)
+    reader = ring.reader()
+    ring.write(b"abcdef")
+    assert bytes(reader.read(6, timeout=0)) == b"abcdef"
+
+    ring.write(b"ghij")
+
+    assert bytes(reader.read(4, timeout=0)) == b"ghij"
+    assert ring.write_pos == 10
+
+
+def test_overrun_skips_lost_audio():
+    ring = RingBuffer(8)
+    reader = ring.reader()
+    ring.write(b"abcdef")
+    ring.write(b"ghijkl")
+
+    assert bytes(reader.read(4, timeout=0)) == b"efgh"
+    assert reader.overruns == 1
+
+
+def test_reader_from_past_position():
+    ring = RingBuffer(8)
+    ring.write(b"abcdefghij")
+
+    # Старше, чем хранит кольцо, - начинаем с самого старого
+    assert bytes(ring.reader(0).read(8, timeout=0)) == b"cdefghij"
+    assert bytes(ring.reader(6).read(4, timeout=0)) == b"ghij"
+
+
+def test_read_waits_for_writer():
+    ring = RingBuffer(16)
+    reader = ring.reader()
+
+    writer = threading.Timer(0.05, ring.write, (b"abcd",))
+    writer.start()
+
+    assert bytes(reader.read(4, timeout=5)) == b"abcd"
+    writer.join()
+
+
+def test_position_map():
+    positions = PositionMap()
+    positions.feed(100, 10)
+    positions.feed(110, 10)
+    # Пропуск в кольце - новый отрезок
+    positions.feed(500, 10)
+
+    assert positions.fed == 30
+    assert positions.ring_pos(5) == 105
+    assert positions.ring_pos(19) == 119
+    assert positions.ring_pos(20) == 500
+    assert positions.ring_pos(25) == 505
+
+
+def _read_shared(name: str, capacity: int, size: int, result):
+    ring = SharedRingBuffer(capacity, name)
+    data = ring.reader(0).read(size, timeout=5)
+    result.put(None if data is None else bytes(data))
+    del data
+    ring.close()
+
+
+def test_shared_ring_read_from_other_process():
+    ring = SharedRingBuffer(16)
+    context = multiprocessing.get_context("spawn")
+    result = context.Queue()
+    process = context.Process(target=_read_shared, args=(ring.name, ring.capacity, 8, result))
+    process.start()
+
+    ring.write(b"abcd")
+    ring.write(b"efgh")
+
+    assert result.get(timeout=30) == b"abcdefgh"
+    process.join(timeout=30)
+    ring.close()
+
+
+def test_shared_ring_attached_reader_polls_writer():
+    ring = SharedRingBuffer(8)
+    attached = SharedRingBuffer(8, ring.name, poll_interval=0.001)
+    reader = attached.reader()
+
+    writer = threading.Timer(0.05, ring.write, (b"abcd",))
+    writer.start()
+
+    assert bytes(reader.read(4, timeout=5)) == b"abcd"
+    writer.join()
+
+    ring.write(b"efghij")
+    assert attached.write_pos == 10
+    # Кольцо на 8 байт - первые 2 уже перезаписаны
+    assert bytes(attached.reader(0).read(8, timeout=0)) == b"cdefghij"
+
+    attached.close()
+    ring.close()
+
+
+def test_async_reader_wakes_on_write():
+    ring = RingBuffer(16)
+
+    async def scenario():
+        reader = AsyncRingReader(ring.reader())
+        threading.Timer(0.02, ring.write, (b"ab",)).start()
+        threading.Timer(0.04, ring.write, (b"cd",)).start()
+        try:
+            return bytes(await asyncio.wait_for(reader.read(4), timeout=5))
+        finally:
+            reader.close()
+
+    assert asyncio.run(scenario()) == b"abcd"
+    assert not ring._listeners
@@ -0,0 +1,73 @@
+import pytest
+
+from app.session_recorder import (
+    SessionRecorder, read_session, read_session_header, session_path, RECORD_AUDIO, RECORD_PARTIAL, RECORD_FINAL
+)
+from app.session_replay import replay, builder_handler
+from app.tokens_to_text_builder import TextBuilderSession
+
+
+def _record(path):
+    recorder = SessionRecorder()
+    recorder.start(str(path))
+    recorder.record_audio(b"\x01\x00" * 16000)
+    recorder.record_fragment(["зима", "зимой"], False)
+    recorder.record_audio(b"\x02\x00" * 16000)
+    recorder.record_fragment(["зима лето", "зимой лета"], False)
+    recorder.record_fragment(["зима лето точка", ""], True)
+    recorder.record_fragment(["осень"], False)
+    recorder.close()
+    # После остановки ничего не пишется
+    recorder.record_audio(b"\x03\x00")
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / "session.wstt"
+    _record(path)
+
+    assert read_session_header(str(path)) == (16000, 1)
+
+    records = list(read_session(str(path)))
+    assert [r.kind for r in records] == [
+        RECORD_AUDIO, RECORD_PARTIAL, RECORD_AUDIO, RECORD_PARTIAL, RECORD_FINAL, RECORD_PARTIAL
+    ]
+    assert records[0].data == b"\x01\x00" * 16000
+    assert records[3].alternatives == ["зима лето", "зимой лета"]
+    assert records[4].alternatives == ["зима лето точка", ""]
+    assert records[4].is_final
+    assert all(a.t_ns <= b.t_ns for a, b in zip(records, records[1:]))
+
+
+def test_truncated_file(tmp_path):
+    path = tmp_path / "session.wstt"
+    _record(path)
+    path.write_bytes(path.read_bytes()[:-3])
+
+    with pytest.raises(ValueError, match="truncated"):
+        list(read_session(str(path)))
+
+
+def test_replay_to_builder(tmp_path):
+    path = tmp_path / "session.wstt"
+    _record(path)
+
+    session = TextBuilderSession()
+    stats = replay(str(path), builder_handler(session))
+
+    assert stats.fragments == 4
+    assert stats.audio_seconds == pytest.approx(2.0)
+    assert len(stats.handler_ms) == 4
+    assert session.text == "Зима лето. Осень"
+    assert session.final_text == "Зима лето."
+
+
+def test_session_path_unique(tmp_path):
+    now = 1700000000.123
+    first = session_path(str(tmp_path), now)
+    assert first.endswith("-123.wstt")
+    open(first, "wb").close()
+
+    second = session_path(str(tmp_path), now)
+    assert second != first
+    open(second, "wb").close()
+    assert session_path(str(tmp_path), now) not in (first, second)
@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+
+import pytest
+
+from app.startup import Startup, append_report
+
+
+def _sleep_step(seconds: float, result=None):
+    def run(*args):
+        time.sleep(seconds)
+        return result
+    return run
+
+
+def test_independent_steps_run_concurrently():
+    startup = Startup()
+    for name in ("model", "audio", "overlay", "channel"):
+        startup.step(name, _sleep_step(0.1, name))
+
+    results = startup.run()
+
+    assert results == {"model": "model", "audio": "audio", "overlay": "overlay", "channel": "channel"}
+    assert startup.ready_ms < 300
+
+
+def test_dependencies_get_results_in_order():
+    startup = Startup()
+    startup.step("credentials", _sleep_step(0.05, "iam"))
+    startup.step("channel", _sleep_step(0.01, "channel"))
+    startup.step("folder_id", lambda iam: f"folder-for-{iam}", requires=("credentials",))
+    startup.step("speechkit", lambda iam, folder, channel: (iam, folder, channel),
+                 requires=("credentials", "folder_id", "channel"))
+
+    results = startup.run()
+
+    assert results["speechkit"] == ("iam", "folder-for-iam", "channel")
+    timings = startup.timings
+    assert timings["folder_id"].started_ms >= timings["credentials"].ended_ms
+    assert timings["speechkit"].started_ms >= timings["folder_id"].ended_ms
+
+
+def test_critical_path_and_timeline():
+    startup = Startup()
+    startup.step("credentials", _sleep_step(0.1))
+    startup.step("model", _sleep_step(0.05))
+    startup.step("channel", _sleep_step(0.02))
+    startup.step("folder_id", _sleep_step(0.05), requires=("credentials",))
+    # Мгновенный последний шаг - полоса все равно в пределах ширины
+    startup.step("speechkit", lambda *_: None, requires=("folder_id", "channel"))
+    startup.run()
+
+    assert startup.critical_path() == ["credentials", "folder_id", "speechkit"]
+
+    timeline = startup.format_timeline(width=20)
+    lines = timeline.splitlines()
+    assert lines[0].startswith("Startup ready in")
+    assert len(lines) == 6
+    assert [line.split()[1] for line in lines[1:] if line.startswith("*")] == ["credentials", "folder_id", "speechkit"]
+    assert all(line.endswith("|") and len(line.split("|")[1]) == 20 for line in lines[1:])
+
+
+def test_failure_stops_dependants():
+    startup = Startup()
+    ran = []
+    other_done = threading.Event()
+
+    def fail():
+        raise RuntimeError("no browser")
+
+    startup.step("credentials", fail)
+    startup.step("model", lambda: other_done.set())
+    startup.step("folder_id", lambda credentials: ran.append(credentials), requires=("credentials",))
+
+    with pytest.raises(RuntimeError, match="no browser"):
+        startup.run()
+
+    assert ran == []
+    assert other_done.is_set()
+    assert "folder_id" not in startup.timings
+
+
+def test_invalid_graph():
+    startup = Startup()
+    startup.step("a", lambda: None, requires=("missing",))
+    with pytest.raises(ValueError, match="unknown"):
+        startup.run()
+
+    startup = Startup()
+    startup.step("a", lambda b: None, requires=("b",))
+    startup.step("b", lambda a: None, requires=("a",))
+    with pytest.raises(ValueError, match="cycle"):
+        startup.run()
+
+    with pytest.raises(ValueError, match="Duplicate"):
+        startup.step("a", lambda: None)
+
+
+def test_append_report(tmp_path):
+    startup = Startup()
+    startup.step("credentials", _sleep_step(0.01))
+    startup.step("speechkit", lambda _: None, requires=("credentials",))
+    startup.run()
+    path = tmp_path / "startup.jsonl"
+
+    append_report(startup, str(path))
+    append_report(startup, str(path))
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["critical_path"] == ["credentials", "speechkit"]
+    assert set(lines[0]["steps"]) == {"credentials", "speechkit"}
+    assert lines[0]["ready_ms"] >= lines[0]["steps"]["credentials"]["duration_ms"]
@@ -1,3 +1,5 @@
+import random
+
 import pytest
 
 import app.tokens_to_text_builder as tokens_to_text_builder
@@ -74,6 +76,9 @@ import app.tokens_to_text_builder as tokens_to_text_builder
     ("Тире", [(False, "зима тире лето")], 'Зима - лето'),
     ("Слэш", [(False, "зима слэш лето")], 'Зима/лето'),
     ("Обратный слэш", [(False, "зима обратный слэш лето")], 'Зима\\лето'),
+    ("Числа", [(False, "зима два три осень")], 'Зима 2 3 осень'),
+    ("Число продолжается после финала", [(True, "зима пять тысяч"), (False, "три лето")], 'Зима 5003 лето'),
+    ("Удаление части числа после финала", [(True, "зима пять тысяч"), (False, "удалить три лето")], 'Зима 5 3 лето'),
 ])
 def test(name: str, calls: list[tuple[bool, str]], result: str):
     tokens_to_text_builder.reset()
@@ -83,3 +88,152 @@ def test(name: str, calls: list[tuple[bool, str]], result: str):
         tokens_to_text_builder.build_text(tokens, is_final)
 
     assert tokens_to_text_builder.text == result
+
+
+def test_sessions_are_independent():
+    session_1 = tokens_to_text_builder.TextBuilderSession()
+    session_2 = tokens_to_text_builder.TextBuilderSession()
+
+    session_1.build_text("зима осень".split(), True)
+    session_2.build_text("лето удалить море".split(), False)
+    session_1.build_text("удалить весна".split(), False)
+
+    assert session_1.text == "Зима весна"
+    assert session_1.final_text == "Зима"
+    assert session_2.text == "Море"
+    assert session_2.final_text == ""
+
+
+def test_smart_tokens_from_file(tmp_path):
+    path = tmp_path / "smart_tokens.txt"
+    path.write_text(
+        "# сокращения\n"
+        "ЦЛК = цлк | цитадель ледяной короны\n"
+        "\n"
+        "ВК = вк | вечный кубок\n",
+        encoding="utf-8",
+    )
+    smart_tokens = tokens_to_text_builder.default_smart_tokens.copy()
+    smart_tokens.load_file(path)
+    session = tokens_to_text_builder.TextBuilderSession(smart_tokens=smart_tokens)
+
+    session.build_text("идем в цитадель ледяной короны запятая берем вечный".split(), True)
+    session.build_text("кубок".split(), False)
+
+    assert session.text == "Идем в ЦЛК, берем ВК"
+
+
+def test_smart_tokens_file_with_bad_line(tmp_path):
+    path = tmp_path / "smart_tokens.txt"
+    path.write_text("ЦЛК цлк\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        tokens_to_text_builder.SmartTokenTable().load_file(path)
+
+
+def test_partial_cache_restores_oscillating_hypotheses():
+    session = tokens_to_text_builder.TextBuilderSession(partial_cache_size=2)
+
+    session.build_text("зима".split(), True)
+    session.build_text("осень удалить лето".split(), False)
+    session.build_text("осень удалить летом".split(), False)
+    session.build_text("осень удалить лето".split(), False)
+
+    assert session.cache_hits == 1
+    assert session.text == "Зима лето"
+    assert session.final_text == "Зима"
+    assert session.non_final_text == " лето"
+
+    session.build_text("осень удалить лето два".split(), False)
+    assert session.text == "Зима лето 2"
+
+    # После финала старые гипотезы уже не подходят
+    session.build_text("осень".split(), True)
+    session.build_text("осень удалить лето".split(), False)
+    assert session.cache_hits == 1
+    assert session.text == "Зима осень лето"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_partial_cache_gives_same_texts(seed: int):
+    rnd = random.Random(seed)
+    words = ["зима", "осень", "осенью", "удалить", "очистить", "точка", "с", "запятой", "кавычки", "скобка"]
+    cached = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, partial_cache_size=3)
+    uncached = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, partial_cache_size=0)
+
+    for _ in range(30):
+        utterance = [rnd.choice(words) for _ in range(rnd.randint(1, 6))]
+        for _ in range(8):
+            tokens = utterance[:rnd.randint(1, len(utterance))]
+            if rnd.random() < 0.3:
+                tokens = tokens[:-1] + [rnd.choice(words)]
+            for session in (cached, uncached):
+                session.build_text(tokens, False)
+            assert (cached.text, cached.final_text, cached.non_final_text) == \
+                   (uncached.text, uncached.final_text, uncached.non_final_text)
+        for session in (cached, uncached):
+            session.build_text(utterance, True)
+        assert cached.text == uncached.text
+
+    assert cached.cache_hits > 0
+
+
+def test_compaction_keeps_text():
+    compacted = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, undo_window=3)
+    full = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, undo_window=None)
+
+    for utterance in ["зима осень удалить лето", "кавычки море точка с запятой", "песок кавычки волна", "точка поет"]:
+        for session in (compacted, full):
+            session.build_text(utterance.split(), True)
+        assert compacted.text == full.text
+
+    assert len(compacted._text_actions) <= 2 * 3 + 1
+    compacted.build_text("а мы запятая".split(), False)
+    full.build_text("а мы запятая".split(), False)
+    assert compacted.text == full.text == 'Зима лето "море; песок" волна. Поет а мы,'
+    assert compacted.final_text == full.final_text
+
+
+def test_undo_stops_at_compaction_checkpoint():
+    session = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, undo_window=3)
+
+    session.build_text("раз два три четыре пять шесть семь восемь девять десять".split(), True)
+    session.build_text("удалить удалить удалить удалить удалить".split(), False)
+
+    # Последние три слова можно удалить, дальше - замороженный префикс
+    assert session.text == "Раз два три четыре пять шесть семь"
+
+
+def test_clear_removes_compaction_checkpoint():
+    session = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, undo_window=3)
+
+    session.build_text("раз два три четыре пять шесть семь восемь девять десять".split(), True)
+    session.build_text("очистить море".split(), False)
+
+    assert session.text == "Море"
+
+
+def test_undo_window_covers_longest_smart_token():
+    # Окно в одно слово расширяется до самой длинной фразы ("точка с запятой"), чтобы ее не разрезало сжатие
+    session = tokens_to_text_builder.TextBuilderSession(normalize_numerals=False, undo_window=1)
+
+    session.build_text("зима лето точка с".split(), True)
+    session.build_text("запятой".split(), False)
+
+    assert session.text == "Зима лето;"
+
+
+def test_undo_window_follows_smart_token_table(tmp_path):
+    smart_tokens = tokens_to_text_builder.default_smart_tokens.copy()
+    session = tokens_to_text_builder.TextBuilderSession(
+        normalize_numerals=False, smart_tokens=smart_tokens, undo_window=1
+    )
+    # Фразу добавили после создания сеанса
+    path = tmp_path / "smart_tokens.txt"
+    path.write_text("ЦЛК = цитадель ледяной короны героический режим\n", encoding="utf-8")
+    smart_tokens.load_file(path)
+
+    session.build_text("идем в цитадель ледяной короны героический".split(), True)
+    session.build_text("режим".split(), False)
+
+    assert session.text == "Идем в ЦЛК"
@@ -0,0 +1,48 @@
+import json
+
+import app.tracing as tracing
+
+
+def test_disabled_tracing_records_nothing():
+    tracing.configure(None)
+
+    with tracing.span("build_text"):
+        pass
+    tracing.instant("response")
+
+    assert tracing.summary() == {}
+
+
+def test_stage_summary_and_chrome_trace(tmp_path):
+    path = tmp_path / "trace.json"
+    tracing.configure(str(path))
+    try:
+        tracing.next_utterance()
+        tracing.instant("audio_chunk")
+        tracing.instant("audio_chunk")
+        tracing.instant("response", event="partial")
+        with tracing.span("build_text"):
+            pass
+        with tracing.span("overlay.refresh"):
+            pass
+
+        summary = tracing.summary()
+        assert set(summary) == {"audio_to_first_response", "build_text", "overlay.refresh", "response_to_overlay"}
+        assert all(count == 1 for count, _, _, _ in summary.values())
+
+        tracing.shutdown()
+        events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+        assert [e["name"] for e in events] == ["audio_chunk", "audio_chunk", "response", "build_text", "overlay.refresh"]
+        assert events[2]["args"] == {"utterance": events[0]["args"]["utterance"], "event": "partial"}
+        assert "dur" in events[3]
+    finally:
+        tracing.configure(None)
+
+
+def test_percentile():
+    values = list(range(1, 101))
+
+    assert tracing.percentile(values, 50) == 50
+    assert tracing.percentile(values, 95) == 95
+    assert tracing.percentile(values, 99) == 99
+    assert tracing.percentile([7.0], 99) == 7.0
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from app.vad import VadGate, VoiceActivityDetector, SAMPLE_RATE
+
+
+CHUNK_SAMPLES = SAMPLE_RATE // 10
+
+
+def _noise(rnd: np.random.Generator, samples: int = CHUNK_SAMPLES, level: float = 30) -> bytes:
+    return rnd.normal(0, level, samples).astype(np.int16).tobytes()
+
+
+def _tone(samples: int = CHUNK_SAMPLES, amplitude: float = 3000, frequency: float = 200) -> bytes:
+    t = np.arange(samples) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16).tobytes()
+
+
+def test_detector():
+    rnd = np.random.default_rng(1)
+    detector = VoiceActivityDetector()
+    for _ in range(10):
+        assert not detector.is_speech(_noise(rnd))
+
+    assert detector.is_speech(_tone())
+    assert not detector.is_speech(_noise(rnd))
+
+
+def test_frame_levels():
+    detector = VoiceActivityDetector()
+
+    dbfs, zcr = detector.frame_levels(_tone(amplitude=16384, frequency=1000))
+
+    assert len(dbfs) == 5
+    # Синус в половину шкалы: -6 дБ амплитуды и еще -3 дБ на среднеквадратичное
+    assert np.allclose(dbfs, -9.03, atol=0.1)
+    assert np.allclose(zcr, 2 * 1000 / SAMPLE_RATE, atol=0.01)
+
+
+def test_gate_hangover_and_lookback():
+    rnd = np.random.default_rng(2)
+    gate = VadGate(hangover_ms=200, lookback_ms=200)
+
+    silence = [_noise(rnd) for _ in range(5)]
+    for chunk in silence:
+        assert gate.process(chunk) == []
+
+    speech = _tone()
+    # Перед речью отдаются последние 200 мс тишины
+    assert gate.process(speech) == [silence[-2], silence[-1], speech]
+
+    # 200 мс после речи еще идут, дальше - нет
+    after = [_noise(rnd) for _ in range(3)]
+    assert gate.process(after[0]) == [after[0]]
+    assert gate.process(after[1]) == [after[1]]
+    assert gate.process(after[2]) == []
+
+    assert round(gate.captured_seconds, 3) == 0.9
+    assert round(gate.sent_seconds, 3) == 0.5
+
+
+def _speech_and_silence(rnd: np.random.Generator, samples: int) -> list[bytes]:
+    # Две фразы с паузами: тишина, речь, тишина, речь, тишина
+    pattern = [False] * 15 + [True] * 10 + [False] * 20 + [True] * 10 + [False] * 15
+    return [_tone(samples) if speech else _noise(rnd, samples) for speech in pattern]
+
+
+def test_gate_sent_plus_dropped_equals_captured():
+    rnd = np.random.default_rng(3)
+    # Куски по 256 мс, как у захвата
+    gate = VadGate()
+    sent = 0
+    dropped = 0
+    for chunk in _speech_and_silence(rnd, 4096):
+        sent += sum(len(c) for c in gate.process(chunk))
+        dropped += gate.take_dropped_bytes()
+    dropped += gate.flush()
+
+    assert sent == gate.sent_bytes
+    assert sent + dropped == gate.captured_bytes
+    assert dropped == gate.dropped_bytes > 0
+
+
+def test_silence_requests_keep_server_timeline():
+    pytest.importorskip("sounddevice")
+    pytest.importorskip("yandex.cloud.ai.stt.v3.stt_pb2")
+    from app.yandex_speech_kit import streaming_requests
+
+    rnd = np.random.default_rng(4)
+    chunks = _speech_and_silence(rnd, 4090)
+    audio_bytes = 0
+    silence_ms = 0
+    for request in streaming_requests(chunks, "silence", "pcm"):
+        if request.HasField("chunk"):
+            audio_bytes += len(request.chunk.data)
+        elif request.HasField("silence_chunk"):
+            silence_ms += request.silence_chunk.duration_ms
+
+    captured_ms = sum(len(c) for c in chunks) * 1000 / (SAMPLE_RATE * 2)
+    # Отправленное плюс тишина = захваченное (с точностью до остатка меньше миллисекунды)
+    assert 0 <= captured_ms - (audio_bytes * 1000 / (SAMPLE_RATE * 2) + silence_ms) < 1
@@ -0,0 +1,124 @@
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+pytest.importorskip("requests")
+
+import app.yandex_cloud_oauth  # noqa: E402
+from app.credential_cache import Credentials, load, save  # noqa: E402
+
+
+class TokenServer(http.server.ThreadingHTTPServer):
+    """Замена сервисов токенов Яндекса: /token (OAuth) и /iam (IAM). Запоминает запросы."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TokenHandler)
+        self.requests: list[tuple[str, dict]] = []
+        self.issued = 0
+        self.iam_status = 200
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class TokenHandler(http.server.BaseHTTPRequestHandler):
+    server: TokenServer
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        if self.path == "/token":
+            request = {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+            self.server.requests.append(("token", request))
+            if request.get("refresh_token") != "refresh-1":
+                self._reply(400, {"error": "invalid_grant"})
+                return
+            self.server.issued += 1
+            self._reply(200, {
+                "access_token": f"oauth-{self.server.issued}",
+                "refresh_token": "refresh-1",
+                "expires_in": 3600,
+            })
+        elif self.path == "/iam":
+            request = json.loads(body)
+            self.server.requests.append(("iam", request))
+            self.server.issued += 1
+            self._reply(self.server.iam_status, {
+                "iamToken": f"iam-for-{request['yandexPassportOauthToken']}",
+                "expiresAt": "2099-01-01T00:00:00.123456789Z",
+            })
+        else:
+            self._reply(404, {})
+
+    def _reply(self, status: int, data: dict):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    token_server = TokenServer()
+    thread = threading.Thread(target=token_server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(app.yandex_cloud_oauth, "TOKEN_URL", token_server.url + "/token")
+    monkeypatch.setattr(app.yandex_cloud_oauth, "IAM_URL", token_server.url + "/iam")
+    # Браузер в проверках открываться не должен
+    monkeypatch.setattr(app.yandex_cloud_oauth, "get_oauth_and_iam_tokens", pytest.fail)
+    yield token_server
+    token_server.shutdown()
+    token_server.server_close()
+
+
+def test_cold_start_from_cache_without_network(server, tmp_path):
+    path = tmp_path / "credentials.json"
+    cached = Credentials("oauth-0", "refresh-1", time.time() + 3600, "iam-0", time.time() + 3600)
+    save(path, cached)
+
+    assert app.yandex_cloud_oauth.get_credentials(path) == cached
+    assert server.requests == []
+
+
+def test_expired_iam_renewed_with_saved_oauth(server, tmp_path):
+    path = tmp_path / "credentials.json"
+    save(path, Credentials("oauth-0", "refresh-1", time.time() + 3600, "iam-0", time.time() - 1))
+
+    credentials = app.yandex_cloud_oauth.get_credentials(path)
+
+    assert credentials.iam_token == "iam-for-oauth-0"
+    assert credentials.iam_expires_at == pytest.approx(4070908800.123456)
+    assert [kind for kind, _ in server.requests] == ["iam"]
+    assert load(path) == credentials
+
+
+def test_expired_oauth_refreshed_by_refresh_token(server):
+    old = Credentials("oauth-0", "refresh-1", time.time() - 1, "iam-0", time.time() - 1)
+
+    credentials = app.yandex_cloud_oauth.refresh_iam(old)
+
+    assert credentials.oauth_access_token == "oauth-1"
+    assert credentials.iam_token == "iam-for-oauth-1"
+    assert credentials.oauth_expires_at == pytest.approx(time.time() + 3600, abs=5)
+    assert server.requests[0] == ("token", {
+        "grant_type": "refresh_token",
+        "refresh_token": "refresh-1",
+        "client_id": app.yandex_cloud_oauth.CLIENT_ID,
+    })
+
+
+def test_iam_endpoint_error_raises(server):
+    server.iam_status = 500
+    old = Credentials("oauth-0", "refresh-1", None, "iam-0", time.time() - 1)
+
+    with pytest.raises(Exception):
+        app.yandex_cloud_oauth.refresh_iam(old)
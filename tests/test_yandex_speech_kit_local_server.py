@@ -0,0 +1,107 @@
+import pytest
+
+grpc = pytest.importorskip("grpc")
+stt_pb2 = pytest.importorskip("yandex.cloud.ai.stt.v3.stt_pb2")
+
+import yandex.cloud.ai.stt.v3.stt_service_pb2_grpc as stt_service_pb2_grpc  # noqa: E402
+
+from app.session_recorder import SessionRecorder  # noqa: E402
+from app.yandex_speech_kit_local_server import (  # noqa: E402
+    RecognizerServicer, ScriptEvent, recorded_events, scripted_events, serve
+)
+
+
+CHUNK = b"\x00\x00" * 1600
+
+
+def _requests(chunks: int):
+    yield stt_pb2.StreamingRequest(session_options=stt_pb2.StreamingOptions())
+    for _ in range(chunks):
+        yield stt_pb2.StreamingRequest(chunk=stt_pb2.AudioChunk(data=CHUNK))
+
+
+def _recognize(servicer: RecognizerServicer, chunks: int) -> list[tuple[str, str]]:
+    server, port = serve(servicer)
+    try:
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = stt_service_pb2_grpc.RecognizerStub(channel)
+            return [
+                (r.WhichOneof("Event"), getattr(r, r.WhichOneof("Event")).alternatives[0].text)
+                for r in stub.RecognizeStreaming(_requests(chunks))
+            ]
+    finally:
+        server.stop(grace=None)
+
+
+def test_scripted_events():
+    assert scripted_events(["зима лето"], word_ms=100) == [
+        ScriptEvent(3200, ["зима"], False),
+        ScriptEvent(6400, ["зима лето"], False),
+        ScriptEvent(6400, ["зима лето"], True),
+    ]
+
+
+def test_recorded_events(tmp_path):
+    path = tmp_path / "session.wstt"
+    recorder = SessionRecorder()
+    recorder.start(str(path))
+    recorder.record_audio(CHUNK)
+    recorder.record_fragment(["зима"], False)
+    recorder.record_audio(CHUNK)
+    recorder.record_fragment(["зима лето"], True)
+    recorder.close()
+
+    assert recorded_events(str(path)) == [
+        ScriptEvent(len(CHUNK), ["зима"], False),
+        ScriptEvent(2 * len(CHUNK), ["зима лето"], True),
+    ]
+
+
+def test_responses_follow_audio():
+    servicer = RecognizerServicer(scripted_events(["зима лето"], word_ms=100))
+
+    # Аудио хватает только на первое слово
+    assert _recognize(servicer, 1) == [("partial", "зима")]
+    assert _recognize(servicer, 2) == [("partial", "зима"), ("partial", "зима лето"), ("final", "зима лето")]
+    assert servicer.streams == 2
+    assert servicer.chunks == 3
+
+
+def test_error_injection():
+    servicer = RecognizerServicer(scripted_events(["зима лето"], word_ms=100), error_rate=1.0)
+
+    with pytest.raises(grpc.RpcError) as err:
+        _recognize(servicer, 2)
+    assert err.value.code() == grpc.StatusCode.UNAVAILABLE
+
+
+def test_recognize_async_matches_blocking_client(monkeypatch):
+    # app.yandex_speech_kit тянет захват с микрофона
+    pytest.importorskip("sounddevice")
+    import app.async_runtime
+    import app.yandex_speech_kit as yandex_speech_kit
+
+    servicer = RecognizerServicer(scripted_events(["зима лето"], word_ms=100))
+    server, port = serve(servicer)
+    runtime = app.async_runtime.AsyncRuntime()
+    monkeypatch.setattr(app.async_runtime, "runtime", runtime)
+    monkeypatch.setattr(yandex_speech_kit, "speechkit_endpoint", f"localhost:{port}")
+    monkeypatch.setattr(yandex_speech_kit, "aio_recognizer", None)
+    fragments = []
+
+    async def chunks():
+        for _ in range(2):
+            yield CHUNK
+
+    try:
+        runtime.submit(
+            yandex_speech_kit.recognize_async(
+                yandex_speech_kit.streaming_requests_async(chunks()),
+                lambda alternatives, is_final: fragments.append((alternatives[0], is_final)),
+            )
+        ).result(timeout=10)
+    finally:
+        runtime.stop()
+        server.stop(grace=None)
+
+    assert fragments == [("зима", False), ("зима лето", False), ("зима лето", True)]